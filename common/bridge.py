@@ -0,0 +1,64 @@
+"""
+bridge.py — batched hand-off from worker threads to the UI thread
+===================================================================
+The sync server, the sprite fetcher and the journal run on their own
+threads, but only the UI thread may touch widgets. Instead of asking the
+UI loop for one callback per event, events are queued here and the UI
+loop is woken once for the whole batch:
+
+  post(fn, *args)               — run fn(*args) on the UI thread, in order
+  post_latest(key, fn, *args)   — the same, but replaces a call with the
+                                  same key that hasn't run yet (e.g. "this
+                                  note has remote changes" — once is enough)
+
+The frontend passes its own wake function, called with drain() at most
+once per batch from whichever thread posted first: GLib.idle_add on GTK,
+a root.after of one frame on tkinter, so everything that arrives within
+that frame is handled in one go. Toolkit-agnostic, like debounce.py.
+post() and post_latest() are thread-safe; drain() runs on the UI thread.
+"""
+
+import threading
+
+
+class Bridge:
+    def __init__(self, wake):
+        """wake(drain) — have the UI loop call drain() once, soon; thread-safe."""
+        self._wake  = wake
+        self._lock  = threading.Lock()
+        self._calls = []        # [fn, args], in the order they were posted
+        self._keyed = {}        # key → its entry in _calls
+        self._due   = False     # drain() is scheduled and hasn't run yet
+
+    def post(self, fn, *args):
+        with self._lock:
+            self._calls.append([fn, args])
+            wake, self._due = not self._due, True
+        if wake:
+            self._wake(self.drain)
+
+    def post_latest(self, key, fn, *args):
+        with self._lock:
+            entry = self._keyed.get(key)
+            if entry is not None:
+                entry[0], entry[1] = fn, args       # keeps its place in line
+                return
+            entry = self._keyed[key] = [fn, args]
+            self._calls.append(entry)
+            wake, self._due = not self._due, True
+        if wake:
+            self._wake(self.drain)
+
+    def drain(self):
+        """Run everything posted so far (UI thread). Returns False, so it
+        can be handed to GLib.idle_add as it is."""
+        with self._lock:
+            calls, self._calls = self._calls, []
+            self._keyed.clear()
+            self._due = False               # what is posted from here on wakes us again
+        for fn, args in calls:
+            try:
+                fn(*args)
+            except Exception as e:          # one bad callback mustn't swallow the rest
+                print(f"[Bridge] {getattr(fn, '__qualname__', fn)} failed: {e!r}")
+        return False
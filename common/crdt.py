@@ -0,0 +1,207 @@
+"""
+crdt.py — replicated text sequence for Sticky Notes sync
+=========================================================
+An RGA-style sequence CRDT kept by the sync server. The note is stored as
+a list of runs (characters inserted together by one op), each tagged with
+the version that inserted it, the site (client) that inserted it and, once
+deleted, the version that deleted it. Deleted runs stay in the list as
+tombstones, so a patch written against an older version can still be
+resolved against exactly the text its author saw:
+
+  a run is visible to (site, base) if it was inserted at or before `base`
+  or by `site` itself, and not deleted at or before `base` or by `site`.
+
+Positions in an incoming patch are resolved in that view, anchored to the
+run on their left, and the result is returned as ops against the current
+text (see delta.py) so it can be forwarded to clients and the desktop buffer.
+Inserts are placed directly after their left neighbour — concurrent inserts
+at the same spot end up newest-first, the same on every replica because the
+server is the only one integrating.
+
+Tombstones only matter to views older than their deletion, so collect()
+drops every tombstone deleted at or before the oldest base still in use and
+merges the runs below it back into one, keeping memory proportional to the
+live text plus the recent edits.
+
+Cost: positions are resolved by walking the run list from the start, so an
+op costs O(runs), not O(edit) — a position index would have to be kept per
+view, and views differ by site and base. What keeps this cheap is that the
+run count stays small: every run an edit adds (inserted, split off or
+tombstoned) counts towards `garbage`, and sync.py collects once that passes
+CRDT_GC_RUNS, folding all but the runs newer than the horizon into one.
+"""
+
+
+class _Run:
+    __slots__ = ("text", "ins", "site", "dele", "dsites")
+
+    def __init__(self, text, ins, site, dele=None, dsites=()):
+        self.text   = text
+        self.ins    = ins       # version that inserted the run
+        self.site   = site      # site that inserted it (None once compacted)
+        self.dele   = dele      # version that first deleted it, or None
+        self.dsites = dsites    # every site that deleted it
+
+
+class Sequence:
+    """Versioned text that merges concurrent patches instead of dropping them.
+    Not thread-safe — sync.py serialises access with its state lock."""
+
+    def __init__(self, text: str = "", version: int = 0):
+        self.version  = version
+        self.horizon  = version     # oldest base a patch may still use
+        self._runs    = [_Run(text, version, None)] if text else []
+        self._text    = text        # cached visible text (None when stale)
+        self.length   = len(text)   # visible characters, kept without joining
+        self._dead    = 0           # runs added since the last collect()
+
+    # ── Reading ───────────────────────────────────────────────────────────
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(r.text for r in self._runs if r.dele is None)
+        return self._text
+
+    def view_text(self, site, base: int) -> str:
+        """The text as `site` saw it at version `base`, plus its own edits."""
+        return "".join(r.text for r in self._runs if _sees(r, site, base))
+
+    def __len__(self):
+        return self.length
+
+    # ── Writing ───────────────────────────────────────────────────────────
+    def apply(self, site, base: int, ops):
+        """Integrate `ops` made by `site` against its view at version `base`.
+
+        Returns the same edit as ops against the current text, or None when
+        `base` is older than the horizon (or newer than the doc). Raises
+        ValueError for malformed or out-of-range ops, leaving the doc unchanged.
+        """
+        if not self.horizon <= base <= self.version:
+            return None
+        self._check(site, base, ops)
+        seq = self.version + 1
+        out = []
+        for pos, n_del, ins in ops:
+            if n_del:
+                self._delete(site, base, seq, pos, n_del, out)
+            if ins:
+                self._insert(site, base, seq, pos, ins, out)
+        self.version = seq
+        if out:
+            self._text = None
+        return out
+
+    def collect(self, horizon: int):
+        """Forget history older than `horizon`: drop tombstones deleted at or
+        before it and merge the runs every remaining view agrees on."""
+        horizon = min(horizon, self.version)
+        if horizon > self.horizon:
+            self.horizon = horizon
+        h = self.horizon
+        runs, merged = [], []
+
+        def _flush():
+            if merged:
+                runs.append(_Run("".join(merged), h, None))
+                merged.clear()
+
+        for r in self._runs:
+            if r.dele is not None and r.dele <= h:
+                continue                    # every view already sees it deleted
+            if r.dele is None and r.ins <= h:
+                merged.append(r.text)       # every view already sees it
+                continue
+            _flush()
+            runs.append(r)
+        _flush()
+        self._runs = runs
+        self._dead = 0
+
+    @property
+    def garbage(self) -> int:
+        """Runs added (inserted, split off or tombstoned) since the last collect()."""
+        return self._dead
+
+    # ── Internals ─────────────────────────────────────────────────────────
+    def _check(self, site, base, ops):
+        length = sum(len(r.text) for r in self._runs if _sees(r, site, base))
+        for op in ops:
+            pos, n_del, ins = op
+            if not (isinstance(pos, int) and isinstance(n_del, int) and isinstance(ins, str)):
+                raise ValueError(f"malformed op: {op!r}")
+            if pos < 0 or n_del < 0 or pos + n_del > length:
+                raise ValueError(f"op out of range: [{pos}, {n_del}] on {length} chars")
+            length += len(ins) - n_del
+
+    def _split(self, i: int, k: int):
+        r = self._runs[i]
+        self._runs.insert(i + 1, _Run(r.text[k:], r.ins, r.site, r.dele, r.dsites))
+        r.text = r.text[:k]
+        self._dead += 1
+
+    def _insert(self, site, base, seq, pos, text, out):
+        idx = cur = 0
+        if pos:
+            seen = 0
+            for i, r in enumerate(self._runs):
+                n = len(r.text)
+                if _sees(r, site, base):
+                    if seen + n >= pos:
+                        k = pos - seen
+                        if k < n:
+                            self._split(i, k)
+                        if r.dele is None:
+                            cur += k
+                        idx = i + 1
+                        break
+                    seen += n
+                if r.dele is None:
+                    cur += n
+        self._runs.insert(idx, _Run(text, seq, site))
+        self._dead += 1
+        self.length += len(text)
+        out.append([cur, 0, text])
+
+    def _delete(self, site, base, seq, pos, count, out):
+        end = pos + count
+        i = seen = cur = 0
+        while seen < end:
+            r = self._runs[i]
+            n = len(r.text)
+            if not _sees(r, site, base) or seen + n <= pos:
+                if _sees(r, site, base):
+                    seen += n
+                if r.dele is None:
+                    cur += n
+                i += 1
+                continue
+            if seen < pos:                  # keep the head of the run
+                self._split(i, pos - seen)
+                if r.dele is None:
+                    cur += pos - seen
+                seen = pos
+                i += 1
+                continue
+            if seen + n > end:              # keep the tail of the run
+                self._split(i, end - seen)
+                n = end - seen
+            if r.dele is None:
+                r.dele = seq
+                r.dsites = (site,)
+                self._dead += 1
+                self.length -= n
+                if out and out[-1][0] == cur and not out[-1][2]:
+                    out[-1][1] += n
+                else:
+                    out.append([cur, n, ""])
+            else:                           # deleted concurrently — just note it
+                r.dsites += (site,)
+            seen += n
+            i += 1
+
+
+def _sees(r: _Run, site, base: int) -> bool:
+    if r.ins > base and r.site != site:
+        return False
+    return r.dele is None or not (r.dele <= base or site in r.dsites)
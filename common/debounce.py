@@ -0,0 +1,72 @@
+"""
+debounce.py — resettable debounce timer for Sticky Notes
+==========================================================
+Runs a callback once a burst of events goes quiet, with a ceiling on how
+long a steady stream of events can hold it back:
+
+  fires `delay` s after the last poke(), but never more than `max_delay` s
+  after the first poke() since it last fired.
+
+However often poke() is called, at most one timer is pending — poking only
+moves a deadline, and the timer re-arms itself for whatever is left when it
+goes off early. Toolkit-agnostic: the frontend passes its own one-shot timer
+functions (GLib.timeout_add, tkinter's after, …). Not thread-safe — use it
+from the UI thread only.
+"""
+
+import time
+
+
+class Debouncer:
+    def __init__(self, callback, delay: float, max_delay: float, call_later, cancel,
+                 clock=time.monotonic):
+        """
+        callback()              — the debounced work
+        call_later(seconds, fn) — schedule fn() once, return a handle
+        cancel(handle)          — drop a scheduled call
+        """
+        self.callback    = callback
+        self.delay       = delay
+        self.max_delay   = max(delay, max_delay)
+        self._call_later = call_later
+        self._cancel     = cancel
+        self._clock      = clock
+        self._first      = None     # time of the first poke since the last run
+        self._last       = None     # time of the latest poke
+        self._handle     = None
+
+    @property
+    def pending(self) -> bool:
+        return self._first is not None
+
+    def poke(self):
+        """Note an event — the callback runs once they stop (or max_delay passes)."""
+        self._last = self._clock()
+        if self._first is None:
+            self._first = self._last
+        if self._handle is None:
+            self._handle = self._call_later(self.delay, self._fire)
+
+    def flush(self):
+        """Run the callback now if a run is pending."""
+        if self.pending:
+            self.cancel()
+            self.callback()
+
+    def cancel(self):
+        if self._handle is not None:
+            self._cancel(self._handle)
+            self._handle = None
+        self._first = self._last = None
+
+    def _fire(self):
+        self._handle = None
+        if self._first is None:
+            return
+        due  = min(self._last + self.delay, self._first + self.max_delay)
+        left = due - self._clock()
+        if left > 0.001:
+            self._handle = self._call_later(left, self._fire)   # poked since — wait out the rest
+            return
+        self._first = self._last = None
+        self.callback()
@@ -0,0 +1,102 @@
+"""
+delta.py — text patches for Sticky Notes sync
+===============================================
+A patch is a list of ops applied in order. Each op is a 3-item list:
+
+  [pos, delete_count, insert_text]
+
+meaning "at character offset `pos`, remove `delete_count` characters and
+insert `insert_text`". Offsets are Python str indices, which match the
+character offsets GtkTextIter reports; utf16_offset() converts them for
+Tk 8.6 text indices.
+"""
+
+
+def apply_ops(text: str, ops) -> str:
+    """Return `text` with every op in `ops` applied in order."""
+    for pos, n_del, ins in ops:
+        if pos < 0 or pos + n_del > len(text):
+            raise ValueError(f"op out of range: [{pos}, {n_del}] on {len(text)} chars")
+        text = text[:pos] + ins + text[pos + n_del:]
+    return text
+
+def shift_offset(offset: int, ops) -> int:
+    """Where a position (e.g. the cursor) ends up once `ops` are applied.
+    Text inserted right at it goes after it; deleting around it pulls it
+    to the start of the deleted range."""
+    for pos, n_del, ins in ops:
+        if offset <= pos:
+            continue
+        if offset >= pos + n_del:
+            offset += len(ins) - n_del
+        else:
+            offset = pos
+    return offset
+
+def utf16_offset(text: str, pos: int) -> int:
+    """`pos` (a str index into `text`) counted in UTF-16 code units, as Tk
+    8.6 counts its text indices: a character outside the BMP (most emoji)
+    takes two there."""
+    return len(text[:pos].encode("utf-16-le")) // 2
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i + 4096 <= n and a[i:i + 4096] == b[i:i + 4096]:   # compare in C, a page at a time
+        i += 4096
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+def diff(old: str, new: str) -> list:
+    """Smallest single-op patch turning `old` into `new` (common prefix and
+    suffix trimmed). Returns [] when the texts are equal."""
+    if old == new:
+        return []
+    p = _common_prefix(old, new)
+    s = _common_prefix(old[p:][::-1], new[p:][::-1])
+    return [[p, len(old) - p - s, new[p:len(new) - s]]]
+
+
+class OpRecorder:
+    """Collects buffer edits as ops, merging runs of typing / backspacing
+    into a single op so a burst of keystrokes becomes one small patch."""
+
+    def __init__(self):
+        self._ops = []
+
+    def __bool__(self):
+        return bool(self._ops)
+
+    def insert(self, pos: int, text: str):
+        if self._ops:
+            p, d, s = self._ops[-1]
+            if p <= pos <= p + len(s):          # typing inside / right after last insert
+                k = pos - p
+                self._ops[-1] = [p, d, s[:k] + text + s[k:]]
+                return
+        self._ops.append([pos, 0, text])
+
+    def delete(self, pos: int, n: int):
+        if n <= 0:
+            return
+        if self._ops:
+            p, d, s = self._ops[-1]
+            end = p + len(s)
+            if p <= pos and pos + n <= end:     # deleting freshly typed text
+                k = pos - p
+                self._ops[-1] = [p, d, s[:k] + s[k + n:]]
+                return
+            if pos == end:                      # forward-delete after insert
+                self._ops[-1] = [p, d + n, s]
+                return
+            if pos + n == p:                    # backspace before insert
+                self._ops[-1] = [pos, d + n, s]
+                return
+        self._ops.append([pos, n, ""])
+
+    def take(self) -> list:
+        """Return the recorded ops and start a fresh patch."""
+        ops = [op for op in self._ops if op[1] or op[2]]
+        self._ops = []
+        return ops
@@ -0,0 +1,269 @@
+"""
+discovery.py — LAN discovery beacon for the Sticky Notes sync server
+======================================================================
+Lets a device find the sync server without anyone typing an IP. Runs on
+the server's event loop, next to the WebSocket server (see sync.py):
+
+  probe   — a device sends a "discover" datagram to UDP DISCOVERY_PORT,
+            as a broadcast, to the DISCOVERY_GROUP multicast group or
+            straight to an address it remembers; the beacon answers the
+            sender at once, so one round trip is all it takes
+  beacon  — every DISCOVERY_ANNOUNCE_S the same answer is also sent,
+            unasked, to the group and to the broadcast address of every
+            interface, for devices that only listen
+
+  Device → PC:  { "type": "discover", "proto": 1 }
+  PC → Device:  { "type": "here", "id": "3f9c0a1b", "name": "desk",
+                  "host": "192.168.1.20", "port": 8765, "proto": 1,
+                  "caps": ["patch"], "addrs": ["192.168.1.20", "10.0.0.5"] }
+
+"host" is the address the answer left from, i.e. the one the device can
+reach; "addrs" lists every interface. Interfaces are read from the kernel
+(SIOCGIFADDR) where that is possible, so the server is found on a LAN
+with no route to the internet. discover() is the device side in Python —
+it probes the broadcast address of every interface, the group and any
+addresses it is given (127.0.0.1 for a test on loopback).
+
+Interfaces are read when the beacon starts and again with every
+announcement, never per probe, and answers are rate-limited — one per
+address every DISCOVERY_REPLY_S, DISCOVERY_MAX_REPLIES a second in all —
+so a probe flood can neither keep the beacon busy nor be amplified.
+DISCOVERY=0 turns the beacon off.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import socket
+import struct
+import time
+from collections import namedtuple
+
+try:
+    import fcntl                    # interface addresses straight from the kernel (not on Windows)
+except ImportError:
+    fcntl = None
+
+DISCOVERY             = os.getenv("DISCOVERY", "1") != "0"
+DISCOVERY_PORT        = int(os.getenv("DISCOVERY_PORT", "8766"))
+DISCOVERY_GROUP       = os.getenv("DISCOVERY_GROUP", "239.255.87.65")
+DISCOVERY_ANNOUNCE_S  = float(os.getenv("DISCOVERY_ANNOUNCE_S", "30"))   # 0 — only answer probes
+DISCOVERY_REPLY_S     = float(os.getenv("DISCOVERY_REPLY_S",    "1"))    # one answer per address this often
+DISCOVERY_MAX_REPLIES = int(os.getenv("DISCOVERY_MAX_REPLIES",  "20"))   # answers a second, all addresses
+
+MAX_DATAGRAM = 1024                 # probes are tiny; anything bigger is not one
+REFRESH_S    = 30                   # re-read the interfaces this often when not announcing
+
+Interface = namedtuple("Interface", "name address broadcast loopback")
+
+# ioctls and flags from <linux/sockios.h> / <net/if.h>
+_SIOCGIFFLAGS, _SIOCGIFADDR, _SIOCGIFBRDADDR = 0x8913, 0x8915, 0x8919
+_IFF_UP, _IFF_BROADCAST, _IFF_LOOPBACK = 0x1, 0x2, 0x8
+
+
+# ── Interfaces ────────────────────────────────────────────────────────────────
+def interfaces():
+    """IPv4 interfaces that are up: [Interface], LAN ones before loopback."""
+    found = _kernel_interfaces() if fcntl is not None else None
+    if not found:
+        found = _resolver_interfaces()
+    return sorted(found, key=lambda i: i.loopback)
+
+def _kernel_interfaces():
+    found = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        for _, name in socket.if_nameindex():
+            request = struct.pack("256s", name.encode()[:15])
+            try:
+                flags = struct.unpack("H", fcntl.ioctl(s.fileno(), _SIOCGIFFLAGS, request)[16:18])[0]
+                if not flags & _IFF_UP:
+                    continue
+                address = socket.inet_ntoa(fcntl.ioctl(s.fileno(), _SIOCGIFADDR, request)[20:24])
+                broadcast = None
+                if flags & _IFF_BROADCAST:
+                    broadcast = socket.inet_ntoa(fcntl.ioctl(s.fileno(), _SIOCGIFBRDADDR, request)[20:24])
+            except OSError:
+                continue                    # no IPv4 address on this one
+            found.append(Interface(name, address, broadcast, bool(flags & _IFF_LOOPBACK)))
+    return found
+
+def _resolver_interfaces():
+    """Where the kernel can't be asked: whatever the host name resolves to."""
+    addresses = {"127.0.0.1"}
+    try:
+        for *_, sockaddr in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+            addresses.add(sockaddr[0])
+    except OSError:
+        pass
+    return [Interface(None, a, None if a.startswith("127.") else "255.255.255.255",
+                      a.startswith("127.")) for a in sorted(addresses)]
+
+def addresses():
+    """LAN addresses of this machine, loopback left out."""
+    return [i.address for i in interfaces() if not i.loopback]
+
+def local_address(peer: str) -> str:
+    """The address this machine would use to reach `peer` — a connected UDP
+    socket picks the route, nothing is sent."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect((peer, 9))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+
+# ── Beacon (server side) ──────────────────────────────────────────────────────
+class Beacon(asyncio.DatagramProtocol):
+    def __init__(self, ws_port: int, proto: int, caps=()):
+        self.ws_port    = ws_port
+        self.proto      = proto
+        self.caps       = list(caps)
+        self.id         = secrets.token_hex(4)     # one server answering on several interfaces
+        self.name       = socket.gethostname()
+        self.probes     = 0
+        self.transport  = None
+        self._announcer = None
+        self._lan       = []        # interfaces as of the last refresh()
+        self._addrs     = []        # ... their non-loopback addresses, as sent in answers
+        self._replied   = {}        # address → when it was last answered
+        self._second    = (0, 0)    # (second, answers sent in it)
+
+    def refresh(self):
+        """Re-read the interfaces — at start and with every announcement."""
+        self._lan   = interfaces()
+        self._addrs = [i.address for i in self._lan if not i.loopback]
+
+    def _may_reply(self, address: str, now: float) -> bool:
+        second, sent = self._second
+        if int(now) != second:
+            second, sent = int(now), 0
+        if sent >= DISCOVERY_MAX_REPLIES:
+            return False
+        last = self._replied.get(address)
+        if last is not None and now - last < DISCOVERY_REPLY_S:
+            return False
+        if len(self._replied) >= 4096:      # forget the ones that may be answered again anyway
+            self._replied = {a: t for a, t in self._replied.items() if now - t < DISCOVERY_REPLY_S}
+        self._replied[address] = now
+        self._second = (second, sent + 1)
+        return True
+
+    def message(self, host: str, addrs) -> bytes:
+        return json.dumps({"type": "here", "id": self.id, "name": self.name, "host": host,
+                           "port": self.ws_port, "proto": self.proto, "caps": self.caps,
+                           "addrs": addrs}).encode("utf-8")
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.refresh()
+        sock = transport.get_extra_info("socket")
+        for iface in self._lan:
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                socket.inet_aton(DISCOVERY_GROUP) + socket.inet_aton(iface.address))
+            except OSError:
+                pass                        # no multicast here — broadcasts and unicast still work
+
+    def datagram_received(self, data, addr):
+        if len(data) > MAX_DATAGRAM:
+            return
+        try:
+            msg = json.loads(data)
+        except ValueError:
+            return
+        if not isinstance(msg, dict) or msg.get("type") != "discover":
+            return                          # our own announcements come back here too
+        self.probes += 1
+        if self._may_reply(addr[0], time.monotonic()):
+            self.transport.sendto(self.message(local_address(addr[0]), self._addrs), addr)
+
+    def error_received(self, exc):
+        pass                                # an unreachable prober is not our problem
+
+    def announce(self):
+        """Send one unasked answer to the group and every broadcast address."""
+        self.refresh()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            for iface in self._lan:
+                if iface.loopback:
+                    continue
+                payload = self.message(iface.address, self._addrs)
+                try:
+                    s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface.address))
+                    s.sendto(payload, (DISCOVERY_GROUP, DISCOVERY_PORT))
+                    if iface.broadcast:
+                        s.sendto(payload, (iface.broadcast, DISCOVERY_PORT))
+                except OSError:
+                    continue                # interface went away, no route — try the others
+
+    async def _announce_forever(self, announce: bool):
+        while True:
+            await asyncio.sleep(DISCOVERY_ANNOUNCE_S if announce else REFRESH_S)
+            if announce:
+                self.announce()
+            else:
+                self.refresh()
+
+    def close(self):
+        if self._announcer is not None:
+            self._announcer.cancel()
+        if self.transport is not None:
+            self.transport.close()
+
+async def serve(host: str, ws_port: int, proto: int, caps=(), port: int = DISCOVERY_PORT):
+    """Start the beacon on the running loop; None when it is off or the port is taken."""
+    if not DISCOVERY:
+        return None
+    loop = asyncio.get_running_loop()
+    # Broadcasts only reach a socket bound to the wildcard address
+    bind = "0.0.0.0" if host in ("", "0.0.0.0") else host
+    try:
+        _, beacon = await loop.create_datagram_endpoint(
+            lambda: Beacon(ws_port, proto, caps), local_addr=(bind, port),
+            family=socket.AF_INET, allow_broadcast=True)
+    except OSError as e:
+        print(f"[Discovery] Could not listen on UDP port {port}: {e}")
+        return None
+    announce = DISCOVERY_ANNOUNCE_S > 0 and bind == "0.0.0.0"
+    if announce:
+        beacon.announce()
+    beacon._announcer = asyncio.ensure_future(beacon._announce_forever(announce))
+    print(f"[Discovery] Answering probes on UDP port {port}")
+    return beacon
+
+
+# ── Probing (device side) ─────────────────────────────────────────────────────
+def discover(timeout: float = 1.0, targets=(), port: int = DISCOVERY_PORT, proto: int = 1):
+    """Find sync servers: probe every broadcast address, the group and
+    `targets`, and collect answers for `timeout` seconds. Blocking — one
+    {"type": "here", ...} dict per server, first answer kept."""
+    probe = json.dumps({"type": "discover", "proto": proto}).encode("utf-8")
+    found = {}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        destinations = list(targets) + [DISCOVERY_GROUP]
+        destinations += [i.broadcast for i in interfaces() if i.broadcast and not i.loopback]
+        for destination in dict.fromkeys(destinations):
+            try:
+                s.sendto(probe, (destination, port))
+            except OSError:
+                continue
+        deadline = time.monotonic() + timeout
+        while (left := deadline - time.monotonic()) > 0:
+            s.settimeout(left)
+            try:
+                data, _ = s.recvfrom(MAX_DATAGRAM * 4)
+            except socket.timeout:
+                break
+            except OSError:
+                continue                    # e.g. ICMP unreachable from a target
+            try:
+                msg = json.loads(data)
+            except ValueError:
+                continue
+            if isinstance(msg, dict) and msg.get("type") == "here":
+                found.setdefault(msg.get("id"), msg)
+    return list(found.values())
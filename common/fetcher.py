@@ -0,0 +1,121 @@
+"""
+fetcher.py — pooled HTTP fetcher for Sticky Notes assets
+==========================================================
+A small thread pool where every worker keeps one keep-alive connection per
+host, so fetching a dozen sprites costs one TCP + TLS handshake per worker
+instead of one per request, and they download in parallel.
+
+  get(url, etag=..., modified=...) — blocking GET with retries → Response
+  submit(fn, *args)                — run fn on the pool → Future
+
+Retries back off exponentially with full jitter (a random wait between 0
+and base · 2^attempt, capped), on connection errors, 5xx and 429. A reused
+connection the server has already closed is retried at once on a fresh one.
+Passing the ETag / Last-Modified of a cached copy makes the request
+conditional; a 304 comes back as Response(status=304, body=b"").
+"""
+
+import http.client
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+Response = namedtuple("Response", "status body etag modified url")
+
+_STALE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class FetchError(Exception):
+    pass
+
+
+class Fetcher:
+    def __init__(self, workers: int = 4, timeout: float = 6.0, retries: int = 3,
+                 backoff: float = 0.5, backoff_max: float = 30.0,
+                 user_agent: str = "sticky-notes-app/1.0"):
+        self.timeout     = timeout
+        self.retries     = retries
+        self.backoff     = backoff
+        self.backoff_max = backoff_max
+        self.user_agent  = user_agent
+        self._pool       = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+        self._local      = threading.local()     # per worker: (scheme, host) → connection
+
+    def submit(self, fn, *args):
+        return self._pool.submit(fn, *args)
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def get(self, url: str, etag: str = None, modified: str = None) -> Response:
+        """GET `url`, following redirects. Raises FetchError once every retry failed."""
+        headers = {"User-Agent": self.user_agent, "Accept-Encoding": "identity"}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+        for attempt in range(self.retries):
+            try:
+                resp = self._get(url, headers)
+                if resp.status < 500 and resp.status != 429:
+                    return resp
+                error = f"HTTP {resp.status}"
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            if attempt + 1 < self.retries:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+                print(f"[Fetch] {url} failed ({error}) — retrying in {delay:.1f}s")
+                time.sleep(delay)
+        raise FetchError(f"{url}: {error}")
+
+    def _get(self, url, headers, redirects: int = 5) -> Response:
+        for _ in range(redirects + 1):
+            resp, body = self._request(url, headers)
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                url = urljoin(url, resp.getheader("Location"))
+                continue
+            return Response(resp.status, body, resp.getheader("ETag"),
+                            resp.getheader("Last-Modified"), url)
+        raise FetchError(f"{url}: too many redirects")
+
+    def _request(self, url, headers):
+        parts = urlsplit(url)
+        path  = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        key   = (parts.scheme, parts.netloc)
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn   = conns.get(key)
+        reused = conn is not None
+        if conn is None:
+            conn = conns[key] = self._connect(parts)
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()                  # read it all so the connection can be reused
+        except _STALE:
+            conn.close()
+            del conns[key]
+            if not reused:
+                raise
+            return self._request(url, headers)  # the server dropped an idle connection
+        except Exception:
+            conn.close()
+            del conns[key]
+            raise
+        if resp.will_close:
+            conn.close()
+            del conns[key]
+        return resp, body
+
+    def _connect(self, parts):
+        if parts.scheme == "https":
+            return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=self.timeout)
+        if parts.scheme == "http":
+            return http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.timeout)
+        raise FetchError(f"unsupported URL scheme: {parts.scheme!r}")
@@ -0,0 +1,97 @@
+"""
+heartbeat.py — liveness of sync clients for Sticky Notes
+==========================================================
+One Peer per connected device, driven by the sync server (sync.py):
+
+  seen(now)  — any frame arrived from the device   } True if it had
+  pong(now)  — it answered our ping                } gone quiet before
+  tick(now)  — what to do now: PING, EVICT or None
+
+A device that is sending anything is alive and is never pinged. Once it
+goes quiet for `interval` seconds it gets a ping; each ping answered in
+time doubles the interval (up to HEARTBEAT_MAX_S), so a steady idle phone
+costs a ping a minute, and any miss drops it back to HEARTBEAT_MIN_S.
+
+How long to wait for a pong follows the device's own round-trip time,
+smoothed the way TCP does it (RFC 6298: srtt + 4·rttvar, at least
+HEARTBEAT_TIMEOUT_MIN_S). A ping that times out makes the peer "suspect"
+and is sent again; HEARTBEAT_MISSES misses in a row and it is evicted.
+RTT is only sampled from pings that were not repeated, since a late pong
+can't be matched to one of several pings (Karn's rule).
+"""
+
+import os
+
+HEARTBEAT_MIN_S         = float(os.getenv("HEARTBEAT_MIN_S",         "5"))
+HEARTBEAT_MAX_S         = float(os.getenv("HEARTBEAT_MAX_S",         "60"))
+HEARTBEAT_TIMEOUT_MIN_S = float(os.getenv("HEARTBEAT_TIMEOUT_MIN_S", "3"))
+HEARTBEAT_MISSES        = int(os.getenv("HEARTBEAT_MISSES",          "3"))
+
+PING, EVICT = "ping", "evict"
+
+
+class Peer:
+    __slots__ = ("last_seen", "interval", "srtt", "rttvar", "ping_sent", "missed")
+
+    def __init__(self, now: float):
+        self.last_seen = now
+        self.interval  = HEARTBEAT_MIN_S
+        self.srtt      = None       # smoothed round-trip time, seconds
+        self.rttvar    = 0.0
+        self.ping_sent = None       # when the unanswered ping went out
+        self.missed    = 0          # pings in a row that timed out
+
+    @property
+    def live(self) -> bool:
+        """False once a ping went unanswered — sends to it are skipped."""
+        return self.missed == 0
+
+    @property
+    def state(self) -> str:
+        return "live" if self.missed == 0 else "suspect"
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return max(HEARTBEAT_TIMEOUT_MIN_S, HEARTBEAT_MIN_S)
+        return max(HEARTBEAT_TIMEOUT_MIN_S, self.srtt + 4 * self.rttvar)
+
+    def seen(self, now: float) -> bool:
+        self.last_seen = now
+        if self.missed == 0:
+            return False
+        self.missed    = 0                          # it is talking, pong or not
+        self.ping_sent = None
+        self.interval  = HEARTBEAT_MIN_S
+        return True
+
+    def pong(self, now: float) -> bool:
+        revived = self.missed > 0
+        if revived:
+            self.interval = HEARTBEAT_MIN_S         # it had gone missing — watch closely
+        elif self.ping_sent is not None:
+            sample = now - self.ping_sent
+            if self.srtt is None:
+                self.srtt, self.rttvar = sample, sample / 2
+            else:
+                self.rttvar += (abs(self.srtt - sample) - self.rttvar) / 4
+                self.srtt   += (sample - self.srtt) / 8
+            self.interval = min(HEARTBEAT_MAX_S, self.interval * 2)
+        self.ping_sent = None
+        self.missed    = 0
+        self.last_seen = now
+        return revived
+
+    def tick(self, now: float):
+        if self.ping_sent is not None:
+            if now - self.ping_sent < self.timeout:
+                return None
+            self.missed += 1
+            if self.missed >= HEARTBEAT_MISSES:
+                return EVICT
+            self.ping_sent = now
+            return PING
+        if now - self.last_seen >= self.interval:
+            self.ping_sent = now
+            return PING
+        return None
@@ -0,0 +1,234 @@
+"""
+journal.py — crash-safe autosave for Sticky Notes
+===================================================
+Edits are appended to an append-only journal by a background writer thread,
+so recording one costs the UI main loop a queue put and nothing else.
+
+  notes.journal — one JSON record per line, newer than the note store:
+                  {"seq": 42, "note": "3fa1…", "ts": ..., "ops": [[pos, delete_count, "ins"], ...]}
+                  {"seq": 43, "note": "3fa1…", "ts": ..., "text": "..."}   (full replace)
+
+The writer groups whatever arrived within JOURNAL_GROUP_MS into one write
+and one fsync. Once the journal grows past JOURNAL_COMPACT_BYTES, every
+note it touched is written to the note store (common/store.py) in a single
+transaction, tagged with the last journal seq, and the journal starts over.
+Text and timestamp are stored together, so they can never disagree.
+
+Recovery replays every journal record newer than the seq stored with its
+note, stopping at (and cutting off) a torn last line, and folds the result
+into the store — after a kill -9 the notes come back as of the last group
+commit. Only the bodies of notes that have journal records are read.
+
+With a search index (search.py), every group is handed to it as ops once
+it is on disk, and notes the index is missing are indexed whenever the
+writer has nothing else to do. With a history (history.py), each note's
+text just before an edit is offered to it as a past version.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import metrics
+from delta import apply_ops, diff
+
+JOURNAL_GROUP_MS      = int(os.getenv("JOURNAL_GROUP_MS",      "50"))
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(1 << 20)))
+
+# What save_note() really costs, paid on the writer thread
+SAVE = metrics.histogram("sticky_save_seconds",
+                         "Time to write one group of saves to the journal (append + fsync, compaction)")
+
+_CLOSE = object()
+
+
+class Journal:
+    def __init__(self, directory: str, store, index=None, history=None):
+        self.log_path = os.path.join(directory, "notes.journal")
+        self.store    = store
+        self.index    = index   # SearchIndex kept up to date with every edit, if any
+        self.history  = history # History offered the text before every edit, if any
+        self._queue   = queue.Queue()
+        self._notes   = {}      # note id → [text, ts] for notes touched since the last compaction
+        self._seq     = 0
+        self._bytes   = 0       # size of the journal since the last compaction
+        self._fh      = None
+        self._thread  = None
+
+    # ── Recovery ──────────────────────────────────────────────────────────
+    def recover(self):
+        """Replay the journal into the store and start the writer."""
+        seqs = {}
+        good = 0
+        self._seq = self.store.max_seq()
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        print(f"[Journal] Ignoring torn record at byte {good}")
+                        break
+                    try:
+                        self._replay(json.loads(line), seqs)
+                    except (ValueError, KeyError, TypeError):
+                        print(f"[Journal] Ignoring torn record at byte {good}")
+                        break
+                    good += len(line)
+        self._fh = open(self.log_path, "ab")
+        self._fh.truncate(good)
+        self._bytes = good
+        if self._notes:
+            print(f"[Journal] Recovered {len(self._notes)} note(s) from the journal")
+            self._compact()
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def _replay(self, rec, seqs):
+        note_id, seq = rec["note"], rec["seq"]
+        self._seq = max(self._seq, seq)
+        if note_id not in seqs:
+            saved = self.store.load(note_id)
+            seqs[note_id] = saved[2] if saved else 0
+        if seq <= seqs[note_id]:
+            return                                  # already in the store
+        note = self._note(note_id)
+        note[0] = rec["text"] if "text" in rec else apply_ops(note[0], rec["ops"])
+        note[1] = rec["ts"]
+
+    # ── Recording (any thread, never blocks) ──────────────────────────────
+    def record(self, note_id: str, ops, ts: float):
+        """Queue an edit: `ops` against the last recorded state of the note."""
+        if ops:
+            self._queue.put((note_id, "ops", ops, ts))
+
+    def record_text(self, note_id: str, text: str, ts: float):
+        """Queue a full replacement of the note."""
+        self._queue.put((note_id, "text", text, ts))
+
+    def flush(self):
+        """Block until everything queued so far is in the note store."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Write everything still queued, fold it into the store and stop."""
+        if self._thread is not None:
+            self._queue.put(_CLOSE)
+            self._thread.join()
+            self._thread = None
+
+    # ── Writer thread ─────────────────────────────────────────────────────
+    def _run(self):
+        try:
+            catching_up = self.index is not None and self.index.stale(self.store)
+        except Exception as e:
+            print(f"[Journal] Search index check failed: {e!r}")
+            catching_up = False
+        closing = False
+        while not closing:
+            if catching_up and self._queue.empty():
+                try:
+                    catching_up = self.index.catch_up(self._text)
+                except Exception as e:
+                    print(f"[Journal] Search index catch-up failed: {e!r}")
+                    catching_up = False
+                continue
+            batch = [self._queue.get()]
+            time.sleep(JOURNAL_GROUP_MS / 1000)     # let the rest of the burst arrive
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = _CLOSE in batch
+            flushes = [rec for rec in batch if isinstance(rec, threading.Event)]
+            if metrics.ENABLED:
+                started = time.perf_counter()
+            # Nothing may end this loop but _CLOSE: flush() and close() wait on it
+            try:
+                self._append([rec for rec in batch if isinstance(rec, tuple)])
+            except Exception as e:
+                print(f"[Journal] Write failed: {e!r}")
+            try:
+                if closing or flushes or self._bytes > JOURNAL_COMPACT_BYTES:
+                    self._compact()
+            except Exception as e:
+                print(f"[Journal] Compaction failed: {e!r}")
+            if metrics.ENABLED:
+                SAVE.observe(time.perf_counter() - started)
+            for done in flushes:
+                done.set()
+        self._fh.close()
+
+    def _note(self, note_id: str):
+        note = self._notes.get(note_id)
+        if note is None:
+            saved = self.store.load(note_id)
+            note = self._notes[note_id] = [saved[0], saved[1]] if saved else ["", 0.0]
+        return note
+
+    def _text(self, note_id: str) -> str:
+        """Latest text of a note, journaled or not — without marking it touched."""
+        note = self._notes.get(note_id)
+        if note is None:
+            saved = self.store.load(note_id)
+            return saved[0] if saved else ""
+        return note[0]
+
+    def _append(self, batch):
+        if not batch:
+            return
+        lines, edits = [], []
+        for note_id, kind, payload, ts in batch:
+            note = self._note(note_id)
+            self._seq += 1
+            rec = {"seq": self._seq, "note": note_id, "ts": ts}
+            if kind == "ops":
+                ops = payload
+            elif self.index is not None or self.history is not None:
+                ops = diff(note[0], payload)
+            else:
+                ops = None
+            if self.history is not None:
+                self.history.before_edit(note_id, note[0], ops)
+            if kind == "ops":
+                note[0] = apply_ops(note[0], payload)
+                rec["ops"] = payload
+            else:
+                note[0] = payload
+                rec["text"] = payload
+            note[1] = ts
+            lines.append(json.dumps(rec, ensure_ascii=False))
+            edits.append((note_id, ops, note[0]))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self._fh.write(data)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())                 # one fsync for the whole group
+        self._bytes += len(data)
+        # The group is on disk — a failure past here must not lose it
+        if self.index is not None:
+            try:
+                self.index.apply(edits, self._seq)
+            except Exception as e:
+                print(f"[Journal] Search index update failed: {e!r}")
+        if self.history is not None:
+            try:
+                self.history.write()
+            except Exception as e:
+                print(f"[Journal] History write failed: {e!r}")
+
+    def _compact(self):
+        if not self._notes:
+            return
+        self.store.save_many([(note_id, text, ts, self._seq)
+                              for note_id, (text, ts) in self._notes.items()])
+        # Records up to self._seq are in the store now; recovery skips them
+        # even if we crash before the truncate lands.
+        self._fh.truncate(0)
+        self._fh.seek(0)
+        self._bytes = 0
+        self._notes.clear()
@@ -0,0 +1,74 @@
+"""
+loader.py — stream a large note into a text widget for Sticky Notes
+=====================================================================
+Appends a note to the widget a chunk at a time from idle callbacks: each
+callback inserts chunks until LOAD_SLICE_MS is used up, then hands the
+UI loop back, so typing elsewhere, scrolling and redraws carry on while a
+multi-MB note comes in.
+
+start() runs the first slice at once, so the top of the note — what the
+window shows first — is in place before the first frame, and a note of
+ordinary size is loaded before start() returns. The chunks come from
+NoteStore.read_chunks(), so only the one being inserted is held outside
+the widget.
+
+Toolkit-agnostic, like debounce.py: the frontend passes its own insert
+and idle functions. Not thread-safe — use it from the UI thread only.
+"""
+
+import os
+import time
+
+LOAD_SLICE_MS = float(os.getenv("LOAD_SLICE_MS", "8"))
+
+
+class ChunkedLoader:
+    def __init__(self, chunks, total: int, insert, call_idle, cancel,
+                 on_progress=None, on_done=None, clock=time.perf_counter):
+        """
+        chunks                — iterable of text pieces, in order
+        total                 — characters expected, for progress
+        insert(text)          — append text to the widget
+        call_idle(fn)         — run fn() once the UI loop is idle, return a handle
+        cancel(handle)        — drop a scheduled call
+        on_progress(fraction) — after each slice that leaves some still to load
+        on_done()             — once everything is in
+        """
+        self._chunks      = iter(chunks)
+        self.total        = total
+        self.loaded       = 0
+        self.done         = False
+        self._insert      = insert
+        self._call_idle   = call_idle
+        self._cancel      = cancel
+        self._on_progress = on_progress
+        self._on_done     = on_done
+        self._clock       = clock
+        self._handle      = None
+
+    def start(self):
+        self._step()
+
+    def cancel(self):
+        """Stop loading (the widget is going away)."""
+        if self._handle is not None:
+            self._cancel(self._handle)
+            self._handle = None
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()                             # lets read_chunks() release the body
+
+    def _step(self):
+        self._handle = None
+        deadline = self._clock() + LOAD_SLICE_MS / 1000
+        for chunk in self._chunks:
+            self._insert(chunk)
+            self.loaded += len(chunk)
+            if self._clock() >= deadline:
+                if self._on_progress is not None:
+                    self._on_progress(min(1.0, self.loaded / self.total) if self.total else 1.0)
+                self._handle = self._call_idle(self._step)
+                return
+        self.done = True
+        if self._on_done is not None:
+            self._on_done()
@@ -0,0 +1,182 @@
+"""
+metrics.py — performance counters for Sticky Notes
+====================================================
+Counters, gauges and latency histograms for the hot paths: edit →
+broadcast, fan-out, applying remote edits, saving, bytes on the wire,
+connected clients and buddy frame time.
+
+Off unless METRICS=1. Instrumented code checks `metrics.ENABLED` before it
+even reads the clock, so when off a hot path pays for one global lookup:
+
+    if metrics.ENABLED:
+        started = time.perf_counter()
+    ...
+    if metrics.ENABLED:
+        FAN_OUT.observe(time.perf_counter() - started)
+
+Read them with a {"type": "stats"} sync message (see sync.py), or set
+METRICS_PORT to serve them in Prometheus text format at
+http://127.0.0.1:<port>/metrics. Thread-safe.
+"""
+
+import bisect
+import os
+import threading
+
+ENABLED      = os.getenv("METRICS", "0") != "0"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))     # 0 — no HTTP endpoint
+
+# Latency buckets, seconds: 10 µs … 10 s
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}          # name → metric, in registration order
+_lock     = threading.Lock()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        with _lock:
+            self.value += n
+
+    def snapshot(self):
+        return self.value
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    """Read when someone asks, from `read()` — nothing to update."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read):
+        self.name, self.help = name, help_text
+        self.read = read
+
+    def snapshot(self):
+        return self.read()
+
+    def samples(self):
+        yield self.name, self.read()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self.counts = [0] * (len(BUCKETS) + 1)      # the last one is +Inf
+        self.count  = 0
+        self.sum    = 0.0
+
+    def observe(self, seconds: float):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with _lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum   += seconds
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket the q-th observation fell in (None if empty)."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if n and seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        with _lock:
+            count, total = self.count, self.sum
+        if not count:
+            return {"count": 0}
+        return {"count": count, "avg_ms": round(total / count * 1000, 3),
+                "p50_ms": _ms(self.quantile(0.5)), "p95_ms": _ms(self.quantile(0.95)),
+                "p99_ms": _ms(self.quantile(0.99))}
+
+    def samples(self):
+        with _lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        seen = 0
+        for bound, n in zip(BUCKETS, counts):
+            seen += n
+            yield f'{self.name}_bucket{{le="{bound}"}}', seen
+        yield f'{self.name}_bucket{{le="+Inf"}}', count
+        yield f"{self.name}_sum", total
+        yield f"{self.name}_count", count
+
+def _ms(seconds):
+    """Bucket bound in ms for the stats message — None when empty or past the last bucket."""
+    return None if seconds is None or seconds == float("inf") else round(seconds * 1000, 3)
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+def _register(metric):
+    with _lock:
+        return _registry.setdefault(metric.name, metric)
+
+def counter(name: str, help_text: str) -> Counter:
+    return _register(Counter(name, help_text))
+
+def histogram(name: str, help_text: str) -> Histogram:
+    return _register(Histogram(name, help_text))
+
+def gauge(name: str, help_text: str, read) -> Gauge:
+    return _register(Gauge(name, help_text, read))
+
+def snapshot() -> dict:
+    """Every metric as plain JSON-able values — what {"type": "stats"} returns."""
+    with _lock:
+        metrics = list(_registry.values())
+    return {"enabled": ENABLED, **{m.name: m.snapshot() for m in metrics}}
+
+def prometheus_text() -> str:
+    with _lock:
+        metrics = list(_registry.values())
+    lines = []
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(f"{name} {value}" for name, value in m.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ── Prometheus endpoint ───────────────────────────────────────────────────────
+_server = None
+
+def serve(port: int = METRICS_PORT):
+    """Start the local /metrics endpoint once, if metrics and a port are set."""
+    global _server
+    if not (ENABLED and port) or _server is not None:
+        return
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer   # only when asked for
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass                            # scrapes are not news
+
+    try:
+        _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    except OSError as e:
+        print(f"[Metrics] Could not listen on port {port}: {e}")
+        return
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[Metrics] Prometheus metrics at http://127.0.0.1:{port}/metrics")
@@ -0,0 +1,54 @@
+"""
+oplog.py — bounded log of committed sync operations
+=====================================================
+Keeps the ops of the most recent versions (as produced by crdt.Sequence,
+one entry per version) so a client that reconnects can be sent just the
+edits it missed instead of the whole note. The log is trimmed from the
+oldest end once it holds more than `max_entries` versions or `max_chars`
+characters of inserted text.
+"""
+
+from collections import deque
+from itertools import islice
+
+
+class OpLog:
+    def __init__(self, version: int = 0, max_entries: int = 1024, max_chars: int = 1 << 20):
+        self.max_entries = max_entries
+        self.max_chars   = max_chars
+        self.floor       = version   # oldest version the log can replay from
+        self._entries    = deque()   # ops of versions floor+1 … last
+        self._chars      = 0
+
+    @property
+    def last(self) -> int:
+        return self.floor + len(self._entries)
+
+    def append(self, version: int, ops):
+        """Record the ops that turned version-1 into `version`."""
+        if version != self.last + 1:
+            # A gap (e.g. the doc was replaced) — nothing older is replayable
+            self._entries.clear()
+            self._chars = 0
+            self.floor  = version - 1
+        self._entries.append(ops)
+        self._chars += ops_size(ops)
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._chars > self.max_chars):
+            self._chars -= ops_size(self._entries.popleft())
+            self.floor += 1
+
+    def since(self, version: int):
+        """All ops after `version`, concatenated into one patch, or None if
+        the log no longer reaches back that far."""
+        if not self.floor <= version <= self.last:
+            return None
+        ops = []
+        for entry in islice(self._entries, version - self.floor, None):
+            ops.extend(entry)
+        return ops
+
+
+def ops_size(ops) -> int:
+    """Rough weight of a patch — its inserted text plus a little per op."""
+    return sum(len(ins) + 16 for _, _, ins in ops)
@@ -0,0 +1,109 @@
+"""
+pokeapi.py — Pokémon buddy source for Sticky Notes
+====================================================
+Picks the buddy for each note window and keeps the sprite cache
+(sprites.py) stocked, over the shared pooled fetcher (fetcher.py):
+
+  buddy(on_ready, on_offline) — a cached Pokémon at once if there is one,
+                                its sprite revalidated in the background;
+                                otherwise the first one that downloads, or
+                                on_offline() when none can be
+  prefetch(k)                 — download k random uncached Pokémon in parallel
+
+The API lives at `base_url` (POKEAPI_BASE_URL), so a local HTTP server
+can stand in for PokéAPI. Callbacks may run on a pool thread — frontends
+hand them over to their UI loop.
+"""
+
+import json
+import random
+import threading
+
+from fetcher import FetchError
+
+
+class PokeClient:
+    def __init__(self, sprites, fetcher, base_url: str, total: int = 151, prefetch: int = 3):
+        self.sprites    = sprites
+        self.fetcher    = fetcher
+        self.base_url   = base_url.rstrip("/")
+        self.total      = total
+        self.prefetch_k = prefetch
+        self._inflight  = set()     # ids being downloaded right now
+        self._lock      = threading.Lock()
+
+    def buddy(self, on_ready, on_offline):
+        cached = self.sprites.pick()
+        if cached is not None:
+            poke_id, name, data = cached
+            on_ready(name, data)
+            self.fetcher.submit(self._revalidate, poke_id)
+        else:
+            self.fetcher.submit(self._first, on_ready, on_offline)
+        self.prefetch(self.prefetch_k)
+
+    def prefetch(self, k: int):
+        """Warm the cache with `k` Pokémon it doesn't have yet."""
+        candidates = random.sample(range(1, self.total + 1), min(self.total, 4 * k))
+        missing = [i for i in candidates if self.sprites.entry(i) is None][:k]
+        for poke_id in missing:
+            self.fetcher.submit(self._prefetch_one, poke_id)
+
+    def fetch(self, poke_id: int):
+        """Download one Pokémon into the cache. Returns (name, sprite bytes),
+        or None when another thread is already fetching it."""
+        with self._lock:
+            if poke_id in self._inflight:
+                return None
+            self._inflight.add(poke_id)
+        try:
+            info = self._ok(self.fetcher.get(f"{self.base_url}/{poke_id}"))
+            data = json.loads(info.body)
+            name       = data["name"].capitalize()
+            sprite_url = data["sprites"]["front_default"]
+            if not sprite_url:
+                raise FetchError(f"no sprite for #{poke_id}")
+            sprite = self._ok(self.fetcher.get(sprite_url))
+            self.sprites.put(poke_id, name, sprite.body, sprite.url, sprite.etag, sprite.modified)
+            return name, sprite.body
+        finally:
+            with self._lock:
+                self._inflight.discard(poke_id)
+
+    # ── Pool jobs ─────────────────────────────────────────────────────────
+    def _first(self, on_ready, on_offline):
+        for _ in range(3):                  # another Pokémon if that one is already on its way
+            try:
+                hit = self.fetch(random.randint(1, self.total))
+            except (FetchError, ValueError, KeyError, TypeError) as e:
+                print(f"[Pokémon] Could not fetch: {e}")
+                break
+            if hit is not None:
+                on_ready(*hit)
+                return
+        on_offline()
+
+    def _prefetch_one(self, poke_id):
+        try:
+            self.fetch(poke_id)
+        except (FetchError, ValueError, KeyError, TypeError) as e:
+            print(f"[Pokémon] Prefetch of #{poke_id} failed: {e}")
+
+    def _revalidate(self, poke_id):
+        """Check a cached sprite is still current — usually a bodiless 304."""
+        self.sprites.flush()                # the pick's `used` time, written off the UI thread
+        entry = self.sprites.entry(poke_id)
+        if not entry or not entry.get("url"):
+            return
+        try:
+            resp = self.fetcher.get(entry["url"], entry.get("etag"), entry.get("modified"))
+        except FetchError:
+            return                          # offline — the cached copy will do
+        if resp.status == 200:
+            self.sprites.put(poke_id, entry["name"], resp.body, resp.url, resp.etag, resp.modified)
+
+    @staticmethod
+    def _ok(resp):
+        if resp.status != 200:
+            raise FetchError(f"{resp.url}: HTTP {resp.status}")
+        return resp
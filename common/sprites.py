@@ -0,0 +1,155 @@
+"""
+sprites.py — on-disk Pokémon sprite cache for Sticky Notes
+============================================================
+Downloaded sprites are kept in the data dir so the buddy shows up the
+moment a note opens, and keeps showing up offline:
+
+  sprites/objects/<sha256>.png  — sprite bytes, named by their hash
+  sprites/index.json            — {"<poke id>": {"name": ..., "sha": ..., "used": ...,
+                                                   "url": ..., "etag": ..., "modified": ...}}
+
+`url`, `etag` and `modified` say where the sprite came from, so it can be
+revalidated with a conditional request. Reads only touch `used` in
+memory — the index is written by put() and flush(), off the UI thread.
+Objects are content-addressed, so a sprite shared by several entries is
+stored once. When the objects outgrow
+`max_bytes` the least recently used Pokémon are dropped, then every object
+nothing points at any more.
+Toolkit-agnostic — decoding (and caching decoded images) is up to each
+frontend. Thread-safe.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+
+class SpriteCache:
+    def __init__(self, directory: str, max_bytes: int = 4 << 20):
+        self.directory   = directory
+        self.max_bytes   = max_bytes
+        self._objects    = os.path.join(directory, "objects")
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock       = threading.Lock()
+        os.makedirs(self._objects, exist_ok=True)
+        self._index      = self._read_index()
+        self._dirty      = False     # `used` times (or dropped entries) not written yet
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+    # ── Reading ───────────────────────────────────────────────────────────
+    def get(self, poke_id: int):
+        """Return (name, sprite bytes) of a cached Pokémon, or None."""
+        with self._lock:
+            return self._get(str(poke_id))
+
+    def pick(self):
+        """Return (poke id, name, sprite bytes) of a random cached Pokémon, or None."""
+        with self._lock:
+            keys = list(self._index)
+            random.shuffle(keys)
+            for key in keys:
+                hit = self._get(key)
+                if hit is not None:
+                    return (int(key),) + hit
+        return None
+
+    def entry(self, poke_id: int):
+        """Index entry of a cached Pokémon (a copy), or None."""
+        with self._lock:
+            entry = self._index.get(str(poke_id))
+            return dict(entry) if entry else None
+
+    def _get(self, key: str):
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(self._object_path(entry["sha"]), "rb") as f:
+                data = f.read()
+        except OSError:
+            del self._index[key]            # object went missing — forget the entry
+            self._dirty = True
+            return None
+        entry["used"] = time.time()
+        self._dirty = True                  # written by the next put() or flush()
+        return entry["name"], data
+
+    # ── Writing ───────────────────────────────────────────────────────────
+    def flush(self):
+        """Write the index if reads changed it — from a pool thread, not the UI."""
+        with self._lock:
+            if self._dirty:
+                self._write_index()
+
+    def put(self, poke_id: int, name: str, data: bytes,
+            url: str = None, etag: str = None, modified: str = None):
+        sha  = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha)
+        with self._lock:
+            if not os.path.exists(path):
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            self._index[str(poke_id)] = {"name": name, "sha": sha, "used": time.time(),
+                                         "url": url, "etag": etag, "modified": modified}
+            self._evict()
+            self._write_index()
+
+    def _evict(self):
+        sizes = {}
+        for name in os.listdir(self._objects):
+            if not name.endswith(".png"):
+                continue
+            try:
+                sizes[name[:-4]] = os.path.getsize(os.path.join(self._objects, name))
+            except OSError:
+                pass
+        live  = {entry["sha"] for entry in self._index.values()}
+        total = sum(size for sha, size in sizes.items() if sha in live)
+        # Least recently used first; the newest entry always stays
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["used"])[:-1]:
+            if total <= self.max_bytes:
+                break
+            del self._index[key]
+            if not any(e["sha"] == entry["sha"] for e in self._index.values()):
+                live.discard(entry["sha"])
+                total -= sizes.get(entry["sha"], 0)
+        for sha in sizes:
+            if sha not in live:
+                try:
+                    os.remove(self._object_path(sha))
+                except OSError:
+                    pass
+
+    # ── Files ─────────────────────────────────────────────────────────────
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self._objects, sha + ".png")
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return {key: entry for key, entry in index.items()
+                    if isinstance(entry, dict) and {"name", "sha", "used"} <= entry.keys()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[Sprites] Ignoring unreadable cache index: {e}")
+            return {}
+
+    def _write_index(self):
+        self._dirty = False
+        tmp = self._index_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self._index_path)
+        except OSError as e:
+            print(f"[Sprites] Could not write cache index: {e}")
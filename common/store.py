@@ -0,0 +1,192 @@
+"""
+store.py — multi-note store for Sticky Notes
+==============================================
+All notes live in one SQLite database (notes.db in the data dir). The index
+table holds the small per-note fields and is all that startup reads; bodies
+sit in their own table and are only loaded when a note is opened.
+
+  notes  (id, title, mtime, ts, size, seq, open)   — indexed by id and by mtime
+  bodies (id, text)                                — read whole, or a piece at a time
+
+`ts` is the sync timestamp of the note, `mtime` the local modification
+time, `seq` the journal record the body was last written for (see
+journal.py) and `open` whether the note had a window open when the
+app last quit. Toolkit-agnostic — used by both desktop frontends.
+"""
+
+import codecs
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+NoteMeta = namedtuple("NoteMeta", "id title mtime ts size")
+
+TITLE_CHARS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id    TEXT PRIMARY KEY,
+    title TEXT    NOT NULL DEFAULT '',
+    mtime REAL    NOT NULL,
+    ts    REAL    NOT NULL DEFAULT 0,
+    size  INTEGER NOT NULL DEFAULT 0,
+    seq   INTEGER NOT NULL DEFAULT 0,
+    open  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS notes_by_mtime ON notes (mtime);
+CREATE TABLE IF NOT EXISTS bodies (
+    id   TEXT PRIMARY KEY REFERENCES notes (id) ON DELETE CASCADE,
+    text TEXT NOT NULL
+);
+"""
+
+
+def new_note_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def title_of(text: str) -> str:
+    """First non-empty line, shortened — what the index shows for a note."""
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            return line[:TITLE_CHARS]
+    return ""
+
+
+class NoteStore:
+    """Thread-safe: the GTK thread, the sync thread and the journal writer
+    share one connection behind a lock."""
+
+    def __init__(self, directory: str, filename: str = "notes.db"):
+        self.path = os.path.join(directory, filename)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(notes)")}
+        if "open" not in columns:           # databases from before multi-window
+            self._db.execute("ALTER TABLE notes ADD COLUMN open INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ── Index (cheap) ─────────────────────────────────────────────────────
+    def list_notes(self):
+        """Every note, most recently modified first — bodies are not read."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, title, mtime, ts, size FROM notes ORDER BY mtime DESC").fetchall()
+        return [NoteMeta(*row) for row in rows]
+
+    def meta(self, note_id: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, title, mtime, ts, size FROM notes WHERE id = ?",
+                (note_id,)).fetchone()
+        return NoteMeta(*row) if row else None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def open_notes(self):
+        """Ids of the notes that had a window open, most recently modified first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM notes WHERE open ORDER BY mtime DESC").fetchall()
+        return [row[0] for row in rows]
+
+    def set_open(self, note_id: str, is_open: bool):
+        with self._lock:
+            self._db.execute("UPDATE notes SET open = ? WHERE id = ?", (int(is_open), note_id))
+
+    def seqs(self) -> dict:
+        """Note id → journal seq its body was last written for."""
+        with self._lock:
+            return dict(self._db.execute("SELECT id, seq FROM notes").fetchall())
+
+    def max_seq(self) -> int:
+        """Highest journal seq written to any note."""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM notes").fetchone()[0]
+
+    # ── Bodies (lazy) ─────────────────────────────────────────────────────
+    def load(self, note_id: str):
+        """Return (text, ts, seq) of a note, or None if there is no such note."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT b.text, n.ts, n.seq FROM notes n JOIN bodies b USING (id) "
+                "WHERE n.id = ?", (note_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def read_chunks(self, note_id: str, chunk_bytes: int = 1 << 16):
+        """Yield the body of a note a piece at a time, read straight out of
+        the database with incremental blob I/O, so the whole text is never
+        held outside the caller. Where that is missing (Python < 3.11) the
+        body is read at once and handed out in slices."""
+        with self._lock:
+            row = self._db.execute("SELECT rowid FROM bodies WHERE id = ?", (note_id,)).fetchone()
+            if row is None:
+                return
+            blob = self._db.blobopen("bodies", "text", row[0], readonly=True) \
+                if hasattr(self._db, "blobopen") else None
+        if blob is None:
+            saved = self.load(note_id)
+            text = saved[0] if saved else ""
+            for i in range(0, len(text), chunk_bytes):
+                yield text[i:i + chunk_bytes]
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            while True:
+                with self._lock:
+                    data = blob.read(chunk_bytes)
+                text = decoder.decode(data, final=not data)    # a character may straddle two reads
+                if text:
+                    yield text
+                if not data:
+                    return
+        finally:
+            with self._lock:
+                blob.close()
+
+    def create(self, text: str = "", ts: float = 0.0) -> str:
+        note_id = new_note_id()
+        self.save_many([(note_id, text, ts, 0)])
+        return note_id
+
+    def save(self, note_id: str, text: str, ts: float, seq: int = 0):
+        self.save_many([(note_id, text, ts, seq)])
+
+    def save_many(self, notes):
+        """Write several (id, text, ts, seq) bodies in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for note_id, text, ts, seq in notes:
+                    self._db.execute(
+                        "INSERT INTO notes (id, title, mtime, ts, size, seq) "
+                        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                        "title = excluded.title, mtime = excluded.mtime, "
+                        "ts = excluded.ts, size = excluded.size, seq = excluded.seq",
+                        (note_id, title_of(text), now, ts, len(text), seq))
+                    self._db.execute(
+                        "INSERT INTO bodies (id, text) VALUES (?, ?) "
+                        "ON CONFLICT (id) DO UPDATE SET text = excluded.text",
+                        (note_id, text))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete(self, note_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM notes WHERE id = ?", (note_id,))
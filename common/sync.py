@@ -0,0 +1,865 @@
+"""
+sync.py — WebSocket sync server for Sticky Notes
+==================================================
+Runs a lightweight WebSocket server in a background thread.
+The mobile app connects to it over local WiFi. Toolkit-agnostic — both
+desktop frontends start it and hand remote edits to their UI thread
+through a Bridge (bridge.py). It can also run on its own,
+with no display, as a hub for many devices and notes:
+
+  cd common && python -m sync --headless [--host H] [--port P] [--data-dir D]
+
+Protocol (JSON messages):
+  PC → Mobile:  { "type": "update", "note": "3fa1c2d4e5f6", "text": "...",
+                  "ts": 1234567890.0, "version": 7, "session": "3f9c0a1b" }
+  Mobile → PC:  { "type": "update", "text": "...", "ts": 1234567890.0 }
+  Mobile → PC:  { "type": "hello", "caps": ["patch"], "note": "3fa1…",
+                  "session": "3f9c0a1b", "version": 7 }
+  PC ↔ Mobile:  { "type": "patch", "note": "3fa1…", "base": 7, "version": 8,
+                  "ops": [[pos, delete_count, "inserted"], ...], "ts": ... }
+  PC → Mobile:  { "type": "ack", "note": "3fa1…", "version": 8 }
+  Mobile → PC:  { "type": "resync" }
+  PC ↔ Mobile:  { "type": "ping" }
+  Mobile ↔ PC:  { "type": "pong" }
+  Mobile → PC:  { "type": "stats" }
+  PC → Mobile:  { "type": "stats", "metrics": {...}, "clients": [...] }   (see metrics.py)
+
+Encoding: text frames of JSON by default. A client that lists "msgpack"
+in its hello caps (and a server with msgpack installed) gets the same
+messages as msgpack in binary frames, and may send binary frames too.
+Either way a message is serialised once and the same bytes go to every
+client. permessage-deflate is offered (WS_COMPRESSION) and applied to
+frames of WS_DEFLATE_MIN_BYTES or more.
+
+Every change bumps the server version. Clients that announce the "patch"
+capability in their hello receive only the changed ranges (see delta.py);
+everyone else keeps getting full "update" frames.
+
+Notes: one server serves every open note window. "note" is the store id
+of a note (see common/store.py). A client follows one note at a time — the
+one named in its hello, otherwise the first window opened — and is moved
+to another open note when that window closes. Messages from the phone
+may leave "note" out; ones naming a note other than the client's are
+ignored. Each note is a room: it knows its own clients, so a change is
+fanned out to the devices following that note and no one else. On the
+headless hub any note in its store (or a new id) can be asked for in a
+hello; see "Headless hub" below.
+
+Resuming: the server keeps the ops of recent versions in a bounded log
+(see oplog.py). A client that sends a hello as its first frame, carrying
+the session id and the last version it applied, gets one patch with only
+the ops it missed (or an "ack" when it is already current). A full update
+is sent only when the log no longer reaches back that far, the note was
+reopened or the server restarted (new session id), or the client does not
+speak patches. Clients that send no hello get the full text after
+HELLO_TIMEOUT_MS, as before. A client with unsent edits should send them
+right after its hello.
+
+Heartbeats: the server pings clients that have gone quiet, at an interval
+that grows while they keep answering and with a timeout that follows each
+client's round-trip time (see heartbeat.py). A client whose ping is
+overdue is skipped by broadcasts — it gets the full text if it answers
+again — and one that misses HEARTBEAT_MISSES pings in a row is dropped.
+At most SYNC_MAX_CLIENTS connections are accepted; more get HTTP 503.
+clients() lists every connection with its state and RTT.
+
+Discovery: next to the server a UDP beacon (see discovery.py) answers
+"discover" probes with the address, port and PROTOCOL version to connect
+to, and announces the same to the LAN now and then, so a device can find
+the server without an IP being typed in.
+
+Sending: every client has a bounded outbound queue drained by its own
+writer task, so one slow phone never holds up the others. A full update
+replaces anything still queued for that client, and a patch queued behind
+another one is merged into it (or turned into a full update once that is
+smaller). A client whose queue overflows is disconnected — it resumes
+from the op log when it comes back. broadcast() from the UI thread only
+hands the change to the event loop and returns.
+
+Sync rule: concurrent edits are merged, not dropped. The server keeps the
+note as a sequence CRDT (see crdt.py); a patch is resolved against the
+version it was written on, and a full update from a legacy client is
+diffed against the closest of the versions the server recently sent it.
+A patch client gets an "ack" when its patch applied cleanly, or the merged
+text as an "update" when it raced with someone else — patches received
+while waiting are superseded by that reply. Timestamps only order updates
+for legacy clients and always move forward, so clock skew between devices
+cannot hide an edit. Both sides persist on their own — the PC to its note
+store, the phone to AsyncStorage.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import secrets
+import signal
+import threading
+import time
+from collections import deque, namedtuple
+from http import HTTPStatus
+import websockets
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import Opcode
+from dotenv import load_dotenv
+
+try:
+    import uvloop                   # optional — a faster drop-in event loop
+except ImportError:
+    uvloop = None
+
+try:
+    import msgpack                  # optional — binary frames for clients that ask
+except ImportError:
+    msgpack = None
+
+from crdt import Sequence
+import discovery
+from delta import diff
+from heartbeat import Peer, PING, EVICT
+import metrics
+from oplog import OpLog, ops_size
+
+# .env lives at the repo root, one level above common/
+_ENV_FILE = os.path.join(os.path.dirname(__file__), "..", ".env")
+load_dotenv(dotenv_path=os.path.abspath(_ENV_FILE))
+
+# ── Config ────────────────────────────────────────────────────────────────────
+WS_HOST = os.getenv("WS_HOST", "0.0.0.0")
+WS_PORT = int(os.getenv("WS_PORT", "8765"))
+PROTOCOL = 1      # sync protocol version, as advertised by the discovery beacon
+CRDT_MAX_LAG  = int(os.getenv("CRDT_MAX_LAG",  "1024"))  # versions a client may lag before it gets a snapshot
+CRDT_GC_RUNS  = int(os.getenv("CRDT_GC_RUNS",  "64"))    # runs added by edits before they are collected
+OPLOG_MAX_OPS   = int(os.getenv("OPLOG_MAX_OPS",   "1024"))     # versions kept for resuming clients
+OPLOG_MAX_CHARS = int(os.getenv("OPLOG_MAX_CHARS", "1048576"))  # inserted text kept for resuming clients
+HELLO_TIMEOUT_MS = int(os.getenv("HELLO_TIMEOUT_MS", "300"))   # wait for a hello before sending the full text
+SEND_QUEUE_MAX   = int(os.getenv("SEND_QUEUE_MAX",   "256"))   # queued frames before a slow client is dropped
+SYNC_MAX_CLIENTS = int(os.getenv("SYNC_MAX_CLIENTS", "1024"))  # connections beyond this are turned away
+# Per-connection buffers — what an idle phone costs is bounded by these
+WS_MAX_MESSAGE = int(os.getenv("WS_MAX_MESSAGE", str(1 << 20)))   # largest frame a client may send
+WS_READ_QUEUE  = int(os.getenv("WS_READ_QUEUE",  "4"))            # received frames buffered per client
+WS_WRITE_LIMIT = int(os.getenv("WS_WRITE_LIMIT", str(32 << 10)))  # bytes buffered per client before sends wait
+SYNC_UVLOOP    = os.getenv("SYNC_UVLOOP", "1") != "0"             # use uvloop when it is installed
+WS_COMPRESSION       = os.getenv("WS_COMPRESSION", "1") != "0"          # offer permessage-deflate
+WS_DEFLATE_MIN_BYTES = int(os.getenv("WS_DEFLATE_MIN_BYTES", "512"))    # smaller frames go out as they are
+# Headless hub (python -m sync --headless)
+HUB_DATA_DIR = os.getenv("HUB_DATA_DIR", os.path.join(
+    os.environ.get("XDG_DATA_HOME", os.path.expanduser("~")), "sticky-notes-hub"))
+ROOM_IDLE_S  = float(os.getenv("ROOM_IDLE_S", "60"))   # keep a note nobody follows in memory this long
+
+LOCAL = "local"   # CRDT site id of the desktop text buffer
+
+# ── State shared with the desktop frontends ───────────────────────────────────
+NoteState = namedtuple("NoteState", "text version ts")   # immutable, safe to share
+
+class _Note:
+    """Server copy of one open note. Written from both threads, so always
+    under _state_lock — except `state`, the last published NoteState, which
+    is swapped in whole and may be read without it."""
+    __slots__ = ("id", "doc", "oplog", "ts", "state", "local_base", "update_cache",
+                 "on_remote_patch", "clients", "session")
+
+    def __init__(self, note_id: str, text: str, ts: float, on_remote_patch):
+        self.id              = note_id
+        self.doc             = Sequence(text)
+        self.oplog           = OpLog(self.doc.version, OPLOG_MAX_OPS, OPLOG_MAX_CHARS)
+        self.ts              = ts
+        self.state           = NoteState(text, self.doc.version, ts)
+        self.local_base      = 0        # last version the desktop buffer is known to have
+        self.update_cache    = (None, None)   # (version, serialised update) shared by every client
+        self.on_remote_patch = on_remote_patch
+        self.clients         = set()    # _Clients following it — event loop thread only
+        # New every time the note is opened — its versions start over, so
+        # ones from before are never resumed
+        self.session         = secrets.token_hex(4)
+
+
+class _Client:
+    """A connected device: the note it follows, CRDT site, sync progress and
+    its outbound queue."""
+    __slots__ = ("ws", "site", "note", "patches", "binary", "sent", "queue", "wakeup", "writer",
+                 "peer", "behind")
+
+    def __init__(self, ws, site):
+        self.ws      = ws
+        self.site    = site     # CRDT site id
+        self.note    = None     # _Note it follows, None until it has one
+        self.patches = False    # sent {"type":"hello","caps":["patch"]}
+        self.binary  = False    # ... with "msgpack" too — gets binary frames
+        self.sent    = deque(maxlen=8)   # versions sent since its last edit
+        self.queue   = deque()  # frames waiting for the writer task
+        self.wakeup  = asyncio.Event()
+        self.writer  = None
+        self.peer    = Peer(time.monotonic())   # liveness (heartbeat.py)
+        self.behind  = False    # broadcasts were skipped while it looked dead
+
+    @property
+    def base(self) -> int:
+        """Oldest version this client may still be editing on top of."""
+        return self.sent[0] if self.sent else 0
+
+    def synced(self, version: int):
+        self.sent.clear()
+        self.sent.append(version)
+
+    def follow(self, note):
+        """Switch to another note — versions of the old one mean nothing there."""
+        if note is not self.note:
+            old, self.note = self.note, note
+            if old is not None:
+                old.clients.discard(self)
+                if not old.clients and _on_room_empty is not None:
+                    _on_room_empty(old)
+            if note is not None:
+                note.clients.add(self)
+            self.sent.clear()
+            self.queue = deque(item for item in self.queue if item[0] == _RAW)
+
+    # ── Outbound queue (event loop thread only) ───────────────────────────
+    def send(self, msg):
+        self._push([_RAW, msg])
+
+    def send_patch(self, base: int, version: int, ops, msg, length: int):
+        """Queue a patch. If the previous one is still waiting they go out
+        as one; once that outgrows the note (`length` chars) the full text
+        is cheaper and replaces it."""
+        last = self.queue[-1] if self.queue else None
+        if last is not None and last[0] == _PATCH and last[2] == base:
+            size = last[5] + ops_size(ops)
+            if size > length:
+                self.send_snapshot()
+                return
+            last[2:6] = [version, last[3] + ops, None, size]
+            return
+        if last is not None and last[0] == _SNAPSHOT:
+            return                          # the queued snapshot will include it
+        self._push([_PATCH, base, version, ops, msg, ops_size(ops)])
+
+    def send_snapshot(self):
+        """Queue the full note — the latest one at the time it is written,
+        so anything else still waiting is superseded."""
+        self.queue = deque(item for item in self.queue if item[0] == _RAW)
+        self._push([_SNAPSHOT])
+
+    def _push(self, item):
+        if len(self.queue) >= SEND_QUEUE_MAX:
+            print(f"[Sync] Dropping slow client {self.ws.remote_address[0]} (send queue full)")
+            self.queue.clear()
+            asyncio.ensure_future(self.ws.close(1013, "send queue overflow"))
+            return
+        self.queue.append(item)
+        self.wakeup.set()
+
+    async def run_writer(self):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.queue:
+                    frame = self._next_frame()
+                    if frame is not None:
+                        data = frame.encode(self.binary)
+                        if metrics.ENABLED:
+                            SENT_BYTES.inc(len(data))
+                        await self.ws.send(data, text=not self.binary)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def _next_frame(self):
+        item = self.queue.popleft()
+        if item[0] == _RAW:
+            return item[1]
+        note = self.note
+        if note is None:
+            return None                     # every window was closed meanwhile
+        if item[0] == _SNAPSHOT:
+            text, version, ts = _state(note)
+            self.sent.append(version)
+            return _update_msg(note, text, version, ts)
+        _, base, version, ops, msg, _ = item
+        if msg is None:                     # merged — serialise just for this client
+            with _state_lock:
+                ts = note.ts
+            msg = _patch_msg(note, base, version, ops, ts)
+        self.sent.append(version)
+        return msg
+
+_RAW, _PATCH, _SNAPSHOT = range(3)   # kinds of queued frames
+
+class _Frame:
+    """An outgoing message, serialised at most once per encoding — every
+    client it goes to is sent the very same bytes."""
+    __slots__ = ("body", "_json", "_packed")
+
+    def __init__(self, body: dict):
+        self.body    = body
+        self._json   = None
+        self._packed = None
+
+    def encode(self, binary: bool) -> bytes:
+        if binary:
+            if self._packed is None:
+                self._packed = msgpack.packb(self.body, use_bin_type=True)
+            return self._packed
+        if self._json is None:
+            self._json = json.dumps(self.body, ensure_ascii=False).encode("utf-8")
+        return self._json
+
+class _LargeDeflate(PerMessageDeflate):
+    """permessage-deflate that sends frames under WS_DEFLATE_MIN_BYTES as
+    they are — RFC 7692 lets each message choose, and a ping or an ack gains
+    nothing from it."""
+    def encode(self, frame):
+        if frame.opcode in (Opcode.TEXT, Opcode.BINARY) and frame.fin \
+                and len(frame.data) < WS_DEFLATE_MIN_BYTES:
+            return frame
+        return super().encode(frame)
+
+class _LargeDeflateFactory(ServerPerMessageDeflateFactory):
+    def process_request_params(self, params, accepted_extensions):
+        response, agreed = super().process_request_params(params, accepted_extensions)
+        return response, _LargeDeflate(agreed.remote_no_context_takeover,
+                                       agreed.local_no_context_takeover,
+                                       agreed.remote_max_window_bits,
+                                       agreed.local_max_window_bits,
+                                       self.compress_settings)
+
+_connected_clients: dict = {}     # websocket → _Client; per note, see _Note.clients
+_site_ids          = itertools.count(1)
+_loop              = None   # the asyncio event loop running in the bg thread
+_outbox            = deque()   # (note, version, ts, base, ops, length) published by the frontend, fanned out on the loop
+
+# Open notes, by store id (see common/store.py). The first one is what
+# clients that do not ask for a note follow.
+_state_lock = threading.Lock()
+_notes: dict = {}
+
+# Instrumentation (metrics.py) — sent bytes are counted before compression
+SENT_BYTES = metrics.counter("sticky_sync_sent_bytes_total", "Bytes of sync messages sent")
+RECV_BYTES = metrics.counter("sticky_sync_received_bytes_total", "Bytes of sync messages received")
+FAN_OUT    = metrics.histogram("sticky_sync_fanout_seconds",
+                               "Time to queue one change for every client following its note")
+MERGE      = metrics.histogram("sticky_sync_merge_seconds", "Time to merge one edit from a client")
+metrics.gauge("sticky_sync_clients", "Connected sync clients", lambda: len(_connected_clients))
+
+# Set by the headless hub: open a note a client asks for / drop one nobody follows
+_room_loader   = None   # (note id or None) → _Note, or None for a bad id
+_on_room_empty = None   # (_Note) → None, when its last client leaves
+
+_ROOM_ID = re.compile(r"[0-9A-Za-z_-]{1,64}")   # what a note id in a message may look like
+
+def get_local_ip() -> str:
+    """Return this machine's LAN IP so the user can tell the mobile app —
+    read from its interfaces, so it is right on a LAN with no internet too."""
+    lan = discovery.addresses()
+    return lan[0] if lan else "127.0.0.1"
+
+# ── Open notes ────────────────────────────────────────────────────────────────
+def open_note(note_id: str, text: str, ts: float, on_remote_patch):
+    """Start serving a note window.
+    on_remote_patch(ops, base, version, ts) — called from the sync thread when mobile changes the note
+    """
+    with _state_lock:
+        _notes[note_id] = _Note(note_id, text, ts, on_remote_patch)
+
+def close_note(note_id: str):
+    """Stop serving a note; clients following it move to the next open one."""
+    with _state_lock:
+        note = _notes.pop(note_id, None)
+        fallback = next(iter(_notes.values()), None)
+    if note is not None and _loop is not None:
+        _loop.call_soon_threadsafe(_reassign, note, fallback)
+
+def _reassign(note, fallback):
+    for client in list(note.clients):
+        client.follow(fallback)
+        if fallback is not None:
+            client.send_snapshot()
+
+def _default_note():
+    """The note for clients that don't name one: the first window opened,
+    or on the hub the most recently modified note."""
+    if _room_loader is not None:
+        return _room_loader(None)
+    with _state_lock:
+        return next(iter(_notes.values()), None)
+
+def _find_note(note_id: str):
+    with _state_lock:
+        note = _notes.get(note_id)
+    if note is None and _room_loader is not None:
+        note = _room_loader(note_id)
+    return note
+
+# ── Versioned note state ──────────────────────────────────────────────────────
+def snapshot(note_id: str) -> NoteState:
+    """Return (text, version, ts) of the server copy of the note."""
+    return _state(_notes[note_id])
+
+def _state(note: _Note) -> NoteState:
+    """The note as of its latest version. Lock-free unless it changed since
+    the last call; the text is joined at most once per version."""
+    state = note.state
+    if state.version != note.doc.version:
+        with _state_lock:
+            state = note.state
+            if state.version != note.doc.version:
+                state = note.state = NoteState(note.doc.text, note.doc.version, note.ts)
+    return state
+
+def ack(note_id: str, version: int):
+    """Call from the frontend once its buffer has caught up with `version`."""
+    with _state_lock:
+        note = _notes.get(note_id)
+        if note is not None:
+            note.local_base = max(note.local_base, version)
+
+def _commit(note: _Note, site, base: int, ops, ts: float):
+    """Merge `ops` from `site` (written against version `base`) into the note.
+    Returns (ops against the previous version, new version, ts, length),
+    or None when `base` is too old to merge. Caller holds _state_lock."""
+    doc = note.doc
+    out = doc.apply(site, base, ops)
+    if out is None:
+        return None
+    note.ts = max(ts, note.ts + 0.001)      # never go backwards, whatever the clocks say
+    note.oplog.append(doc.version, out)
+    if doc.garbage >= CRDT_GC_RUNS:
+        # Keep whatever a connected or resumable client may still edit on top of
+        bases = [c.base for c in list(note.clients)]
+        floor = min(bases + [note.local_base, note.oplog.floor])
+        doc.collect(max(floor, doc.version - CRDT_MAX_LAG))
+    return out, doc.version, note.ts, len(doc)
+
+def _update_msg(note: _Note, text: str, version: int, ts: float) -> _Frame:
+    if note.update_cache[0] != version:
+        note.update_cache = (version, _Frame({"type": "update", "note": note.id, "text": text,
+                                              "ts": ts, "version": version, "session": note.session}))
+    return note.update_cache[1]
+
+def _patch_msg(note: _Note, base: int, version: int, ops, ts: float) -> _Frame:
+    return _Frame({"type": "patch", "note": note.id, "base": base, "version": version,
+                   "ops": ops, "ts": ts})
+
+def _ack_msg(note: _Note, version: int) -> _Frame:
+    return _Frame({"type": "ack", "note": note.id, "version": version})
+
+def _resume(client: _Client, msg: dict):
+    """Send a client that says it has `version` only the ops it missed."""
+    note = client.note
+    version = msg.get("version")
+    ops = None
+    with _state_lock:
+        current, length, ts = note.doc.version, note.doc.length, note.ts
+        if client.patches and msg.get("session") == note.session and isinstance(version, int):
+            ops = note.oplog.since(version)
+    if ops is None or sum(len(ins) for _, _, ins in ops) > length:
+        client.send_snapshot()               # trimmed, restarted or cheaper as a whole
+        return
+    client.synced(current)
+    if version == current:
+        client.send(_ack_msg(note, current))
+    else:
+        client.send_patch(version, current, ops, _patch_msg(note, version, current, ops, ts), length)
+
+# ── WebSocket handler ─────────────────────────────────────────────────────────
+async def _handler(websocket):
+    client = _Client(websocket, next(_site_ids))
+    client.writer = asyncio.ensure_future(client.run_writer())
+    _connected_clients[websocket] = client
+    ip = websocket.remote_address[0]
+    print(f"[Sync] Mobile connected from {ip}")
+
+    try:
+        # A resuming client says hello first; anyone else gets the full note
+        try:
+            first = await asyncio.wait_for(websocket.recv(), HELLO_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            first = None
+        msg = _parse(first)
+        hello = msg is not None and msg.get("type") == "hello"
+        if not hello or msg.get("note") is None:
+            client.follow(_default_note())
+        if not hello:
+            client.send_snapshot()
+        if msg is not None:
+            _dispatch(client, msg)
+
+        async for raw in websocket:
+            msg = _parse(raw)
+            if msg is not None:
+                _dispatch(client, msg)
+
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        _connected_clients.pop(websocket, None)
+        client.writer.cancel()
+        client.follow(None)
+        print(f"[Sync] Mobile disconnected ({ip})")
+
+_DECODE_ERRORS = (ValueError, TypeError) + ((msgpack.UnpackException,) if msgpack else ())
+
+def _parse(raw):
+    if raw is None:
+        return None
+    if metrics.ENABLED:
+        RECV_BYTES.inc(len(raw.encode("utf-8")) if isinstance(raw, str) else len(raw))
+    try:
+        if isinstance(raw, bytes):          # binary frames are msgpack
+            if msgpack is None:
+                return None
+            msg = msgpack.unpackb(raw, raw=False)
+        else:
+            msg = json.loads(raw)
+    except _DECODE_ERRORS:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+_PING = _Frame({"type": "ping"})
+_PONG = _Frame({"type": "pong"})
+
+def _dispatch(client: _Client, msg: dict):
+    kind = msg.get("type")
+    note_id = msg.get("note")
+    if note_id is not None and not (isinstance(note_id, str) and _ROOM_ID.fullmatch(note_id)):
+        return                              # not a note id — nothing to look up
+    now = time.monotonic()
+    if client.peer.pong(now) if kind == "pong" else client.peer.seen(now):
+        print(f"[Sync] Client {client.ws.remote_address[0]} is answering again")
+        if client.behind:
+            client.behind = False
+            client.send_snapshot()          # it missed broadcasts meanwhile
+    if kind == "pong":
+        return
+    if kind == "hello" and note_id is not None:
+        note = _find_note(note_id)
+        if note is None:
+            print(f"[Sync] Client asked for unknown note {note_id!r}")
+            if client.note is None:
+                client.follow(_default_note())
+        else:
+            client.follow(note)
+    elif note_id is not None and (client.note is None or note_id != client.note.id):
+        print(f"[Sync] Ignoring {kind} for note {note_id!r} (client follows another note)")
+        return
+
+    if kind == "ping":
+        client.send(_PONG)
+
+    elif kind == "stats":
+        client.send(_Frame({"type": "stats", "metrics": metrics.snapshot(), "clients": clients()}))
+
+    elif client.note is None:
+        return                              # no note window open to sync with
+
+    elif kind == "hello":
+        caps = msg.get("caps", ())
+        client.patches = "patch" in caps
+        client.binary  = "msgpack" in caps and msgpack is not None
+        _resume(client, msg)
+
+    elif kind in ("patch", "update"):
+        _on_client_edit(client, msg)
+
+    elif kind == "resync":
+        client.send_snapshot()
+
+def _legacy_base(client: _Client, text: str):
+    """Pick the version a legacy client's full-text update was written on.
+    It may have ignored some of the updates we sent (its own edit was newer),
+    so try each version sent since its last edit and keep the closest one.
+    Nothing sent yet (it spoke before its snapshot went out): the current one."""
+    doc = client.note.doc
+    best = None
+    for version in reversed(client.sent or [doc.version]):
+        if version < doc.horizon:
+            break
+        ops = diff(doc.view_text(client.site, version), text)
+        cost = sum(n_del + len(ins) for _, n_del, ins in ops)
+        if best is None or cost < best[0]:
+            best = (cost, version, ops)
+    return best[1:] if best else (None, None)
+
+def _on_client_edit(client: _Client, msg: dict):
+    if metrics.ENABLED:
+        started = time.perf_counter()
+    note = client.note
+    ts = msg.get("ts")
+    if not isinstance(ts, (int, float)):
+        ts = time.time()
+    with _state_lock:
+        prev = note.doc.version
+        try:
+            if msg["type"] == "patch":
+                base, ops = msg.get("base"), msg.get("ops", [])
+            else:
+                base, ops = _legacy_base(client, msg.get("text", ""))
+            result = _commit(note, client.site, base, ops, ts) if isinstance(base, int) else None
+        except (ValueError, TypeError):
+            result = None
+        if result is not None and base != prev:
+            # The merged text goes back to the client, which only takes an
+            # update newer than its own edit
+            note.ts = max(note.ts, ts + 0.001)
+            result = result[:2] + (note.ts,) + result[3:]
+    if result is None:
+        # Too far behind (or garbage) — fall back to the full text
+        client.send_snapshot()
+        return
+
+    out, version, ts, length = result
+    if base != prev:
+        # Raced with another edit: the client needs the merged text
+        print(f"[Sync] Merged concurrent edit from mobile (v{base} → v{version})")
+        client.send_snapshot()
+    else:
+        client.synced(version)
+        if client.patches:
+            client.send(_ack_msg(note, version))
+    if out:
+        _fan_out(note, version, ts, version - 1, out, length, exclude=client)
+        if note.on_remote_patch:
+            note.on_remote_patch(out, version - 1, version, ts)
+    if metrics.ENABLED:
+        MERGE.observe(time.perf_counter() - started)
+
+# ── Broadcast to all connected mobile clients ─────────────────────────────────
+def broadcast(note_id: str, text: str, ts: float) -> int:
+    """Call from the frontend to publish the full note text. Returns the new version."""
+    with _state_lock:
+        note = _notes[note_id]
+        base = note.doc.version
+        out, version, ts, length = _commit(note, LOCAL, base, diff(note.doc.text, text), ts)
+        note.local_base = version
+    _publish(note, version, ts, base, out, length)
+    return version
+
+def broadcast_patch(note_id: str, base: int, ops, ts: float):
+    """Call from the frontend with the ops recorded since version `base`.
+    Returns the new version, or None if `base` is too old to merge — the
+    caller should then publish the full text with broadcast(). A version
+    other than base + 1 means remote edits were merged in: the buffer should
+    catch up from snapshot()."""
+    with _state_lock:
+        note = _notes[note_id]
+        result = _commit(note, LOCAL, base, ops, ts)
+        if result is None:
+            return None
+        out, version, ts, length = result
+        if base == version - 1:
+            note.local_base = version
+    _publish(note, version, ts, version - 1, out, length)
+    return version
+
+def _publish(note, version, ts, base, ops, length):
+    """Hand a local change to the event loop — O(1) whatever the client count."""
+    if ops and note.clients and _loop is not None:
+        _outbox.append((note, version, ts, base, ops, length))
+        if len(_outbox) == 1:                # otherwise a drain is already pending
+            _loop.call_soon_threadsafe(_drain_outbox)
+
+def _drain_outbox():
+    while _outbox:
+        _fan_out(*_outbox.popleft())
+
+def _fan_out(note, version, ts, base, ops, length, exclude=None):
+    """Queue the change for every client following the note: the ops for
+    patch-capable clients, the full text for the rest. The patch is
+    serialised once for everyone."""
+    if metrics.ENABLED:
+        started = time.perf_counter()
+    patch_msg = None
+    for client in list(note.clients):
+        if client is exclude:
+            continue
+        if not client.peer.live:
+            client.behind = True            # no use queueing for a peer that may be gone
+            continue
+        if client.patches:
+            if patch_msg is None:
+                patch_msg = _patch_msg(note, base, version, ops, ts)
+            client.send_patch(base, version, ops, patch_msg, length)
+        else:
+            client.send_snapshot()
+    if metrics.ENABLED:
+        FAN_OUT.observe(time.perf_counter() - started)
+
+# ── Heartbeats ────────────────────────────────────────────────────────────────
+HEARTBEAT_TICK_S = 1.0
+
+async def _heartbeat():
+    """Ping the clients that have gone quiet and drop the ones that stopped answering."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_TICK_S)
+        now = time.monotonic()
+        for client in list(_connected_clients.values()):
+            action = client.peer.tick(now)
+            if action == PING:
+                client.send(_PING)
+            elif action == EVICT:
+                print(f"[Sync] Dropping unresponsive client {client.ws.remote_address[0]}")
+                client.ws.transport.abort()     # no close handshake with a dead peer
+
+def _admit(connection, request):
+    """Turn new connections away once SYNC_MAX_CLIENTS are connected."""
+    if len(_connected_clients) >= SYNC_MAX_CLIENTS:
+        return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "Too many clients\n")
+    return None
+
+def clients():
+    """Liveness of every connected client. Safe to call from any thread."""
+    now = time.monotonic()
+    out = []
+    for client in list(_connected_clients.values()):
+        peer = client.peer
+        out.append({"address": client.ws.remote_address[0],
+                    "note":    client.note.id if client.note else None,
+                    "state":   peer.state,
+                    "rtt_ms":  None if peer.srtt is None else round(peer.srtt * 1000, 1),
+                    "idle_s":  round(now - peer.last_seen, 1),
+                    "queued":  len(client.queue)})
+    return out
+
+# ── Start server in background thread ────────────────────────────────────────
+def _new_loop():
+    """uvloop's loop when it is installed (and SYNC_UVLOOP isn't 0), else asyncio's."""
+    if uvloop is not None and SYNC_UVLOOP:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+async def _serve(host: str, port: int, stop=None):
+    # Deflate contexts are kept small (4 KiB window) — they are per connection
+    extensions = [_LargeDeflateFactory(server_max_window_bits=12, client_max_window_bits=12,
+                                       compress_settings={"memLevel": 5})] if WS_COMPRESSION else []
+    # Heartbeats are ours (_heartbeat), not the library's keepalive pings
+    async with websockets.serve(_handler, host, port, max_size=WS_MAX_MESSAGE,
+                                max_queue=WS_READ_QUEUE, write_limit=WS_WRITE_LIMIT,
+                                compression=None, extensions=extensions,
+                                ping_interval=None, process_request=_admit):
+        print(f"[Sync] WebSocket server started.")
+        for ip in (discovery.addresses() if host in ("", "0.0.0.0") else [host]) or ["127.0.0.1"]:
+            print(f"[Sync] Connect mobile app to:  ws://{ip}:{port}")
+        heartbeat = asyncio.ensure_future(_heartbeat())
+        beacon = await discovery.serve(host, port, PROTOCOL,
+                                       ["patch"] + (["msgpack"] if msgpack else []))
+        try:
+            await (stop if stop is not None else asyncio.Future())   # run until stopped
+        finally:
+            heartbeat.cancel()
+            if beacon is not None:
+                beacon.close()
+
+def start():
+    """Start the server once per process; note windows come and go with
+    open_note() / close_note()."""
+    def _run():
+        global _loop
+        _loop = _new_loop()
+        asyncio.set_event_loop(_loop)
+        _loop.run_until_complete(_serve(WS_HOST, WS_PORT))
+
+    metrics.serve()
+    t = threading.Thread(target=_run, daemon=True)
+    t.start()
+
+# ── Headless hub ──────────────────────────────────────────────────────────────
+# python -m sync --headless runs the server on its own, for an always-on box
+# with no display. Every note in the hub's store is a room: it is loaded on
+# the first hello that names it (clients that name none get the most
+# recently modified note, or _DEFAULT_ROOM while the store is empty), fan-out
+# only touches the clients in that room, edits are journaled to the store —
+# a room gets its row with its first edit, never before — and a room nobody
+# has followed for ROOM_IDLE_S is dropped from memory.
+
+_DEFAULT_ROOM = "default"
+class _Hub:
+    def __init__(self, data_dir: str):
+        # The note store and the journal are shared with the desktop app
+        from store import NoteStore
+        from journal import Journal
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir   = data_dir
+        self.store      = NoteStore(data_dir)
+        self.journal    = Journal(data_dir, self.store)
+        self._default   = None      # id of the note for clients that name none
+        self._unloading = {}        # note id → (text, ts) until the journal has it in the store
+
+    def load(self, note_id):
+        """Open a room (event loop thread). None for an id that can't be a note."""
+        if note_id is None:
+            if self._default is None:
+                recent = self.store.list_notes()
+                self._default = recent[0].id if recent else _DEFAULT_ROOM
+            note_id = self._default
+        elif not isinstance(note_id, str) or not _ROOM_ID.fullmatch(note_id):
+            return None
+        with _state_lock:
+            note = _notes.get(note_id)
+        if note is not None:
+            return note
+        saved = self._unloading.get(note_id) or self.store.load(note_id) or ("", 0.0)
+        journal = self.journal
+        open_note(note_id, saved[0], saved[1],
+                  lambda ops, _base, _version, ts: journal.record(note_id, ops, ts))
+        with _state_lock:
+            return _notes[note_id]
+
+    def room_empty(self, note):
+        _loop.call_later(ROOM_IDLE_S, self._unload, note)
+
+    def _unload(self, note):
+        with _state_lock:
+            if note.clients or _notes.get(note.id) is not note:
+                return                      # followed again, or already gone
+            del _notes[note.id]
+        text, _, ts = _state(note)
+        saved = self._unloading[note.id] = (text, ts)
+        def _done(_future):
+            if self._unloading.get(note.id) is saved:
+                del self._unloading[note.id]
+        _loop.run_in_executor(None, self.journal.flush).add_done_callback(_done)
+
+    def run(self, host: str, port: int):
+        global _loop, _room_loader, _on_room_empty
+        self.journal.recover()
+        _room_loader, _on_room_empty = self.load, self.room_empty
+        _loop = _new_loop()
+        asyncio.set_event_loop(_loop)
+        stop = _loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                _loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+            except (NotImplementedError, RuntimeError):
+                pass                        # no signal handlers here — Ctrl+C still stops it
+        metrics.serve()
+        print(f"[Sync] Headless hub — notes in {self.data_dir}"
+              f"{' (uvloop)' if uvloop is not None and SYNC_UVLOOP else ''}")
+        try:
+            _loop.run_until_complete(_serve(host, port, stop))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.journal.close()            # everything edited ends up in the store
+            self.store.close()
+            print("[Sync] Hub stopped.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sync",
+                                     description="Sticky Notes sync server.")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the hub on its own, without the desktop app")
+    parser.add_argument("--host", default=WS_HOST, help=f"address to listen on (default {WS_HOST})")
+    parser.add_argument("--port", type=int, default=WS_PORT, help=f"port (default {WS_PORT})")
+    parser.add_argument("--data-dir", default=HUB_DATA_DIR,
+                        help=f"where the hub keeps its notes (default {HUB_DATA_DIR})")
+    args = parser.parse_args(argv)
+    if not args.headless:
+        parser.error("the desktop app starts the server itself — pass --headless to run a hub")
+    _Hub(args.data_dir).run(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+bench.py — benchmarks for the Sticky Notes sync server and persistence
+========================================================================
+Runs the real sync server (sync.start(), no GTK) on a free local port and
+drives it from simulated phones in a child process, then times the
+persistence paths on a scratch data dir:
+
+  sync        — N clients follow one note while the "desktop" publishes
+                edits: updates/s flat out, then p50/p99 edit → phone
+                latency at a steady rate, and server memory per connection
+  snapshots   — a client connecting (full text) and resuming (hello with
+                session + version) on notes of every size
+  persistence — save_note() made durable (journal append + fsync + fold
+                into notes.db) and reading it back as a window streams it, per size
+
+  python bench.py                               # JSON on stdout
+  python bench.py --clients 200 --out results.json
+  python bench.py --sizes 1K,1M --updates 200
+
+Results are JSON (with the git revision, Python and websockets versions),
+so runs from different releases can be compared. Server logging goes to
+stderr.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "common"))
+
+DEFAULT_SIZES = "1K,64K,1M,10M,50M"
+
+
+def _parse_size(text: str) -> int:
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper()
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def _text(size: int) -> str:
+    line = "The quick brown fox jumps over the lazy dog. 0123456789\n"
+    return (line * (size // len(line) + 1))[:size]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _listening(port: int) -> bool:
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+def _rss() -> int:
+    """Resident memory of this process in bytes (0 where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_ms": round(pick(0.50) * 1000, 3), "p99_ms": round(pick(0.99) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3), "samples": len(samples)}
+
+
+# ── Simulated phones (child process) ──────────────────────────────────────────
+# Talks to the parent over stdin / stdout, one JSON object per line:
+#   → {"ready": true, "version": v}            every client has the note
+#   ← {"final": v}                             the desktop published up to v
+#   → {"records": [[base, version, t], ...]}   every patch / update received since
+#   ← {"quit": true}
+async def _worker(port: int, clients: int):
+    import websockets
+    url = f"ws://127.0.0.1:{port}"
+    conns, last, records = [], [], []
+    for _ in range(clients):
+        ws = await websockets.connect(url, max_size=None)
+        await ws.send(json.dumps({"type": "hello", "caps": ["patch"], "note": "bench"}))
+        conns.append(ws)
+    for ws in conns:
+        last.append(json.loads(await ws.recv())["version"])
+
+    async def _receive(i, ws):
+        async for raw in ws:
+            now = time.monotonic()
+            msg = json.loads(raw)
+            if msg["type"] == "ping":
+                await ws.send('{"type": "pong"}')
+            elif msg["type"] in ("patch", "update"):      # an update stands in for a backlog
+                records.append((max(msg.get("base", 0), last[i]), msg["version"], now))
+                last[i] = msg["version"]
+
+    tasks = [asyncio.ensure_future(_receive(i, ws)) for i, ws in enumerate(conns)]
+    print(json.dumps({"ready": True, "version": min(last)}), flush=True)
+    loop = asyncio.get_running_loop()
+    while True:
+        cmd = json.loads(await loop.run_in_executor(None, sys.stdin.readline))
+        if cmd.get("quit"):
+            break
+        while min(last) < cmd["final"]:
+            await asyncio.sleep(0.005)
+        print(json.dumps({"records": records}), flush=True)
+        records.clear()
+    for task in tasks:
+        task.cancel()
+    for ws in conns:
+        await ws.close()
+
+
+# ── Sync fan-out ──────────────────────────────────────────────────────────────
+def _publish(sync, updates: int, rate: float, published: dict):
+    """Type `updates` one-character edits as the desktop would."""
+    version = sync.snapshot("bench").version
+    for i in range(updates):
+        if rate:
+            time.sleep(1 / rate)
+        version = sync.broadcast_patch("bench", version, [[0, 0, "x"]], time.time())
+        published[version] = time.monotonic()
+    return version
+
+def _phase(sync, worker, updates: int, rate: float):
+    published = {}
+    started = time.monotonic()
+    final = _publish(sync, updates, rate, published)
+    publish_s = time.monotonic() - started
+    worker.stdin.write(json.dumps({"final": final}) + "\n")
+    worker.stdin.flush()
+    records = json.loads(worker.stdout.readline())["records"]
+    latencies, delivered, done = [], 0, started
+    for base, version, t in records:
+        for v in range(base + 1, version + 1):      # a merged patch carries several edits
+            if v in published:
+                latencies.append(t - published[v])
+                delivered += 1
+        done = max(done, t)
+    return {"updates": updates, "rate": rate or None,
+            "published_per_s": round(updates / publish_s, 1) if publish_s else None,
+            "delivered": delivered,
+            "delivered_per_s": round(delivered / (done - started), 1) if done > started else None,
+            "frames": len(records),
+            "latency": _percentiles(latencies)}
+
+def bench_sync(sync, port: int, clients: int, updates: int, rate: float):
+    sync.open_note("bench", _text(1024), time.time(), None)
+    rss_before = _rss()
+    worker = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker",
+                               "--port", str(port), "--clients", str(clients)],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        ready = json.loads(worker.stdout.readline())
+        if not ready.get("ready"):
+            raise RuntimeError("simulated clients did not connect")
+        time.sleep(0.2)                             # let the server settle
+        rss_after = _rss()
+        result = {
+            "clients": clients,
+            "connected": len(sync.clients()),
+            "bytes_per_connection": (rss_after - rss_before) // clients if rss_before else None,
+            "throughput": _phase(sync, worker, updates, 0),
+            "steady": _phase(sync, worker, min(updates, int(rate * 5) or updates), rate),
+        }
+        worker.stdin.write(json.dumps({"quit": True}) + "\n")
+        worker.stdin.flush()
+        worker.wait(30)
+    finally:
+        if worker.poll() is None:
+            worker.kill()
+        sync.close_note("bench")
+    return result
+
+
+# ── Reconnect snapshots ───────────────────────────────────────────────────────
+async def _snapshot_once(port: int, note_id: str):
+    import websockets
+    url = f"ws://127.0.0.1:{port}"
+    started = time.monotonic()
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "hello", "caps": ["patch"], "note": note_id}))
+        raw = await ws.recv()
+        full = time.monotonic() - started
+    msg = json.loads(raw)
+    started = time.monotonic()
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "hello", "caps": ["patch"], "note": note_id,
+                                  "session": msg["session"], "version": msg["version"]}))
+        await ws.recv()                             # just an ack
+        resume = time.monotonic() - started
+    return full, resume, len(raw)
+
+def bench_snapshots(sync, port: int, sizes, repeat: int):
+    results = []
+    for size in sizes:
+        note_id = f"snap{size}"
+        sync.open_note(note_id, _text(size), time.time(), None)
+        runs = [asyncio.run(_snapshot_once(port, note_id)) for _ in range(repeat)]
+        sync.close_note(note_id)
+        results.append({"size": size, "wire_bytes": runs[0][2],
+                        "full_ms": round(statistics.median(r[0] for r in runs) * 1000, 3),
+                        "resume_ms": round(statistics.median(r[1] for r in runs) * 1000, 3)})
+        print(f"[Bench] snapshot {size} B: {results[-1]['full_ms']} ms", file=sys.stderr)
+    return results
+
+
+# ── Persistence ───────────────────────────────────────────────────────────────
+def bench_persistence(sizes, repeat: int):
+    from store import NoteStore
+    from journal import Journal
+    directory = tempfile.mkdtemp(prefix="sticky-bench-")
+    store   = NoteStore(directory)
+    journal = Journal(directory, store)
+    journal.recover()
+    results = []
+    try:
+        for size in sizes:
+            text, note_id = _text(size), store.create()
+            saves, loads = [], []
+            for i in range(repeat):
+                body = text[:-1] + str(i % 10)      # a real change every time
+                started = time.perf_counter()
+                journal.record_text(note_id, body, time.time())   # what save_note() queues
+                journal.flush()                                   # …until it is on disk
+                saves.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                for _ in store.read_chunks(note_id):              # what a note window streams in
+                    pass
+                loads.append(time.perf_counter() - started)
+            results.append({"size": size,
+                            "save_ms": round(statistics.median(saves) * 1000, 3),
+                            "load_ms": round(statistics.median(loads) * 1000, 3)})
+            print(f"[Bench] save/load {size} B: {results[-1]['save_ms']} / "
+                  f"{results[-1]['load_ms']} ms", file=sys.stderr)
+    finally:
+        journal.close()
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+# ── Entry point ───────────────────────────────────────────────────────────────
+def _meta(args):
+    try:
+        revision = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=HERE,
+                                  capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    import websockets
+    return {"revision": revision, "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "websockets": websockets.__version__, "args": vars(args)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Sticky Notes sync server and persistence.")
+    parser.add_argument("--clients", type=int, default=50, help="simulated phones (default 50)")
+    parser.add_argument("--updates", type=int, default=1000, help="edits published per run (default 1000)")
+    parser.add_argument("--rate", type=float, default=100, help="edits/s for the latency run (default 100)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"note sizes (default {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size, median kept (default 3)")
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        asyncio.run(_worker(args.port, args.clients))
+        return
+
+    sizes = [_parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    port  = _free_port()
+    # The server reads its config on import
+    os.environ.update(WS_HOST="127.0.0.1", WS_PORT=str(port), DISCOVERY="0",
+                      SYNC_MAX_CLIENTS=str(max(args.clients + 16, 1024)))
+    with contextlib.redirect_stdout(sys.stderr):
+        import sync
+        sync.start()
+        while sync._loop is None or not _listening(port):
+            time.sleep(0.05)
+        results = {"meta": _meta(args),
+                   "sync": bench_sync(sync, port, args.clients, args.updates, args.rate),
+                   "snapshots": bench_snapshots(sync, port, sizes, args.repeat),
+                   "persistence": bench_persistence(sizes, args.repeat)}
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"[Bench] Results written to {args.out}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+buddy.py — the animated Pokémon buddy for Sticky Notes (Linux)
+================================================================
+A fixed-size drawing area that paints the sprite (or the offline ASCII
+buddy) itself, so bobbing it up and down is a redraw of this one widget —
+never a relayout of the note.
+
+The animation runs on the widget's frame clock (add_tick_callback) and
+looks its frame up in tables computed once at import: the bob offset in
+whole pixels and the breathing opacity in ANIM_ALPHA_STEPS steps. A frame
+that comes out the same as the last one is not drawn at all.
+
+It stops completely — no tick callback, no timer — while the note window is
+unmapped, minimised or fully covered, and once nobody has touched the note
+for ANIM_IDLE_S seconds. Any key, click, pointer crossing or focus on the
+note starts it again.
+"""
+
+import math
+import os
+import time
+
+import gi
+gi.require_version("PangoCairo", "1.0")
+from gi.repository import Gtk, Gdk, Pango, PangoCairo
+
+import metrics
+
+ANIM_IDLE_S      = float(os.getenv("ANIM_IDLE_S",    "30"))
+ANIM_ALPHA_STEPS = int(os.getenv("ANIM_ALPHA_STEPS", "32"))
+
+BOB_PERIOD_S     = math.pi              # 6 px up and down
+BREATHE_PERIOD_S = math.pi / 0.7        # opacity in and out
+BOB_PX           = 6
+BOB_MARGIN       = 8                    # resting height above the bottom edge
+
+_TABLE_SIZE = 256
+_SINE       = [math.sin(2 * math.pi * i / _TABLE_SIZE) for i in range(_TABLE_SIZE)]
+_BOB        = [round(BOB_PX * s) for s in _SINE]
+
+def _breathe_table(low: float, high: float):
+    mid, amp = (low + high) / 2, (high - low) / 2
+    return [round((mid + amp * s) * ANIM_ALPHA_STEPS) / ANIM_ALPHA_STEPS for s in _SINE]
+
+_BREATHE_SPRITE = _breathe_table(0.65, 1.0)
+_BREATHE_TEXT   = _breathe_table(0.7, 1.0)
+
+_PAUSING_STATES = Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN
+
+FRAME = metrics.histogram("sticky_buddy_frame_seconds", "Time to draw one buddy frame")
+
+
+class Buddy(Gtk.DrawingArea):
+    def __init__(self, size: int = 128):
+        super().__init__()
+        self.size      = size
+        self._pixbuf   = None
+        self._layout   = None
+        self._breathe  = _BREATHE_SPRITE
+        self._frame    = (0, 1.0)       # (bob offset, opacity) being shown
+        self._tick_id  = None
+        self._active   = 0.0            # frame time (µs) of the last interaction
+        self._hidden   = False          # minimised / withdrawn
+        self._covered  = False          # fully obscured
+        self.set_size_request(size, size + 2 * BOB_MARGIN)
+        self.connect("map", lambda *_: self._update())
+        self.connect("unmap", lambda *_: self._stop())
+
+    # ── Content ───────────────────────────────────────────────────────────
+    def show_sprite(self, pixbuf):
+        self._pixbuf, self._layout = pixbuf, None
+        self._breathe = _BREATHE_SPRITE
+        self.set_size_request(pixbuf.get_width(), pixbuf.get_height() + 2 * BOB_MARGIN)
+        self.poke()
+
+    def show_text(self, text: str):
+        layout = self.create_pango_layout(text)
+        layout.set_alignment(Pango.Alignment.CENTER)
+        width, height = layout.get_pixel_size()
+        self._pixbuf, self._layout = None, layout
+        self._breathe = _BREATHE_TEXT
+        self.set_size_request(width, height + 2 * BOB_MARGIN)
+        self.poke()
+
+    # ── Running and pausing ───────────────────────────────────────────────
+    def attach(self, window):
+        """Follow `window` to know when nobody can see or is using the buddy."""
+        window.add_events(Gdk.EventMask.VISIBILITY_NOTIFY_MASK)
+        window.connect("window-state-event", self._on_window_state)
+        window.connect("visibility-notify-event", self._on_visibility)
+        for signal in ("key-press-event", "button-press-event",
+                       "enter-notify-event", "focus-in-event"):
+            window.connect(signal, lambda *_: self.poke() or False)
+
+    def poke(self):
+        """Someone touched the note — animate for another ANIM_IDLE_S."""
+        clock = self.get_frame_clock()
+        self._active = clock.get_frame_time() if clock else 0.0
+        self._update()
+
+    def _on_window_state(self, _window, event):
+        self._hidden = bool(event.new_window_state & _PAUSING_STATES)
+        self._update()
+        return False
+
+    def _on_visibility(self, _window, event):
+        self._covered = event.state == Gdk.VisibilityState.FULLY_OBSCURED
+        self._update()
+        return False
+
+    def _update(self):
+        if (self._pixbuf or self._layout) and self.get_mapped() \
+                and not (self._hidden or self._covered):
+            if self._tick_id is None:
+                self._tick_id = self.add_tick_callback(self._tick)
+        else:
+            self._stop()
+
+    def _stop(self):
+        if self._tick_id is not None:
+            self.remove_tick_callback(self._tick_id)
+            self._tick_id = None
+
+    def _tick(self, _widget, clock):
+        now = clock.get_frame_time()                    # µs
+        if not self._active:
+            self._active = now
+        elif now - self._active > ANIM_IDLE_S * 1e6:
+            self._tick_id = None                        # idle — stop until poked
+            return False
+        t = now / 1e6
+        frame = (_BOB[int(t / BOB_PERIOD_S * _TABLE_SIZE) % _TABLE_SIZE],
+                 self._breathe[int(t / BREATHE_PERIOD_S * _TABLE_SIZE) % _TABLE_SIZE])
+        if frame != self._frame:
+            self._frame = frame
+            self.queue_draw()
+        return True
+
+    # ── Drawing ───────────────────────────────────────────────────────────
+    def do_draw(self, cr):
+        if metrics.ENABLED:
+            started = time.perf_counter()
+        bob, alpha = self._frame
+        height = self.get_allocated_height()
+        if self._pixbuf is not None:
+            y = height - self._pixbuf.get_height() - BOB_MARGIN - bob
+            Gdk.cairo_set_source_pixbuf(cr, self._pixbuf, 0, y)
+            cr.paint_with_alpha(alpha)
+        elif self._layout is not None:
+            _, text_height = self._layout.get_pixel_size()
+            color = self.get_style_context().get_color(self.get_state_flags())
+            cr.set_source_rgba(color.red, color.green, color.blue, color.alpha * alpha)
+            cr.move_to(0, height - text_height - BOB_MARGIN - bob)
+            PangoCairo.show_layout(cr, self._layout)
+        if metrics.ENABLED:
+            FRAME.observe(time.perf_counter() - started)
+        return False
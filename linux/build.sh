@@ -47,6 +47,7 @@ pyinstaller \
     --onefile \
     --name "sticky_notes" \
     --noconsole \
+    --paths ../common \
     main.py
 
 echo ""
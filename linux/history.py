@@ -0,0 +1,324 @@
+"""
+history.py — version history of every note for Sticky Notes
+==============================================================
+Past versions live in history.db, next to notes.db:
+
+  versions (note, rev, ts, size, snap, data)   — keyed by (note, rev), indexed by (note, ts)
+
+`data` is zlib-compressed: the whole text for a snapshot (snap = 1), or
+the ops (delta.py) that turn the note's previous version into this one. A
+snapshot is written every HISTORY_SNAPSHOT_EVERY versions, or sooner once
+the deltas since the last one outweigh it, so reading any version — by
+rev or by time — is an index lookup for its nearest snapshot plus a short
+run of deltas: O(log n) in the number of versions. search() finds the
+versions of a note containing some text in one pass over all of them;
+they are not in the search index (search.py), which holds current text.
+
+The journal writer (journal.py) shows the history each note's text just
+before an edit. It becomes a version when the note's newest one is older
+than HISTORY_INTERVAL_S, when the edit deletes HISTORY_BIG_EDIT_CHARS or
+more (a remote update wiping the note, say) or when mark() asked for it.
+Storage follows the editing, not the saving: a minute of typing costs one
+delta however many times it was saved, and an idle note costs nothing.
+
+Retention, applied by compact() on a background thread: every version
+from the last HISTORY_KEEP_ALL_H hours, then the last one of each day up
+to HISTORY_KEEP_DAYS, nothing older — but a note always keeps its newest
+version. Deltas whose previous version was dropped are rewritten against
+the one before.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from delta import apply_ops, diff
+
+HISTORY_INTERVAL_S     = float(os.getenv("HISTORY_INTERVAL_S",     "60"))
+HISTORY_BIG_EDIT_CHARS = int(os.getenv("HISTORY_BIG_EDIT_CHARS",   "500"))
+HISTORY_SNAPSHOT_EVERY = int(os.getenv("HISTORY_SNAPSHOT_EVERY",   "32"))
+HISTORY_KEEP_ALL_H     = float(os.getenv("HISTORY_KEEP_ALL_H",     "24"))
+HISTORY_KEEP_DAYS      = float(os.getenv("HISTORY_KEEP_DAYS",      "90"))
+HISTORY_COMPACT_H      = float(os.getenv("HISTORY_COMPACT_H",      "6"))
+
+Version = namedtuple("Version", "rev ts size")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    note TEXT    NOT NULL,
+    rev  INTEGER NOT NULL,
+    ts   REAL    NOT NULL,
+    size INTEGER NOT NULL,
+    snap INTEGER NOT NULL,
+    data BLOB    NOT NULL,
+    PRIMARY KEY (note, rev)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS versions_by_ts ON versions (note, ts);
+"""
+
+
+def _encode_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+def _encode_ops(ops) -> bytes:
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def _decode(previous: str, snap: int, data: bytes) -> str:
+    raw = zlib.decompress(data).decode("utf-8")
+    return raw if snap else apply_ops(previous, json.loads(raw))
+
+def _text_at(db, note_id: str, rev: int):
+    """Text of version `rev`: its nearest snapshot, then the deltas up to it."""
+    if db.execute("SELECT 1 FROM versions WHERE note = ? AND rev = ?", (note_id, rev)).fetchone() is None:
+        return None
+    snap_rev = db.execute("SELECT MAX(rev) FROM versions WHERE note = ? AND rev <= ? AND snap",
+                          (note_id, rev)).fetchone()[0]
+    text = None
+    for snap, data in db.execute("SELECT snap, data FROM versions WHERE note = ? AND rev BETWEEN ? AND ? "
+                                 "ORDER BY rev", (note_id, snap_rev, rev)):
+        text = _decode(text, snap, data)
+    return text
+
+def _retained(rows, now: float):
+    """Revs the retention policy keeps out of (rev, ts, …) rows in rev order."""
+    keep, last_of_day = set(), {}
+    for rev, ts, *_ in rows:
+        age = now - ts
+        if age <= HISTORY_KEEP_ALL_H * 3600:
+            keep.add(rev)
+        elif age <= HISTORY_KEEP_DAYS * 86400:
+            last_of_day[time.localtime(ts)[:3]] = rev
+    keep.update(last_of_day.values())
+    if rows:
+        keep.add(rows[-1][0])
+    return keep
+
+
+class _Tip:
+    """A note's newest version, kept by the writer so the next delta needs
+    nothing read back."""
+    __slots__ = ("rev", "ts", "text", "chain", "chain_bytes", "snap_bytes")
+
+    def __init__(self, rev=0, ts=0.0, text=None, chain=0, chain_bytes=0, snap_bytes=0):
+        self.rev, self.ts, self.text = rev, ts, text
+        self.chain       = chain        # deltas since the last snapshot
+        self.chain_bytes = chain_bytes
+        self.snap_bytes  = snap_bytes
+
+
+class History:
+    def __init__(self, directory: str, filename: str = "history.db"):
+        self.path    = os.path.join(directory, filename)
+        self._writer = None     # journal thread only
+        self._reader = None
+        self._rlock  = threading.Lock()
+        self._tips   = {}       # note id → _Tip (rev 0: no versions yet), loaded on first edit
+        self._queued = []       # (note id, text, ts, previous text) waiting for write()
+        self._marked = set()    # notes whose next edit keeps a version regardless
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                             timeout=30)            # compaction may hold the write lock a while
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    def close(self):
+        with self._rlock:
+            for db in (self._writer, self._reader):
+                if db is not None:
+                    db.close()
+            self._writer = self._reader = None
+
+    # ── Recording (journal thread) ────────────────────────────────────────
+    def mark(self, note_id: str):
+        """Keep the note as it is now before its next edit (e.g. a restore). Any thread."""
+        self._marked.add(note_id)
+
+    def before_edit(self, note_id: str, text: str, ops, now: float = None):
+        """`text` is about to have `ops` applied: queue it as a version if
+        one is due. Costs a dict lookup when none is."""
+        now = time.time() if now is None else now
+        tip = self._tips.get(note_id)
+        if tip is None:
+            try:
+                tip = self._load_tip(note_id)
+            except (sqlite3.Error, ValueError, zlib.error) as e:
+                print(f"[History] Could not read the history of {note_id}: {e}")
+                self._tips.pop(note_id, None)
+                return
+        if now - tip.ts < HISTORY_INTERVAL_S and note_id not in self._marked \
+                and sum(n_del for _, n_del, _ in ops or ()) < HISTORY_BIG_EDIT_CHARS:
+            return
+        self._marked.discard(note_id)
+        if text != tip.text:
+            self._queued.append((note_id, text, now, tip.text))
+            tip.text = text
+        tip.ts = now
+
+    def write(self):
+        """Store what before_edit() queued, in one transaction."""
+        if not self._queued:
+            return
+        queued, self._queued = self._queued, []
+        db = self._writer
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            for note_id, text, ts, previous in queued:
+                self._append(db, self._tips[note_id], note_id, text, ts, previous)
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"[History] Could not save versions: {e}")
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            self._tips.clear()                      # re-read from what was committed
+
+    def _load_tip(self, note_id: str) -> _Tip:
+        if self._writer is None:
+            self._writer = self._connect()
+        db = self._writer
+        tip = _Tip()
+        db.execute("BEGIN")
+        try:
+            row = db.execute("SELECT rev, ts FROM versions WHERE note = ? ORDER BY rev DESC LIMIT 1",
+                             (note_id,)).fetchone()
+            if row is not None:
+                snap_rev, snap_bytes = db.execute(
+                    "SELECT rev, length(data) FROM versions WHERE note = ? AND snap "
+                    "ORDER BY rev DESC LIMIT 1", (note_id,)).fetchone()
+                chain, chain_bytes = db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(length(data)), 0) FROM versions "
+                    "WHERE note = ? AND rev > ?", (note_id, snap_rev)).fetchone()
+                tip.rev, tip.ts, tip.text = row[0], row[1], _text_at(db, note_id, row[0])
+                tip.chain, tip.chain_bytes, tip.snap_bytes = chain, chain_bytes, snap_bytes
+        finally:
+            if db.in_transaction:
+                db.execute("COMMIT")
+        self._tips[note_id] = tip
+        return tip
+
+    @staticmethod
+    def _append(db, tip: _Tip, note_id: str, text: str, ts: float, previous):
+        data = None
+        if previous is not None and tip.chain < HISTORY_SNAPSHOT_EVERY:
+            data = _encode_ops(diff(previous, text))
+            if tip.chain_bytes + len(data) > tip.snap_bytes:
+                data = None                         # the deltas outweigh a snapshot by now
+        if data is None:
+            data = _encode_text(text)
+            tip.chain, tip.chain_bytes, tip.snap_bytes = 0, 0, len(data)
+        else:
+            tip.chain       += 1
+            tip.chain_bytes += len(data)
+        tip.rev += 1
+        db.execute("INSERT INTO versions (note, rev, ts, size, snap, data) VALUES (?, ?, ?, ?, ?, ?)",
+                   (note_id, tip.rev, ts, len(text), int(tip.chain == 0), data))
+
+    # ── Reading (any thread) ──────────────────────────────────────────────
+    def _read(self, fn):
+        with self._rlock:
+            if self._reader is None:
+                self._reader = self._connect()
+            db = self._reader
+            db.execute("BEGIN")                     # one snapshot, whatever compaction does
+            try:
+                return fn(db)
+            finally:
+                db.execute("COMMIT")
+
+    def versions(self, note_id: str):
+        """Every kept version of a note, newest first."""
+        return self._read(lambda db: [Version(*row) for row in db.execute(
+            "SELECT rev, ts, size FROM versions WHERE note = ? ORDER BY rev DESC", (note_id,))])
+
+    def text(self, note_id: str, rev: int):
+        """Text of one version, or None if it is not kept."""
+        return self._read(lambda db: _text_at(db, note_id, rev))
+
+    def search(self, note_id: str, query: str):
+        """Kept versions of a note whose text contains `query`, ignoring
+        case, newest first — one pass over its snapshots and deltas."""
+        needle = query.lower()
+
+        def _scan(db):
+            hits, text = [], None
+            for rev, ts, size, snap, data in db.execute(
+                    "SELECT rev, ts, size, snap, data FROM versions WHERE note = ? ORDER BY rev",
+                    (note_id,)):
+                text = _decode(text, snap, data)
+                if needle in text.lower():
+                    hits.append(Version(rev, ts, size))
+            return hits[::-1]
+        return self._read(_scan)
+
+    def at(self, note_id: str, ts: float):
+        """The version that was current at time `ts`, or None."""
+        row = self._read(lambda db: db.execute(
+            "SELECT rev, ts, size FROM versions WHERE note = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+            (note_id, ts)).fetchone())
+        return Version(*row) if row else None
+
+    # ── Retention ─────────────────────────────────────────────────────────
+    def compact(self, now: float = None):
+        """Apply the retention policy to every note, one transaction per note."""
+        now = time.time() if now is None else now
+        db = self._connect()
+        try:
+            for (note_id,) in db.execute("SELECT DISTINCT note FROM versions").fetchall():
+                rows = db.execute("SELECT rev, ts FROM versions WHERE note = ? ORDER BY rev",
+                                  (note_id,)).fetchall()
+                if len(_retained(rows, now)) < len(rows):
+                    self._compact_note(db, note_id, now)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _compact_note(db, note_id: str, now: float):
+        db.execute("BEGIN IMMEDIATE")               # the writer waits; new versions build on the tip
+        try:
+            rows = db.execute("SELECT rev, ts, snap, data FROM versions WHERE note = ? ORDER BY rev",
+                              (note_id,)).fetchall()
+            keep = _retained(rows, now)
+            text, kept_text, chain, moved, dropped = None, None, 0, False, []
+            for rev, ts, snap, data in rows:
+                text = _decode(text, snap, data)
+                if rev not in keep:
+                    dropped.append((note_id, rev))
+                    moved = True
+                    continue
+                if kept_text is None or (not snap and chain + 1 >= HISTORY_SNAPSHOT_EVERY):
+                    if not snap:
+                        db.execute("UPDATE versions SET snap = 1, data = ? WHERE note = ? AND rev = ?",
+                                   (_encode_text(text), note_id, rev))
+                    chain = 0
+                elif snap:
+                    chain = 0
+                else:
+                    if moved:                       # its previous version is gone
+                        db.execute("UPDATE versions SET data = ? WHERE note = ? AND rev = ?",
+                                   (_encode_ops(diff(kept_text, text)), note_id, rev))
+                    chain += 1
+                kept_text, moved = text, False
+            db.executemany("DELETE FROM versions WHERE note = ? AND rev = ?", dropped)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        print(f"[History] Dropped {len(dropped)} old version(s) of {note_id}")
+
+    def start_compactor(self):
+        """compact() now and every HISTORY_COMPACT_H hours, on a daemon thread."""
+        def _run():
+            while True:
+                try:
+                    self.compact()
+                except (sqlite3.Error, ValueError) as e:
+                    print(f"[History] Compaction failed: {e}")
+                time.sleep(HISTORY_COMPACT_H * 3600)
+
+        threading.Thread(target=_run, name="history", daemon=True).start()
@@ -1,23 +1,32 @@
 #!/usr/bin/env python3
-import gi
-import os
 import sys
-import json
-import math
-import time
-import random
-import threading
-import urllib.request
-from dotenv import load_dotenv
-
-# .env lives in the repo root (one level above linux/)
-_ENV_FILE = os.path.join(os.path.dirname(__file__), "..", ".env")
-load_dotenv(dotenv_path=os.path.abspath(_ENV_FILE))
-gi.require_version('Gtk', '3.0')
-gi.require_version('Gdk', '3.0')
-gi.require_version('GdkX11', '3.0')
-gi.require_version('Wnck', '3.0')
-from gi.repository import Gtk, Gdk, GdkX11, Wnck, GLib, GdkPixbuf
+from startup import StartupProfile
+
+# --profile-startup is ours — take it out before GApplication sees it
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+if PROFILE_STARTUP:
+    sys.argv.remove("--profile-startup")
+_profile = StartupProfile(PROFILE_STARTUP)
+
+# Only what the first window needs is imported here; libwnck, the sync
+# server and the sprite machinery are loaded after it is on screen.
+with _profile.phase("import GTK"):
+    import gi
+    import os
+    import json
+    import time
+    import random
+    from collections import OrderedDict, defaultdict, deque
+    from dotenv import load_dotenv
+
+    # .env lives in the repo root (one level above linux/)
+    _ENV_FILE = os.path.join(os.path.dirname(__file__), "..", ".env")
+    load_dotenv(dotenv_path=os.path.abspath(_ENV_FILE))
+    gi.require_version('Gtk', '3.0')
+    gi.require_version('Gdk', '3.0')
+    gi.require_version('GdkX11', '3.0')
+    gi.require_version('Wnck', '3.0')
+    from gi.repository import Gtk, Gdk, GLib, GdkPixbuf, Pango
 
 # ── Persistence — OS-aware save location ─────────────────────────────────────
 
@@ -34,37 +43,75 @@ def _get_data_dir():
     return os.path.join(base, "sticky-notes")
 
 DATA_DIR   = _get_data_dir()
-NOTE_FILE  = os.path.join(DATA_DIR, "note.txt")
-TS_FILE    = os.path.join(DATA_DIR, "note.ts")   # stores last-modified timestamp
 os.makedirs(DATA_DIR, exist_ok=True)
-print(f"[INFO] Notes saved to: {NOTE_FILE}")
-
-def load_note():
-    if os.path.exists(NOTE_FILE):
-        with open(NOTE_FILE, "r") as f:
-            return f.read()
-    return ""
-
-def load_ts() -> float:
-    if os.path.exists(TS_FILE):
-        try:
-            return float(open(TS_FILE).read().strip())
-        except Exception:
-            pass
-    return 0.0
-
-def save_note(text, ts: float = None):
-    if ts is None:
-        ts = time.time()
-    with open(NOTE_FILE, "w") as f:
-        f.write(text)
-    with open(TS_FILE, "w") as f:
-        f.write(str(ts))
+print(f"[INFO] Notes saved to: {DATA_DIR}")
+
+# Shared, toolkit-agnostic modules (note store, …) live in ../common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+with _profile.phase("import app modules"):
+    from store import NoteStore
+    from debounce import Debouncer
+    from journal import Journal
+    from search import SearchIndex
+    from history import History
+    from loader import ChunkedLoader
+    from bridge import Bridge
+    from delta import OpRecorder, diff, shift_offset
+    import metrics
+    from buddy import Buddy
+
+# All notes live in one indexed store (store.py). Edits go to an append-only
+# journal written by a background thread and folded into the store now and
+# then (journal.py), which also keeps the search index (search.py) and the
+# version history (history.py) up to date.
+_store   = NoteStore(DATA_DIR)
+_index   = SearchIndex(DATA_DIR)
+_history = History(DATA_DIR)
+_journal = Journal(DATA_DIR, _store, _index, _history)   # recovered by the primary instance only
+
+# Worker threads (sync server, sprite fetcher) hand their results to the GTK
+# thread through one bridge — one idle callback per batch (bridge.py)
+_bridge = Bridge(GLib.idle_add)
+
+def _import_legacy_note():
+    """First run after upgrading from a single-note layout: the note.json
+    snapshot of the old journal, or the older note.txt / note.ts pair."""
+    text, ts = "", 0.0
+    try:
+        with open(os.path.join(DATA_DIR, "note.json"), "r", encoding="utf-8") as f:
+            snap = json.load(f)
+        text, ts = snap["text"], float(snap["ts"])
+    except FileNotFoundError:
+        note_file = os.path.join(DATA_DIR, "note.txt")
+        if os.path.exists(note_file):
+            with open(note_file, "r") as f:
+                text = f.read()
+            try:
+                with open(os.path.join(DATA_DIR, "note.ts")) as f:
+                    ts = float(f.read().strip())
+            except (OSError, ValueError):
+                pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"[WARN] Could not import note.json: {e}")
+    return _store.create(text, ts)
+
+def _startup_notes():
+    """The notes that had a window open when the app last quit — or the most
+    recently modified one. Only the index is read for this."""
+    open_ids = _store.open_notes()
+    if open_ids:
+        return open_ids
+    recent = _store.list_notes()
+    return [recent[0].id if recent else _import_legacy_note()]
+
+def save_note(note_id, text, ts: float = None):
+    """Queue a full save of `text` — returns immediately."""
+    _journal.record_text(note_id, text, time.time() if ts is None else ts)
 
 # ── Pokémon buddy ─────────────────────────────────────────────────────────────
 TOTAL_POKEMON   = int(os.getenv("TOTAL_POKEMON",   "151"))
 MAX_RETRIES     = int(os.getenv("MAX_RETRIES",     "3"))
-RETRY_DELAY_S   = int(os.getenv("RETRY_DELAY_S",   "5"))
+RETRY_DELAY_S   = float(os.getenv("RETRY_DELAY_S", "5"))   # backoff base — doubles per retry, jittered
 POKEAPI_BASE_URL = os.getenv("POKEAPI_BASE_URL", "https://pokeapi.co/api/v2/pokemon")
 
 # Offline fallback — shown when there's no internet connection
@@ -76,41 +123,32 @@ OFFLINE_POKEMON = [
     ("Gengar",     "👻\n(ΦωΦ)\n Boo!"),
 ]
 
-def fetch_pokemon(callback):
-    """Fetch a random Pokémon sprite + name in a background thread.
-    Retries up to MAX_RETRIES times, then falls back to an offline placeholder."""
-    def _fetch():
-        headers = {"User-Agent": os.getenv("USER_AGENT", "sticky-notes-app/1.0")}
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                poke_id    = random.randint(1, TOTAL_POKEMON)
-                api_url    = f"{POKEAPI_BASE_URL}/{poke_id}"
-
-                req = urllib.request.Request(api_url, headers=headers)
-                with urllib.request.urlopen(req, timeout=6) as r:
-                    data = json.loads(r.read())
-
-                name       = data["name"].capitalize()
-                sprite_url = data["sprites"]["front_default"]
-
-                req2 = urllib.request.Request(sprite_url, headers=headers)
-                with urllib.request.urlopen(req2, timeout=6) as r:
-                    img_bytes = r.read()
+# Sprites downloaded on earlier runs (sprites.py) — a buddy is shown from
+# there at once. Downloads go through one pool of keep-alive connections
+# (fetcher.py) that also prefetches a few more Pokémon (pokeapi.py).
+SPRITE_CACHE_MAX_BYTES = int(os.getenv("SPRITE_CACHE_MAX_BYTES", str(4 << 20)))
+SPRITE_PREFETCH        = int(os.getenv("SPRITE_PREFETCH",        "3"))
+FETCH_WORKERS          = int(os.getenv("FETCH_WORKERS",          "4"))
+_pokeapi = None
+
+def _start_sprites():
+    """Open the sprite cache and start the fetcher pool (deferred startup stage)."""
+    global _pokeapi
+    from sprites import SpriteCache
+    from fetcher import Fetcher
+    from pokeapi import PokeClient
+    _pokeapi = PokeClient(
+        SpriteCache(os.path.join(DATA_DIR, "sprites"), SPRITE_CACHE_MAX_BYTES),
+        Fetcher(workers=FETCH_WORKERS, retries=MAX_RETRIES, backoff=RETRY_DELAY_S,
+                user_agent=os.getenv("USER_AGENT", "sticky-notes-app/1.0")),
+        POKEAPI_BASE_URL, TOTAL_POKEMON, SPRITE_PREFETCH,
+    )
 
-                GLib.idle_add(callback, name, img_bytes)
-                return  # success — stop retrying
-
-            except Exception as e:
-                print(f"[Pokémon] Attempt {attempt}/{MAX_RETRIES} failed: {e}")
-                if attempt < MAX_RETRIES:
-                    import time
-                    time.sleep(RETRY_DELAY_S)
-
-        # All retries exhausted — use offline fallback
-        print("[Pokémon] No internet — using offline buddy.")
-        GLib.idle_add(callback, None, None)
-
-    threading.Thread(target=_fetch, daemon=True).start()
+def fetch_pokemon(callback):
+    """Pick a Pokémon for a note window; callback(name, img_bytes) runs on
+    the GTK thread, with (None, None) for the offline placeholder."""
+    _pokeapi.buddy(lambda name, img_bytes: _bridge.post(callback, name, img_bytes),
+                   lambda: _bridge.post(callback, None, None))
 
 
 # ── Transparency via RGBA visual ──────────────────────────────────────────────
@@ -121,7 +159,7 @@ def apply_rgba_visual(widget, *_):
         widget.set_visual(visual)
 
 # ── CSS: semi-transparent yellow background ───────────────────────────────────
-
+# One provider for the whole screen — every note window picks it up.
 css = b"""
 window {
     background-color: rgba(255, 218, 65, 0);
@@ -133,181 +171,715 @@ textview, textview text {
     font-size: 20px;
 }
 """
-prov = Gtk.CssProvider()
-prov.load_from_data(css)
-Gtk.StyleContext.add_provider_for_screen(
-    Gdk.Screen.get_default(), prov,
-    Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
-)
-
-# Create's the main window
-window = Gtk.Window(title="Sticky Note")
-window.set_default_size(300, 200)
-window.set_border_width(1)
-window.set_resizable(True)
-window.set_app_paintable(True)          
-window.connect("screen-changed", apply_rgba_visual)
-apply_rgba_visual(window)               # apply immediately
-
-# Make the window always on top and sticky (all workspaces)
-window.set_keep_above(True)   # GTK asks WM to keep it above others:contentReference[oaicite:2]{index=2}
-window.stick()                # GTK asks WM to keep it on all desktops:contentReference[oaicite:3]{index=3}
-
-# (Optional) Use libwnck to enforce sticky/above as an X11 hint:
-screen = Wnck.Screen.get_default()
-screen.force_update()  # Populate Wnck window list
-# Get the X11 window ID (XID) of our Gtk.Window
-gdk_window = window.get_window()
-if gdk_window:
-    xid = gdk_window.get_xid()
-    wnck_win = Wnck.Window.get(xid)
+
+def _load_css():
+    prov = Gtk.CssProvider()
+    prov.load_from_data(css)
+    Gtk.StyleContext.add_provider_for_screen(
+        Gdk.Screen.get_default(), prov,
+        Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+    )
+
+# ── libwnck: sticky / above as X11 hints ──────────────────────────────────────
+# force_update() walks every window on the screen, so it waits until the
+# first note is up. Not available off X11 — GTK's own hints still apply.
+_wnck_screen = None
+
+def _start_wnck():
+    global _wnck_screen
+    from gi.repository import Wnck
+    _wnck_screen = Wnck.Screen.get_default()
+    if _wnck_screen is not None:
+        _wnck_screen.force_update()  # Populate Wnck window list
+
+def _pin_with_wnck(window):
+    """Use libwnck to enforce sticky/above for `window`."""
+    gdk_window = window.get_window()
+    if _wnck_screen is None or gdk_window is None:
+        return
+    from gi.repository import GdkX11, Wnck
+    if not isinstance(gdk_window, GdkX11.X11Window):
+        return
+    # Get the X11 window ID (XID) of our Gtk.Window
+    wnck_win = Wnck.Window.get(gdk_window.get_xid())
     if wnck_win:
         wnck_win.stick()         # Set the Wnck sticky state
         wnck_win.make_above()    # Set the Wnck above state
 
-# ── Main layout ──────────────────────────────────────────────────────────────
-# Overlay lets us float the Pokémon sprite over the text area
-overlay = Gtk.Overlay()
-window.add(overlay)
-
-# Text area for note content — wrapped in a ScrolledWindow so the
-# window never grows; scrollbars appear when content overflows.
-scrolled = Gtk.ScrolledWindow()
-scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-scrolled.set_hexpand(True)
-scrolled.set_vexpand(True)
-
-textview = Gtk.TextView()
-textview.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)  # wrap at word boundaries, then chars
-textview.set_hexpand(False)                      # don't request extra horizontal space
-textview.set_size_request(0, -1)                 # allow textview to shrink horizontally
-textview.set_left_margin(5)
-textview.set_right_margin(5)
-
-# Load previously saved note text
-buf = textview.get_buffer()
-buf.set_text(load_note())
-scrolled.add(textview)
-overlay.add(scrolled)
-
-# ── Pokémon corner widget ─────────────────────────────────────────────────────
-poke_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
-poke_box.set_halign(Gtk.Align.END)
-poke_box.set_valign(Gtk.Align.END)
-poke_box.set_margin_end(4)
-poke_box.set_margin_bottom(2)
-
-poke_image = Gtk.Image()
-
-poke_box.pack_start(poke_image, False, False, 0)
-overlay.add_overlay(poke_box)
-overlay.set_overlay_pass_through(poke_box, True)  # clicks pass through to textview
-
-def on_pokemon_loaded(name, img_bytes):
-    import math
-    anim_step = [0]
-
-    # ── Offline fallback: show ASCII buddy ────────────────────────────────
-    if img_bytes is None:
-        fallback_name, ascii_art = random.choice(OFFLINE_POKEMON)
-        lbl = Gtk.Label(label=ascii_art)
-        lbl.set_justify(Gtk.Justification.CENTER)
-        lbl.set_opacity(0.85)
-        poke_box.pack_start(lbl, False, False, 0)
-        poke_box.show_all()
-        window.set_title(f"Sticky Note  •  {fallback_name} (offline)")
-
-        def animate_offline():
-            t = anim_step[0] * 0.1
-            bob = int(8 + 6 * math.sin(t))
-            poke_box.set_margin_bottom(bob)
-            opacity = 0.7 + 0.3 * ((math.sin(t * 0.7) + 1) / 2)
-            lbl.set_opacity(opacity)
-            anim_step[0] += 1
-            return GLib.SOURCE_CONTINUE
-
-        GLib.timeout_add(50, animate_offline)
-        return
-
-    # ── Online: render sprite ─────────────────────────────────────────────
-    try:
-        loader = GdkPixbuf.PixbufLoader()
-        loader.write(img_bytes)
-        loader.close()
-        pixbuf = loader.get_pixbuf()
-        # Scale to double sprite size (128×128)
-        pixbuf = pixbuf.scale_simple(128, 128, GdkPixbuf.InterpType.BILINEAR)
-        poke_image.set_from_pixbuf(pixbuf)
-        window.set_title(f"Sticky Note  •  {name}")
-
-        # ── Animation: bob up/down + breathe opacity ──────────────────────
-        def animate():
-            t = anim_step[0] * 0.1
+# Sprites decoded and scaled for display, by Pokémon name — GTK thread only,
+# least recently used dropped first
+PIXBUF_CACHE_MAX = int(os.getenv("PIXBUF_CACHE_MAX", "32"))
+_pixbuf_cache = OrderedDict()
 
-            # Bob: shift margin_bottom between 2 px and 14 px (smooth sine)
-            bob = int(8 + 6 * math.sin(t))
-            poke_box.set_margin_bottom(bob)
+# Local edits go to mobile once typing pauses, and at least this often while it doesn't
+SYNC_DEBOUNCE_MS    = int(os.getenv("SYNC_DEBOUNCE_MS",    "800"))
+SYNC_MAX_LATENCY_MS = int(os.getenv("SYNC_MAX_LATENCY_MS", "3000"))
 
-            # Breathe: opacity oscillates between 0.65 and 1.0
-            opacity = 0.825 + 0.175 * math.sin(t * 0.7)
-            poke_image.set_opacity(opacity)
+EDIT_TO_BROADCAST = metrics.histogram("sticky_edit_to_broadcast_seconds",
+                                      "From a local edit to its broadcast to sync clients")
+REMOTE_APPLY      = metrics.histogram("sticky_remote_apply_seconds",
+                                      "Time to apply a batch of remote edits to the note buffer")
 
-            anim_step[0] += 1
-            return GLib.SOURCE_CONTINUE   # keep repeating
-
-        # Tick every 50 ms → ~20 fps, smooth enough without heavy CPU use
-        GLib.timeout_add(50, animate)
-
-    except Exception as e:
-        print(f"[Pokémon] Render error: {e}")
-
-# Fetch a Pokémon in the background so startup isn't delayed
-fetch_pokemon(on_pokemon_loaded)
+def _glib_later(seconds, fn):
+    """One-shot GLib timer for Debouncer."""
+    def _fire():
+        fn()
+        return GLib.SOURCE_REMOVE
+    return GLib.timeout_add(max(1, round(seconds * 1000)), _fire)
 
 # ── Sync server ───────────────────────────────────────────────────────────────
-import sync as _sync
-
-def _on_remote_update(text, ts):
-    """Called from sync thread when mobile sends newer text — update GTK safely."""
-    def _apply():
-        buf.handler_block_by_func(_on_text_changed)   # avoid echo-back
-        buf.set_text(text)
-        buf.handler_unblock_by_func(_on_text_changed)
-        save_note(text, ts)
-    GLib.idle_add(_apply)
-
-def _get_current_text():
-    start, end = buf.get_bounds()
-    return buf.get_text(start, end, False), load_ts()
-
-_sync.start(
-    on_remote_update  = _on_remote_update,
-    get_current_text  = _get_current_text,
-)
-
-# Broadcast note changes to connected mobile clients
-_last_broadcast = [time.time()]
-
-def _on_text_changed(*_):
-    """Debounce: broadcast to mobile 800 ms after the user stops typing."""
-    _last_broadcast[0] = time.time()
-    def _debounced():
-        if time.time() - _last_broadcast[0] >= 0.79:
-            start, end = buf.get_bounds()
-            text = buf.get_text(start, end, False)
-            _sync.broadcast(text, time.time())
-    GLib.timeout_add(800, _debounced)
-
-buf.connect("changed", _on_text_changed)
-
-# Save note text when the window is closed
-def on_destroy(widget):
-    start, end = buf.get_bounds()
-    save_note(buf.get_text(start, end, False))
-    Gtk.main_quit()
-
-window.connect("destroy", on_destroy)
-
-# Show window and start GTK loop
-window.show_all()
-Gtk.main()
\ No newline at end of file
+_sync = None        # the sync module, once the deferred "sync" stage has loaded it
+
+def _start_sync():
+    global _sync
+    import sync as _sync
+    _sync.start()
+
+
+class NoteWindow:
+    """One sticky note: its window, buffer, Pokémon buddy and sync state."""
+
+    def __init__(self, app, note_id):
+        self.app     = app
+        self.note_id = note_id
+        self.closed  = False
+        self.history_window = None              # its HistoryWindow, while open
+
+        # Create's the note window
+        window = self.window = Gtk.Window(title="Sticky Note")
+        window.set_default_size(300, 200)
+        window.set_border_width(1)
+        window.set_resizable(True)
+        window.set_app_paintable(True)
+        window.connect("screen-changed", apply_rgba_visual)
+        apply_rgba_visual(window)               # apply immediately
+
+        # Make the window always on top and sticky (all workspaces)
+        window.set_keep_above(True)   # GTK asks WM to keep it above others
+        window.stick()                # GTK asks WM to keep it on all desktops
+
+        # ── Main layout ───────────────────────────────────────────────────
+        # Overlay lets us float the Pokémon sprite over the text area
+        overlay = Gtk.Overlay()
+        window.add(overlay)
+
+        # Text area for note content — wrapped in a ScrolledWindow so the
+        # window never grows; scrollbars appear when content overflows.
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_hexpand(True)
+        scrolled.set_vexpand(True)
+
+        textview = self.textview = Gtk.TextView()
+        textview.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)  # wrap at word boundaries, then chars
+        textview.set_hexpand(False)                      # don't request extra horizontal space
+        textview.set_size_request(0, -1)                 # allow textview to shrink horizontally
+        textview.set_left_margin(5)
+        textview.set_right_margin(5)
+
+        buf = self.buf = textview.get_buffer()
+        scrolled.add(textview)
+        overlay.add(scrolled)
+
+        # Shown while a large note is still streaming in
+        progress = self.progress = Gtk.ProgressBar()
+        progress.set_valign(Gtk.Align.START)
+        progress.set_no_show_all(True)
+        overlay.add_overlay(progress)
+        overlay.set_overlay_pass_through(progress, True)
+
+        # ── Pokémon corner widget ─────────────────────────────────────────
+        # Draws and animates itself on the frame clock (buddy.py)
+        buddy = self.buddy = Buddy()
+        buddy.set_halign(Gtk.Align.END)
+        buddy.set_valign(Gtk.Align.END)
+        buddy.set_margin_end(4)
+        overlay.add_overlay(buddy)
+        overlay.set_overlay_pass_through(buddy, True)  # clicks pass through to textview
+        buddy.attach(window)
+
+        # Edits made since the last broadcast, recorded from the buffer
+        # signals, and the server version the buffer was at when they started.
+        self._pending_ops = OpRecorder()
+        self._buf_version = 0
+        self._edit_started = None                 # perf_counter of the oldest unsent edit (metrics)
+        self._broadcast   = Debouncer(self.flush_pending,
+                                      SYNC_DEBOUNCE_MS / 1000, SYNC_MAX_LATENCY_MS / 1000,
+                                      _glib_later, GLib.source_remove)
+
+        # Remote patches waiting for the next frame — appended by the sync
+        # thread, drained by the GTK thread in one go.
+        self._remote     = deque()
+        self._remote_due = False
+        self._synced     = False
+
+        # Load the saved note: the top of it before the window is shown, the
+        # rest from idle callbacks (loader.py). Editing, recording and sync
+        # start once all of it is in (_on_loaded).
+        meta = _store.meta(note_id)
+        self._ts = meta.ts if meta else 0.0
+        self._reveal = None                       # a search hit to show once loaded
+        textview.set_editable(False)
+        self._loader = ChunkedLoader(_store.read_chunks(note_id), meta.size if meta else 0,
+                                     self._insert_loaded, GLib.idle_add, GLib.source_remove,
+                                     self._on_load_progress, self._on_loaded)
+        self._loader.start()
+
+        window.connect("key-press-event", self._on_key_press)
+        window.connect("delete-event", self._on_delete)
+        window.connect("destroy", self._on_destroy)
+        app.add_window(window)
+        window.show_all()
+
+        # The rest waits until the first note is on screen (see StickyNotesApp)
+        app.when_ready("wnck", lambda: _pin_with_wnck(window))
+        # Fetch a Pokémon in the background so the window isn't delayed
+        app.when_ready("sprites", lambda: fetch_pokemon(self._on_pokemon_loaded))
+
+    # ── Loading ───────────────────────────────────────────────────────────
+    def _insert_loaded(self, text):
+        self.buf.insert(self.buf.get_end_iter(), text)
+
+    def _on_load_progress(self, fraction):
+        self.progress.set_fraction(fraction)
+        self.progress.show()
+
+    def _on_loaded(self):
+        self._loader = None
+        self.progress.hide()
+        buf = self.buf
+        buf.place_cursor(buf.get_start_iter())
+        self._insert_id  = buf.connect("insert-text", self._on_insert_text)
+        self._delete_id  = buf.connect("delete-range", self._on_delete_range)
+        self._changed_id = buf.connect("changed", self._on_text_changed)
+        self.textview.set_editable(True)
+        self.app.when_ready("sync", self._attach_sync)
+        if self._reveal is not None:
+            self.reveal(*self._reveal)
+            self._reveal = None
+
+    # ── Pokémon buddy ─────────────────────────────────────────────────────
+    def _on_pokemon_loaded(self, name, img_bytes):
+        if self.closed:
+            return
+
+        # ── Offline fallback: show ASCII buddy ────────────────────────────
+        if img_bytes is None:
+            fallback_name, ascii_art = random.choice(OFFLINE_POKEMON)
+            self.buddy.show_text(ascii_art)
+            self.window.set_title(f"Sticky Note  •  {fallback_name} (offline)")
+            return
+
+        # ── Online: render sprite ─────────────────────────────────────────
+        try:
+            pixbuf = _pixbuf_cache.get(name)
+            if pixbuf is None:
+                loader = GdkPixbuf.PixbufLoader()
+                loader.write(img_bytes)
+                loader.close()
+                # Scale to double sprite size (128×128)
+                pixbuf = loader.get_pixbuf().scale_simple(128, 128, GdkPixbuf.InterpType.BILINEAR)
+                _pixbuf_cache[name] = pixbuf
+                if len(_pixbuf_cache) > PIXBUF_CACHE_MAX:
+                    _pixbuf_cache.popitem(last=False)
+            else:
+                _pixbuf_cache.move_to_end(name)
+            self.buddy.show_sprite(pixbuf)
+            self.window.set_title(f"Sticky Note  •  {name}")
+
+        except Exception as e:
+            print(f"[Pokémon] Render error: {e}")
+
+    # ── Sync ──────────────────────────────────────────────────────────────
+    def _attach_sync(self):
+        """Start serving this note — from the buffer, which may already hold
+        edits made before the sync server was up."""
+        if self.closed:
+            return
+        start, end = self.buf.get_bounds()
+        _sync.open_note(self.note_id, self.buf.get_text(start, end, False), self._ts,
+                        self._on_remote_patch)
+        self._synced = True
+
+    def _apply_to_buffer(self, ops):
+        """Apply `ops` in place, keeping the cursor, the selection and the
+        line at the top of the view where the user left them."""
+        if not ops:
+            return
+        buf, textview = self.buf, self.textview
+        cursor = buf.get_iter_at_mark(buf.get_insert()).get_offset()
+        bound  = buf.get_iter_at_mark(buf.get_selection_bound()).get_offset()
+        rect = textview.get_visible_rect()
+        top  = None
+        if rect.y > 0:
+            found, it = textview.get_iter_at_location(rect.x, rect.y)
+            if found:
+                top = buf.create_mark(None, it, True)
+        with buf.handler_block(self._changed_id), buf.handler_block(self._insert_id), \
+             buf.handler_block(self._delete_id):    # avoid echo-back
+            for pos, n_del, ins in ops:
+                if n_del:
+                    buf.delete(buf.get_iter_at_offset(pos), buf.get_iter_at_offset(pos + n_del))
+                if ins:
+                    buf.insert(buf.get_iter_at_offset(pos), ins)
+        buf.select_range(buf.get_iter_at_offset(shift_offset(cursor, ops)),
+                         buf.get_iter_at_offset(shift_offset(bound, ops)))
+        if top is not None:
+            textview.scroll_to_mark(top, 0.0, True, 0.0, 0.0)
+            buf.delete_mark(top)
+
+    def _catch_up(self):
+        """Bring the buffer up to the server copy, touching only the part that differs."""
+        text, version, ts = _sync.snapshot(self.note_id)
+        start, end = self.buf.get_bounds()
+        ops = diff(self.buf.get_text(start, end, False), text)
+        self._apply_to_buffer(ops)
+        self._buf_version = version
+        _sync.ack(self.note_id, version)
+        _journal.record(self.note_id, ops, ts)
+
+    def _on_remote_patch(self, ops, base, version, ts):
+        """Called from sync thread when mobile changes the note. A burst of
+        patches is applied together, at most once per frame."""
+        self._remote.append((ops, base, version, ts))
+        if not self._remote_due:
+            self._remote_due = True
+            _bridge.post(self._schedule_remote)
+
+    def _schedule_remote(self):
+        if self.textview.get_mapped():
+            self.textview.add_tick_callback(self._apply_remote)
+        else:
+            self._apply_remote()                  # not on screen — no frame to wait for
+        return GLib.SOURCE_REMOVE
+
+    def _apply_remote(self, *_):
+        self._remote_due = False                  # before draining, so nothing is missed
+        batch = []
+        while self._remote:
+            batch.append(self._remote.popleft())
+        if self.closed or not batch or batch[-1][2] <= self._buf_version:
+            return GLib.SOURCE_REMOVE             # gone, or already caught up past it
+        if self._pending_ops:
+            self.flush_pending()                  # merge our edits first
+            return GLib.SOURCE_REMOVE
+        ops, version = [], self._buf_version
+        for patch_ops, base, patch_version, ts in batch:
+            if patch_version <= version:
+                continue
+            if base != version:
+                self._catch_up()                  # missed a version in between
+                return GLib.SOURCE_REMOVE
+            ops.extend(patch_ops)
+            version = patch_version
+        if metrics.ENABLED:
+            started = time.perf_counter()
+        self._apply_to_buffer(ops)
+        if metrics.ENABLED:
+            REMOTE_APPLY.observe(time.perf_counter() - started)
+        self._buf_version = version
+        _sync.ack(self.note_id, version)
+        _journal.record(self.note_id, ops, ts)    # written by the journal thread
+        return GLib.SOURCE_REMOVE
+
+    def flush_pending(self):
+        """Send the recorded edits as a patch; the server merges them with any
+        concurrent remote edits, which are then pulled into the buffer."""
+        self._broadcast.cancel()
+        ops = self._pending_ops.take()
+        edit_started, self._edit_started = self._edit_started, None
+        if not ops:
+            return
+        ts = time.time()
+        _journal.record(self.note_id, ops, ts)
+        if not self._synced:
+            self._ts = ts                         # sync starts from the buffer as it is then
+            return
+        base = self._buf_version
+        version = _sync.broadcast_patch(self.note_id, base, ops, ts)
+        if version is None:
+            # Too far behind to merge — publish the buffer as-is
+            start, end = self.buf.get_bounds()
+            self._buf_version = _sync.broadcast(self.note_id, self.buf.get_text(start, end, False), ts)
+        elif version != base + 1:
+            self._catch_up()
+        else:
+            self._buf_version = version
+        if edit_started is not None:
+            EDIT_TO_BROADCAST.observe(time.perf_counter() - edit_started)
+
+    # ── Buffer signals ────────────────────────────────────────────────────
+    def _on_insert_text(self, _buf, it, text, _length):
+        self._pending_ops.insert(it.get_offset(), text)
+
+    def _on_delete_range(self, _buf, start, end):
+        self._pending_ops.delete(start.get_offset(), end.get_offset() - start.get_offset())
+
+    def _on_text_changed(self, *_):
+        """Debounce: broadcast to mobile once the user stops typing."""
+        if metrics.ENABLED and self._edit_started is None:
+            self._edit_started = time.perf_counter()
+        self._broadcast.poke()
+
+    # ── Window ────────────────────────────────────────────────────────────
+    def _on_key_press(self, _widget, event):
+        """Ctrl+N — new note, Ctrl+F — search all notes, Ctrl+H — this note's
+        history, Ctrl+W — close it, Ctrl+Q — quit."""
+        if not event.state & Gdk.ModifierType.CONTROL_MASK:
+            return False
+        key = Gdk.keyval_to_lower(event.keyval)
+        if key == Gdk.KEY_n:
+            self.app.new_note()
+        elif key == Gdk.KEY_f:
+            self.app.show_search(self.window)
+        elif key == Gdk.KEY_h:
+            self.show_history()
+        elif key == Gdk.KEY_w:
+            self.window.close()
+        elif key == Gdk.KEY_q:
+            self.app.quit()
+        else:
+            return False
+        return True
+
+    def reveal(self, offset, length):
+        """Select `length` characters at `offset` and bring them into view —
+        once the note is all in, if it is still loading."""
+        if self._loader is not None:
+            self._reveal = (offset, length)       # done by _on_loaded
+            self.window.present()
+            return
+        buf = self.buf
+        buf.select_range(buf.get_iter_at_offset(offset), buf.get_iter_at_offset(offset + length))
+        self.textview.scroll_to_mark(buf.get_insert(), 0.1, False, 0.0, 0.0)
+        self.window.present()
+
+    # ── History ───────────────────────────────────────────────────────────
+    def show_history(self):
+        if self.history_window is None:
+            self.history_window = HistoryWindow(self)
+        self.history_window.window.present()
+
+    def restore(self, text):
+        """Make `text` the note again, as an edit of our own: journaled, and
+        broadcast to every device like typing. What it replaces is kept as
+        a version first, so a restore can itself be undone."""
+        if self._loader is not None:
+            return                                # not all of the note is here yet
+        self.flush_pending()
+        _history.mark(self.note_id)
+        start, end = self.buf.get_bounds()
+        buf = self.buf
+        buf.begin_user_action()
+        for pos, n_del, ins in diff(buf.get_text(start, end, False), text):
+            if n_del:
+                buf.delete(buf.get_iter_at_offset(pos), buf.get_iter_at_offset(pos + n_del))
+            if ins:
+                buf.insert(buf.get_iter_at_offset(pos), ins)
+        buf.end_user_action()
+        self.flush_pending()
+
+    def _on_delete(self, *_):
+        # Closed by the user — don't bring it back on the next launch
+        _store.set_open(self.note_id, False)
+        return False
+
+    def _on_destroy(self, _widget):
+        # Save whatever is still pending when the window goes away
+        if self._loader is not None:
+            self._loader.cancel()
+        self.flush_pending()
+        self.closed = True
+        if self._synced:
+            _sync.close_note(self.note_id)
+        self.app.windows.pop(self.note_id, None)
+
+
+# ── Search ────────────────────────────────────────────────────────────────────
+class SearchWindow:
+    """Ctrl+F: one box searching every note as you type. Enter or a click
+    opens the note with the match selected."""
+
+    def __init__(self, app, parent):
+        self.app   = app
+        self._hits = []
+
+        window = self.window = Gtk.Window(title="Search notes")
+        window.set_default_size(420, 320)
+        window.set_transient_for(parent)
+        window.set_destroy_with_parent(True)
+        window.set_type_hint(Gdk.WindowTypeHint.DIALOG)
+        window.set_keep_above(True)
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        box.set_border_width(6)
+        window.add(box)
+
+        entry = self.entry = Gtk.SearchEntry()
+        entry.connect("search-changed", self._on_search_changed)
+        entry.connect("activate", self._on_activate)
+        entry.connect("stop-search", lambda *_: window.destroy())     # Esc
+        box.pack_start(entry, False, False, 0)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        results = self.results = Gtk.ListBox()
+        results.connect("row-activated", self._on_row_activated)
+        scrolled.add(results)
+        box.pack_start(scrolled, True, True, 0)
+
+        self.status = Gtk.Label(xalign=0)
+        box.pack_start(self.status, False, False, 0)
+        window.show_all()
+
+    def _on_search_changed(self, entry):
+        for row in self.results.get_children():
+            row.destroy()
+        self._hits = _index.search(entry.get_text())
+        titles = {}
+        for hit in self._hits:
+            if hit.note not in titles:
+                meta = _store.meta(hit.note)
+                titles[hit.note] = (meta.title if meta else "") or "Untitled"
+            label = Gtk.Label(xalign=0)
+            label.set_ellipsize(Pango.EllipsizeMode.END)
+            label.set_markup(f"<b>{GLib.markup_escape_text(titles[hit.note])}</b>\n"
+                             f"{GLib.markup_escape_text(hit.snippet)}")
+            self.results.add(label)
+        self.results.show_all()
+        if not entry.get_text().strip():
+            self.status.set_text("")
+        else:
+            self.status.set_text(f"{len(self._hits)} match{'es' if len(self._hits) != 1 else ''}")
+
+    def _on_activate(self, _entry):
+        row = self.results.get_row_at_index(0)
+        if row is not None:
+            self._on_row_activated(self.results, row)
+
+    def _on_row_activated(self, _list, row):
+        hit = self._hits[row.get_index()]
+        self.window.destroy()
+        self.app.open_note(hit.note)
+        self.app.windows[hit.note].reveal(hit.offset, hit.length)
+
+
+# ── History ───────────────────────────────────────────────────────────────────
+class HistoryWindow:
+    """Ctrl+H: the note's past versions, newest first, with a preview —
+    typing in the box keeps only the ones containing that text. Restore
+    puts the selected one back (NoteWindow.restore)."""
+
+    def __init__(self, note):
+        self.note      = note
+        self._versions = _history.versions(note.note_id)
+
+        window = self.window = Gtk.Window(title="Note history")
+        window.set_default_size(520, 360)
+        window.set_transient_for(note.window)
+        window.set_destroy_with_parent(True)
+        window.set_type_hint(Gdk.WindowTypeHint.DIALOG)
+        window.set_keep_above(True)
+        window.connect("key-press-event", self._on_key_press)
+        window.connect("destroy", self._on_destroy)
+
+        paned = Gtk.Paned(orientation=Gtk.Orientation.HORIZONTAL)
+        window.add(paned)
+
+        left = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        left.set_border_width(6)
+        entry = self.entry = Gtk.SearchEntry()
+        entry.set_placeholder_text("Find in past versions")
+        entry.connect("search-changed", self._on_search_changed)
+        left.pack_start(entry, False, False, 0)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        versions = self.list = Gtk.ListBox()
+        versions.connect("row-selected", self._on_row_selected)
+        self._placeholder = Gtk.Label(label="No earlier versions yet")
+        versions.set_placeholder(self._placeholder)
+        self._fill()
+        scrolled.add(versions)
+        left.pack_start(scrolled, True, True, 0)
+        paned.pack1(left, False, False)
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        box.set_border_width(6)
+        preview_scrolled = Gtk.ScrolledWindow()
+        preview = self.preview = Gtk.TextView()
+        preview.set_editable(False)
+        preview.set_cursor_visible(False)
+        preview.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+        preview_scrolled.add(preview)
+        box.pack_start(preview_scrolled, True, True, 0)
+        restore = self.restore_button = Gtk.Button(label="Restore this version")
+        restore.set_sensitive(False)
+        restore.connect("clicked", self._on_restore)
+        box.pack_start(restore, False, False, 0)
+        paned.pack2(box, True, False)
+
+        window.show_all()
+        first = versions.get_row_at_index(0)
+        if first is not None:
+            versions.select_row(first)
+
+    def _fill(self):
+        for row in self.list.get_children():
+            row.destroy()
+        for version in self._versions:
+            label = Gtk.Label(xalign=0)
+            label.set_text(f"{time.strftime('%a %d %b  %H:%M', time.localtime(version.ts))}"
+                           f"  ·  {version.size} chars")
+            self.list.add(label)
+        self.list.show_all()
+
+    def _on_search_changed(self, entry):
+        query = entry.get_text()
+        if query.strip():
+            self._versions = _history.search(self.note.note_id, query)
+            self._placeholder.set_text("No version contains that")
+        else:
+            self._versions = _history.versions(self.note.note_id)
+            self._placeholder.set_text("No earlier versions yet")
+        self._fill()
+        first = self.list.get_row_at_index(0)
+        if first is not None:
+            self.list.select_row(first)
+
+    def _selected_text(self):
+        row = self.list.get_selected_row()
+        if row is None:
+            return None
+        return _history.text(self.note.note_id, self._versions[row.get_index()].rev)
+
+    def _on_row_selected(self, _list, row):
+        text = self._selected_text() if row is not None else None
+        self.preview.get_buffer().set_text(text or "")
+        self.restore_button.set_sensitive(text is not None)
+
+    def _on_restore(self, _button):
+        text = self._selected_text()
+        if text is not None and not self.note.closed:
+            self.note.restore(text)
+        self.window.destroy()
+
+    def _on_key_press(self, _widget, event):
+        if event.keyval == Gdk.KEY_Escape:
+            self.window.destroy()
+            return True
+        return False
+
+    def _on_destroy(self, _window):
+        self.note.history_window = None
+
+
+# ── Application: one process, one GTK loop for every note ─────────────────────
+APP_ID = "io.github.mrigank923.StickyNotes"
+
+class StickyNotesApp(Gtk.Application):
+    """Launching the app again while it runs opens a new note in this
+    process instead of starting a second GTK loop and sync server.
+
+    Startup is staged: the notes are opened as soon as the store is ready,
+    and libwnck, the sync server, the sprite machinery and history
+    compaction are started one per idle callback after the first frame, so
+    the first window is editable as early as possible."""
+
+    # Deferred startup stages, in the order they run
+    STAGES = (("wnck",    _start_wnck),
+              ("sync",    _start_sync),
+              ("sprites", _start_sprites),
+              ("history", _history.start_compactor))
+
+    def __init__(self):
+        super().__init__(application_id=APP_ID)
+        self.windows  = {}                   # note id → NoteWindow
+        self._ready   = set()                # stages that have run
+        self._waiting = defaultdict(list)    # stage → callbacks waiting for it
+        self._first_frame_id = None
+        self._first_key_id   = None
+        self._search         = None              # the open SearchWindow, if any
+
+    def when_ready(self, stage, fn):
+        """Run `fn` once `stage` has started — right away if it already has."""
+        if stage in self._ready:
+            fn()
+        else:
+            self._waiting[stage].append(fn)
+
+    def do_startup(self):
+        Gtk.Application.do_startup(self)
+        with _profile.phase("journal recovery"):
+            _journal.recover()
+        with _profile.phase("styles"):
+            _load_css()
+
+    def do_activate(self):
+        if self.windows:
+            self.new_note()
+            return
+        with _profile.phase("note windows"):
+            for note_id in _startup_notes():
+                self.open_note(note_id)
+        first = next(iter(self.windows.values())).window
+        self._first_frame_id = first.connect_after("draw", self._on_first_frame)
+        self._first_key_id   = first.connect("key-press-event", self._on_first_key)
+
+    def _on_first_frame(self, window, _cr):
+        window.disconnect(self._first_frame_id)
+        _profile.mark("first frame")
+        GLib.idle_add(self._run_stages, list(self.STAGES), priority=GLib.PRIORITY_LOW)
+        return False
+
+    def _on_first_key(self, window, _event):
+        window.disconnect(self._first_key_id)
+        _profile.mark("first keystroke")
+        return False
+
+    def _run_stages(self, stages):
+        """One deferred stage per idle callback, so input is handled in between."""
+        name, start = stages.pop(0)
+        with _profile.phase(f"{name} (deferred)"):
+            try:
+                start()
+            except Exception as e:
+                print(f"[Startup] {name} failed: {e}")
+                self._waiting.pop(name, None)     # the notes carry on without it
+            else:
+                self._ready.add(name)
+                for fn in self._waiting.pop(name, ()):
+                    fn()
+        if stages:
+            return GLib.SOURCE_CONTINUE
+        _profile.report()
+        return GLib.SOURCE_REMOVE
+
+    def open_note(self, note_id):
+        if note_id in self.windows:
+            self.windows[note_id].window.present()
+            return
+        self.windows[note_id] = NoteWindow(self, note_id)
+        _store.set_open(note_id, True)
+
+    def new_note(self):
+        self.open_note(_store.create())
+
+    def show_search(self, parent):
+        if self._search is None:
+            self._search = SearchWindow(self, parent)
+            self._search.window.connect("destroy", self._on_search_closed)
+        self._search.window.present()
+
+    def _on_search_closed(self, _window):
+        self._search = None
+
+    def do_shutdown(self):
+        for note in list(self.windows.values()):
+            note.flush_pending()
+        _journal.close()            # drain the journal into the note store
+        _index.close()
+        _history.close()
+        Gtk.Application.do_shutdown(self)
+
+
+StickyNotesApp().run(sys.argv)
@@ -33,4 +33,4 @@ fi
 
 # ── Run the app ───────────────────────────────────────────────────────────────
 echo "[INFO] Starting Sticky Notes..."
-python3 "$SCRIPT_DIR/main.py"
+python3 "$SCRIPT_DIR/main.py" "$@"
@@ -0,0 +1,340 @@
+"""
+search.py — full-text search over every note for Sticky Notes
+===============================================================
+An SQLite FTS5 index with the trigram tokenizer (search.db, next to
+notes.db), so any piece of text of three or more characters is found,
+case-insensitively, without reading the notes.
+
+Each note is indexed as a run of blocks of about SEARCH_BLOCK_CHARS, cut
+at line ends, and the index keeps the note's layout: its block row ids and
+lengths, in order. The journal writer (journal.py) hands it every edit as
+the ops it journals; only the blocks those ops touch are cut again from
+the new text and re-indexed, so typing in a 50 MB note rewrites a row or
+two, never the note.
+
+  blocks  — FTS5 (note, text), one row per block
+  layouts (note, blocks)      — the note's block row ids and lengths, in order
+  meta    (key, value)        — "seq": the last journal record applied
+
+Notes written behind the journal's back (created with text, imported, or
+saved while the index was missing or behind) are found by stale() when
+the writer starts and indexed whole, one per idle moment of the writer.
+
+Nothing is opened before the first edit or search. The writer side
+(apply / stale / catch_up) runs on the journal thread and keeps its own
+connection; search() may run on any thread and never waits for it.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+import metrics
+
+SEARCH_BLOCK_CHARS = int(os.getenv("SEARCH_BLOCK_CHARS", "2048"))
+SEARCH_LIMIT       = int(os.getenv("SEARCH_LIMIT",       "50"))
+
+SEARCH = metrics.histogram("sticky_search_seconds", "Time to answer one search query")
+
+Hit = namedtuple("Hit", "note offset length snippet")   # offset / length of the match in the note
+
+SNIPPET_BEFORE, SNIPPET_AFTER = 30, 50      # characters of context around a match
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS blocks USING fts5 (note UNINDEXED, text, tokenize = 'trigram');
+CREATE TABLE IF NOT EXISTS layouts (
+    note   TEXT PRIMARY KEY,
+    blocks BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+def _cut(text: str):
+    """Blocks of at most SEARCH_BLOCK_CHARS, each ending at a line end
+    unless a single line is longer than that."""
+    blocks, start, n = [], 0, len(text)
+    while start < n:
+        end = min(start + SEARCH_BLOCK_CHARS, n)
+        if end < n:
+            cut = text.rfind("\n", start, end) + 1
+            if cut > start:
+                end = cut
+        blocks.append(text[start:end])
+        start = end
+    return blocks
+
+def _pack(rowids, lengths) -> bytes:
+    packed = array("q", bytes(16 * len(rowids)))
+    packed[0::2] = array("q", rowids)
+    packed[1::2] = array("q", lengths)
+    return packed.tobytes()
+
+def _unpack(blob: bytes) -> array:
+    packed = array("q")
+    packed.frombytes(blob)
+    return packed
+
+
+class _Layout:
+    """A note's blocks, in order. A row id of None marks text an edit
+    touched that has not been re-indexed yet."""
+    __slots__ = ("rowids", "lengths")
+
+    def __init__(self, rowids=(), lengths=()):
+        self.rowids  = list(rowids)
+        self.lengths = list(lengths)
+
+
+class SearchIndex:
+    def __init__(self, directory: str, filename: str = "search.db"):
+        self.path     = os.path.join(directory, filename)
+        self._writer  = None    # journal thread only
+        self._reader  = None
+        self._rlock   = threading.Lock()
+        self._layouts = {}      # note id → _Layout, loaded on the note's first edit
+        self._pending = {}      # note ids stale() found, to index whole
+        self._broken  = False   # no FTS5 / trigram tokenizer in this SQLite
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    def _open(self, attr: str):
+        db = getattr(self, attr)
+        if db is None and not self._broken:
+            try:
+                db = self._connect()
+            except sqlite3.Error as e:
+                print(f"[Search] Full-text search unavailable: {e}")
+                self._broken = True
+                return None
+            setattr(self, attr, db)
+        return db
+
+    def close(self):
+        with self._rlock:
+            for db in (self._writer, self._reader):
+                if db is not None:
+                    db.close()
+            self._writer = self._reader = None
+
+    # ── Writer side (journal thread) ──────────────────────────────────────
+    def apply(self, edits, seq: int):
+        """Index a group of journaled edits: (note id, ops, text after them),
+        in journal order, ending at record `seq`."""
+        db = self._open("_writer")
+        if db is None:
+            return
+        try:
+            db.execute("BEGIN")
+            for note_id, ops, text in edits:
+                self._edit(db, note_id, ops, text)
+            for note_id in {note_id for note_id, _, _ in edits}:
+                self._save_layout(db, note_id)
+            db.execute("INSERT INTO meta (key, value) VALUES ('seq', ?) "
+                       "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (seq,))
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._rollback(db, e)
+
+    def stale(self, store) -> bool:
+        """Find the notes the index is missing or behind on and forget what
+        it had for them; catch_up() indexes them. True if there are any."""
+        db = self._open("_writer")
+        if db is None:
+            return False
+        seqs = store.seqs()
+        try:
+            db.execute("BEGIN")
+            row = db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+            seen = row[0] if row else -1
+            indexed = {note for (note,) in db.execute("SELECT note FROM layouts")}
+            for note_id in indexed - seqs.keys():
+                self._drop(db, note_id)
+            self._pending = dict.fromkeys(note_id for note_id, seq in seqs.items()
+                                          if note_id not in indexed or seq > seen)
+            for note_id in self._pending.keys() & indexed:
+                self._drop(db, note_id)
+            db.execute("INSERT INTO meta (key, value) VALUES ('seq', ?) "
+                       "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+                       (max(seqs.values(), default=0),))
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._rollback(db, e)
+            return False
+        if self._pending:
+            print(f"[Search] Indexing {len(self._pending)} note(s)")
+        return bool(self._pending)
+
+    def catch_up(self, text_of) -> bool:
+        """Index one of the notes stale() found, reading it with
+        text_of(note_id). True while there are more."""
+        if not self._pending:
+            return False
+        note_id = next(iter(self._pending))
+        db = self._open("_writer")
+        try:
+            db.execute("BEGIN")
+            self._reindex(db, note_id, text_of(note_id))
+            self._save_layout(db, note_id)
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._pending.pop(note_id, None)
+            self._rollback(db, e)
+        return bool(self._pending)
+
+    def _rollback(self, db, error):
+        print(f"[Search] Could not update the index: {error}")
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        self._layouts.clear()       # reloaded from what was committed
+
+    def _layout(self, db, note_id: str) -> _Layout:
+        layout = self._layouts.get(note_id)
+        if layout is None:
+            row = db.execute("SELECT blocks FROM layouts WHERE note = ?", (note_id,)).fetchone()
+            packed = _unpack(row[0]) if row else array("q")
+            layout = self._layouts[note_id] = _Layout(packed[0::2], packed[1::2])
+        return layout
+
+    def _save_layout(self, db, note_id: str):
+        layout = self._layouts[note_id]
+        db.execute("INSERT INTO layouts (note, blocks) VALUES (?, ?) "
+                   "ON CONFLICT (note) DO UPDATE SET blocks = excluded.blocks",
+                   (note_id, _pack(layout.rowids, layout.lengths)))
+
+    def _drop(self, db, note_id: str):
+        layout = self._layout(db, note_id)
+        db.executemany("DELETE FROM blocks WHERE rowid = ?", ((r,) for r in layout.rowids))
+        db.execute("DELETE FROM layouts WHERE note = ?", (note_id,))
+        del self._layouts[note_id]
+
+    def _reindex(self, db, note_id: str, text: str):
+        self._pending.pop(note_id, None)
+        layout = self._layout(db, note_id)
+        db.executemany("DELETE FROM blocks WHERE rowid = ?", ((r,) for r in layout.rowids))
+        layout.rowids, layout.lengths = [], []
+        for block in _cut(text):
+            layout.rowids.append(self._insert(db, note_id, block))
+            layout.lengths.append(len(block))
+
+    @staticmethod
+    def _insert(db, note_id: str, block: str) -> int:
+        return db.execute("INSERT INTO blocks (note, text) VALUES (?, ?)",
+                          (note_id, block)).lastrowid
+
+    def _edit(self, db, note_id: str, ops, text: str):
+        """Re-index the blocks `ops` touched, cutting them again from `text`."""
+        layout = self._layout(db, note_id)
+        rowids, lengths = layout.rowids, layout.lengths
+        if note_id in self._pending or \
+                sum(lengths) + sum(len(ins) - n_del for _, n_del, ins in ops) != len(text):
+            self._reindex(db, note_id, text)        # not what the ops were made against
+            return
+        dead = []
+        for pos, n_del, ins in ops:
+            if not lengths:
+                rowids.append(None)
+                lengths.append(0)
+            starts = list(accumulate(lengths, initial=0))
+            i = min(bisect_right(starts, pos) - 1, len(lengths) - 1)
+            j = min(bisect_right(starts, pos + n_del - 1) - 1, len(lengths) - 1) if n_del else i
+            dead.extend(r for r in rowids[i:j + 1] if r is not None)
+            rowids[i:j + 1]  = [None]
+            lengths[i:j + 1] = [starts[j + 1] - starts[i] - n_del + len(ins)]
+
+        k = 0
+        while None in rowids[k:]:
+            k = rowids.index(None, k)
+            start = sum(lengths[:k])
+            m = k                                   # rowids[k..m] need cutting again
+            while m + 1 < len(rowids) and rowids[m + 1] is None:
+                m += 1
+            end = start + sum(lengths[k:m + 1])
+            if 0 < end - start < SEARCH_BLOCK_CHARS // 4 and k > 0:
+                k -= 1                              # too small to stand alone — join the block before
+                start -= lengths[k]
+                dead.append(rowids[k])
+            while end > start and end < len(text) and text[end - 1] != "\n":
+                m += 1                              # keep lines whole: take the next block too
+                end += lengths[m]
+                if rowids[m] is not None:
+                    dead.append(rowids[m])
+            blocks = _cut(text[start:end])
+            rowids[k:m + 1]  = [self._insert(db, note_id, block) for block in blocks]
+            lengths[k:m + 1] = [len(block) for block in blocks]
+            k += len(blocks)
+        db.executemany("DELETE FROM blocks WHERE rowid = ?", ((r,) for r in dead))
+
+    # ── Reader side (any thread) ──────────────────────────────────────────
+    def search(self, query: str, limit: int = SEARCH_LIMIT):
+        """Hits for `query` (case-insensitive, one line), one per block it
+        occurs in, at most `limit`."""
+        query = query.split("\n", 1)[0]
+        if not query.strip():
+            return []
+        if metrics.ENABLED:
+            started = time.perf_counter()
+        with self._rlock:
+            db = self._open("_reader")
+            if db is None:
+                return []
+            try:
+                db.execute("BEGIN")                 # blocks and layouts from one snapshot
+                if len(query) >= 3:
+                    rows = db.execute(
+                        "SELECT note, rowid, text FROM blocks WHERE blocks MATCH ? LIMIT ?",
+                        ('"' + query.replace('"', '""') + '"', limit)).fetchall()
+                else:                               # too short for a trigram — scanned
+                    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%") \
+                                         .replace("_", "\\_") + "%"
+                    rows = db.execute(
+                        "SELECT note, rowid, text FROM blocks WHERE text LIKE ? ESCAPE '\\' "
+                        "LIMIT ?", (pattern, limit)).fetchall()
+                starts = {}                         # note id → {block row id: offset}
+                for note_id in {row[0] for row in rows}:
+                    found = db.execute("SELECT blocks FROM layouts WHERE note = ?",
+                                       (note_id,)).fetchone()
+                    if found:
+                        packed = _unpack(found[0])
+                        starts[note_id] = dict(zip(packed[0::2],
+                                                   accumulate(packed[1::2], initial=0)))
+                db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                print(f"[Search] Query failed: {e}")
+                return []
+        hits = [hit for hit in (_hit(query, starts.get(note_id, {}).get(rowid), note_id, text)
+                                for note_id, rowid, text in rows) if hit]
+        if metrics.ENABLED:
+            SEARCH.observe(time.perf_counter() - started)
+        return hits
+
+def _hit(query: str, start, note_id: str, text: str):
+    """Where in its note the first match in block `text`, starting at `start`, is."""
+    if start is None:
+        return None                         # the block was replaced meanwhile
+    # Matched on the text itself: lower() may change its length ("İ" → "i̇")
+    match = re.search(re.escape(query), text, re.IGNORECASE)
+    at, length = (match.start(), match.end() - match.start()) if match else (0, len(query))
+    line_start = text.rfind("\n", 0, at) + 1
+    line_end   = text.find("\n", at)
+    line_end   = len(text) if line_end < 0 else line_end
+    lo = max(line_start, at - SNIPPET_BEFORE)
+    hi = min(line_end, at + length + SNIPPET_AFTER)
+    snippet = ("…" if lo > line_start else "") + text[lo:hi] + ("…" if hi < line_end else "")
+    return Hit(note_id, start + at, length, snippet)
@@ -0,0 +1,54 @@
+"""
+startup.py — startup timing for Sticky Notes (Linux)
+======================================================
+Run the app with --profile-startup to have it print how long each startup
+phase took, once the deferred work after the first frame is done:
+
+  [Startup] import GTK              38.4 ms
+  [Startup] journal recovery         1.2 ms
+  ...
+  [Startup] first frame            112.9 ms after launch
+
+"launch" is when main.py started running (the interpreter's own start-up
+is not counted — `python -X importtime` breaks that down). Without the
+flag nothing is recorded or printed.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.t0      = time.perf_counter()
+        self._phases = []           # (name, seconds)
+        self._marks  = []           # (name, seconds since t0)
+        self._shown  = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self._phases.append((name, time.perf_counter() - started))
+
+    def mark(self, name: str):
+        """Note that `name` happened now. Marks after the report are printed as they come."""
+        if not self.enabled or any(n == name for n, _ in self._marks):
+            return
+        at = time.perf_counter() - self.t0
+        self._marks.append((name, at))
+        if self._shown:
+            print(f"[Startup] {name:<22}{at * 1000:9.1f} ms after launch")
+
+    def report(self):
+        if not self.enabled or self._shown:
+            return
+        self._shown = True
+        for name, seconds in self._phases:
+            print(f"[Startup] {name:<22}{seconds * 1000:9.1f} ms")
+        for name, at in self._marks:
+            print(f"[Startup] {name:<22}{at * 1000:9.1f} ms after launch")
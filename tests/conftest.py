@@ -0,0 +1,69 @@
+"""Shared fixtures: the toolkit-agnostic modules in common/ (and the
+GTK-free ones in linux/) are imported straight from the tree, and the sync
+server is started once, on a free loopback port, without the beacon."""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON = os.path.join(ROOT, "common")
+sys.path.insert(0, os.path.join(ROOT, "linux"))
+sys.path.insert(0, COMMON)
+
+
+def free_port(kind=socket.SOCK_STREAM) -> int:
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture(scope="session")
+def sync_server():
+    """The sync module, serving on ws://127.0.0.1:<sync.WS_PORT>."""
+    pytest.importorskip("websockets")
+    port = free_port()
+    # sync.py reads its config on import
+    os.environ.update(WS_HOST="127.0.0.1", WS_PORT=str(port), DISCOVERY="0",
+                      HELLO_TIMEOUT_MS="100")
+    import sync
+    sync.start()
+    wait_for(lambda: sync._loop is not None)
+    wait_for(lambda: _listening(port))
+    return sync
+
+def _listening(port: int) -> bool:
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+
+class Phone:
+    """A scripted sync client: send / receive JSON messages, skipping pings."""
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    async def send(self, **msg):
+        await self.ws.send(json.dumps(msg))
+
+    async def recv(self, timeout=5.0):
+        while True:
+            msg = json.loads(await asyncio.wait_for(self.ws.recv(), timeout))
+            if msg.get("type") != "ping":
+                return msg
+
+async def connect(url: str) -> Phone:
+    import websockets
+    return Phone(await websockets.connect(url, max_size=None))
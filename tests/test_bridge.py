@@ -0,0 +1,64 @@
+"""Bridge: many posts from many threads, one wake-up, order and coalescing kept."""
+
+import threading
+
+from bridge import Bridge
+
+
+class _Loop:
+    """Stands in for the UI loop: remembers what it was asked to run."""
+
+    def __init__(self):
+        self.wakes = []
+
+    def wake(self, drain):
+        self.wakes.append(drain)
+
+    def run(self):
+        wakes, self.wakes = self.wakes, []
+        for drain in wakes:
+            drain()
+
+
+def test_one_wake_per_batch_from_many_threads():
+    loop, got = _Loop(), []
+    bridge = Bridge(loop.wake)
+
+    def worker(n):
+        for i in range(1000):
+            bridge.post(got.append, (n, i))
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loop.wakes) == 1
+    loop.run()
+    assert len(got) == 4000
+    for n in range(4):                              # each thread's calls stay in order
+        assert [i for m, i in got if m == n] == list(range(1000))
+
+
+def test_post_latest_replaces_pending_call_in_place():
+    loop, got = _Loop(), []
+    bridge = Bridge(loop.wake)
+    bridge.post(got.append, "first")
+    bridge.post_latest("remote", got.append, "remote 1")
+    bridge.post(got.append, "last")
+    bridge.post_latest("remote", got.append, "remote 2")
+    loop.run()
+    assert got == ["first", "remote 2", "last"]
+
+
+def test_drain_rearms_and_survives_a_failing_call():
+    loop, got = _Loop(), []
+    bridge = Bridge(loop.wake)
+    bridge.post(lambda: 1 / 0)
+    bridge.post(got.append, 1)
+    assert bridge.drain() is False                  # usable with GLib.idle_add as it is
+    assert got == [1]
+    loop.wakes.clear()
+    bridge.post_latest("k", got.append, 2)
+    assert len(loop.wakes) == 1                     # a new batch wakes the loop again
+    loop.run()
+    assert got == [1, 2]
@@ -0,0 +1,78 @@
+"""Sequence CRDT: randomized concurrent edits from several sites converge."""
+
+import random
+
+import pytest
+
+from crdt import Sequence
+from delta import apply_ops
+
+SITES = 3
+
+
+def _random_ops(rng, text):
+    ops = []
+    for _ in range(rng.randint(1, 3)):
+        pos = rng.randint(0, len(text))
+        n_del = rng.randint(0, min(5, len(text) - pos))
+        ins = "".join(rng.choice("abcé😀") for _ in range(rng.randint(0, 4)))
+        ops.append([pos, n_del, ins])
+        text = apply_ops(text, [[pos, n_del, ins]])
+    return ops, text
+
+
+@pytest.mark.parametrize("trial", range(300))
+def test_concurrent_edits_converge(trial):
+    rng = random.Random(trial)
+    doc = Sequence("hello world")
+    mirror = doc.text                               # a replica that only sees the forwarded ops
+    sites = {site: (0, doc.text) for site in range(SITES)}   # site → (base, what it shows)
+    for _ in range(40):
+        site = rng.randrange(SITES)
+        base, local = sites[site]
+        ops, edited = _random_ops(rng, local)
+        out = doc.apply(site, base, ops)
+        if out is None:                             # behind the horizon: it gets the full text
+            sites[site] = (doc.version, doc.text)
+            continue
+        mirror = apply_ops(mirror, out)
+        assert mirror == doc.text
+        assert len(doc) == len(doc.text)
+        assert doc.view_text(site, base) == edited  # the author's intent survives the merge
+        sites[site] = (doc.version, doc.text) if rng.random() < 0.5 else (base, edited)
+        if rng.random() < 0.2:
+            text = doc.text
+            doc.collect(min(b for b, _ in sites.values()))
+            assert doc.text == text
+            for s, (b, shown) in sites.items():
+                assert doc.view_text(s, b) == shown
+    # Everyone catches up to the same text
+    for site in sites:
+        assert doc.view_text(site, doc.version) == doc.text == mirror
+
+
+def test_concurrent_inserts_at_one_spot_keep_both():
+    doc = Sequence("ab")
+    doc.apply(1, 0, [[1, 0, "X"]])
+    doc.apply(2, 0, [[1, 0, "Y"]])
+    assert doc.text == "aYXb"                       # newest first, the same on every replica
+
+
+def test_bad_patches_leave_the_doc_alone():
+    doc = Sequence("hello")
+    doc.apply(1, 0, [[5, 0, "!"]])
+    doc.collect(1)
+    assert doc.apply(2, 0, [[0, 0, "x"]]) is None   # older than the horizon
+    with pytest.raises(ValueError):
+        doc.apply(2, 1, [[3, 10, ""]])              # past the end
+    assert (doc.text, doc.version) == ("hello!", 1)
+
+
+def test_typing_without_deletes_keeps_the_run_list_short():
+    doc = Sequence()
+    for i in range(2000):                           # what sync.py does after each commit
+        doc.apply(1, doc.version, [[i, 0, "x"]])
+        if doc.garbage >= 64:
+            doc.collect(doc.version)
+    assert doc.text == "x" * 2000
+    assert len(doc._runs) <= 65
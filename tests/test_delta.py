@@ -0,0 +1,47 @@
+"""delta: patches, cursor shifting and offsets for Tk text indices."""
+
+import random
+
+import pytest
+
+from delta import OpRecorder, apply_ops, diff, shift_offset, utf16_offset
+
+
+def test_diff_round_trip():
+    rng = random.Random(7)
+    alphabet = "ab \n😀é"
+    for _ in range(500):
+        old = "".join(rng.choice(alphabet) for _ in range(rng.randrange(20)))
+        new = "".join(rng.choice(alphabet) for _ in range(rng.randrange(20)))
+        assert apply_ops(old, diff(old, new)) == new
+
+
+def test_apply_ops_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        apply_ops("abc", [[2, 5, ""]])
+
+
+def test_recorder_merges_typing():
+    rec = OpRecorder()
+    for i, ch in enumerate("hello"):
+        rec.insert(i, ch)
+    rec.delete(4, 1)
+    assert rec.take() == [[0, 0, "hell"]]
+
+
+def test_shift_offset():
+    assert shift_offset(5, [[0, 0, "ab"]]) == 7
+    assert shift_offset(5, [[5, 0, "ab"]]) == 5     # typed right at the cursor goes after it
+    assert shift_offset(5, [[2, 6, ""]]) == 2
+
+
+def test_utf16_offset_matches_tcl():
+    tkinter = pytest.importorskip("tkinter")
+    tcl = tkinter.Tcl()                             # no display needed
+    text = "a😀b\ncé🎉d"
+    tcl.setvar("s", text)
+    for pos in range(len(text) + 1):
+        units = utf16_offset(text, pos)
+        assert units == pos + text[:pos].count("😀") + text[:pos].count("🎉")
+        if tkinter.TkVersion < 8.7:                 # what Windows' Tk 8.6 text indices count
+            assert tcl.eval(f"string range $s {units} end") == text[pos:]
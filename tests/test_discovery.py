@@ -0,0 +1,63 @@
+"""Discovery beacon round trip on loopback, and what a probe flood costs it."""
+
+import asyncio
+import json
+import socket
+
+import pytest
+
+import discovery
+from conftest import free_port
+
+
+@pytest.fixture
+def beacon_port(monkeypatch):
+    monkeypatch.setattr(discovery, "DISCOVERY", True)
+    return free_port(socket.SOCK_DGRAM)
+
+def _with_beacon(port, check):
+    """Run the beacon on 127.0.0.1:`port` and `check(beacon)` on a thread beside it."""
+    async def main():
+        beacon = await discovery.serve("127.0.0.1", 8765, 1, ["patch"], port=port)
+        assert beacon is not None
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, check, beacon)
+        finally:
+            beacon.close()
+    return asyncio.run(main())
+
+
+def test_discover_round_trip_on_loopback(beacon_port):
+    found = _with_beacon(beacon_port, lambda beacon: discovery.discover(
+        0.5, targets=["127.0.0.1"], port=beacon_port))
+    assert len(found) == 1
+    here = found[0]
+    assert here["type"] == "here" and here["host"] == "127.0.0.1"
+    assert (here["port"], here["proto"], here["caps"]) == (8765, 1, ["patch"])
+
+
+def test_probes_neither_enumerate_interfaces_nor_flood_replies(beacon_port, monkeypatch):
+    calls = []
+    real = discovery.interfaces
+    monkeypatch.setattr(discovery, "interfaces", lambda: calls.append(1) or real())
+
+    def flood(beacon):
+        before = len(calls)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(0.3)
+            probe = json.dumps({"type": "discover", "proto": 1}).encode()
+            for _ in range(50):
+                s.sendto(probe, ("127.0.0.1", beacon_port))
+            replies = 0
+            try:
+                while True:
+                    s.recvfrom(4096)
+                    replies += 1
+            except socket.timeout:
+                pass
+        return beacon.probes, replies, len(calls) - before
+
+    probes, replies, enumerations = _with_beacon(beacon_port, flood)
+    assert probes == 50
+    assert replies == 1                             # one answer per address per DISCOVERY_REPLY_S
+    assert enumerations == 0                        # interfaces come from the cache
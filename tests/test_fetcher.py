@@ -0,0 +1,113 @@
+"""Fetcher and PokeClient against a local HTTP stand-in for PokéAPI."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetcher as fetcher_mod
+from fetcher import Fetcher, FetchError
+from pokeapi import PokeClient
+from sprites import SpriteCache
+
+SPRITE = b"\x89PNG fake sprite"
+ETAG   = '"sprite-v1"'
+
+
+class _PokeAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"               # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        server.log.append((self.path, self.client_address[1]))
+        if self.path.startswith("/api/pokemon/"):
+            poke_id = self.path.rsplit("/", 1)[1]
+            base = f"http://127.0.0.1:{server.server_port}"
+            self._send(200, json.dumps({"name": "bulbasaur",
+                                        "sprites": {"front_default": f"{base}/sprites/{poke_id}.png"}}).encode())
+        elif self.path.startswith("/sprites/"):
+            if self.headers.get("If-None-Match") == ETAG:
+                self._send(304, b"")
+            else:
+                self._send(200, SPRITE, {"ETag": ETAG})
+        elif self.path == "/flaky":
+            server.flaky -= 1
+            self._send(503 if server.flaky >= 0 else 200, b"ok")
+        elif self.path == "/down":
+            self._send(500, b"")
+        else:
+            self._send(404, b"")
+
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PokeAPI)
+    server.log, server.flaky = [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _url(api, path):
+    return f"http://127.0.0.1:{api.server_port}{path}"
+
+
+def test_keep_alive_connection_is_reused(api):
+    f = Fetcher(workers=1)
+    for _ in range(3):
+        assert f.get(_url(api, "/sprites/1.png")).body == SPRITE
+    # The pool worker, too, sends every request over its one connection
+    f.submit(lambda: [f.get(_url(api, "/sprites/2.png")) for _ in range(3)]).result()
+    assert len({port for _, port in api.log[:3]}) == 1
+    assert len({port for _, port in api.log[3:]}) == 1
+    f.close()
+
+
+def test_conditional_get_returns_304(api):
+    f = Fetcher(workers=1)
+    first = f.get(_url(api, "/sprites/1.png"))
+    assert (first.status, first.etag) == (200, ETAG)
+    again = f.get(_url(api, "/sprites/1.png"), etag=first.etag)
+    assert (again.status, again.body) == (304, b"")
+    f.close()
+
+
+def test_retries_5xx_with_jittered_backoff(api, monkeypatch):
+    delays = []
+    monkeypatch.setattr(fetcher_mod.time, "sleep", delays.append)
+    f = Fetcher(workers=1, retries=3, backoff=0.5, backoff_max=30)
+    api.flaky = 2                                   # two 503s, then 200
+    assert f.get(_url(api, "/flaky")).status == 200
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 0.5 and 0 <= delays[1] <= 1.0   # full jitter under base · 2^attempt
+    delays.clear()
+    with pytest.raises(FetchError):
+        f.get(_url(api, "/down"))
+    assert len(delays) == 2                         # no wait after the last attempt
+    f.close()
+
+
+def test_pokeclient_fetches_then_revalidates(api, tmp_path):
+    f = Fetcher(workers=2)
+    sprites = SpriteCache(str(tmp_path))
+    client = PokeClient(sprites, f, _url(api, "/api/pokemon"), total=1, prefetch=0)
+    assert client.fetch(1) == ("Bulbasaur", SPRITE)
+    assert sprites.entry(1)["etag"] == ETAG
+    before = len(api.log)
+    client._revalidate(1)
+    assert api.log[before:] and api.log[-1][0] == "/sprites/1.png"
+    assert sprites.get(1) == ("Bulbasaur", SPRITE)  # a 304 keeps the cached copy
+    f.close()
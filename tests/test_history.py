@@ -0,0 +1,22 @@
+"""Version history: finding past versions of a note by their text."""
+
+from history import History
+
+
+def test_search_finds_past_versions_newest_first(tmp_path):
+    history = History(str(tmp_path))
+    texts = ["first draft", "First Draft, with Tea", "tea only", "nothing"]
+    for i, text in enumerate(texts):
+        history.mark("n1")
+        history.before_edit("n1", text, [], now=1000.0 + i)
+        history.write()
+    history.mark("n2")
+    history.before_edit("n2", "tea elsewhere", [], now=1000.0)
+    history.write()
+    try:
+        hits = history.search("n1", "TEA")
+        assert [history.text("n1", v.rev) for v in hits] == ["tea only", "First Draft, with Tea"]
+        assert history.search("n1", "draft")[0].rev == 2
+        assert history.search("n1", "coffee") == []
+    finally:
+        history.close()
@@ -0,0 +1,93 @@
+"""The headless hub end to end: python -m sync --headless in a subprocess,
+its own data dir, a phone on loopback."""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import COMMON, _listening, connect, free_port, wait_for
+
+pytest.importorskip("websockets")
+
+
+class _Hub:
+    def __init__(self, data_dir):
+        self.port = free_port()
+        env = dict(os.environ, DISCOVERY="0", HELLO_TIMEOUT_MS="100", METRICS="0")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "sync", "--headless", "--host", "127.0.0.1",
+             "--port", str(self.port), "--data-dir", str(data_dir)],
+            cwd=COMMON, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        try:
+            wait_for(lambda: self.proc.poll() is not None or _listening(self.port), timeout=15)
+        except AssertionError:
+            self.stop()
+            raise
+        assert self.proc.poll() is None, self.proc.stdout.read()
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+    def stop(self):
+        self.proc.send_signal(signal.SIGTERM)
+        out, _ = self.proc.communicate(timeout=15)
+        assert "Hub stopped." in out, out
+
+
+def _notes(data_dir):
+    from store import NoteStore
+    store = NoteStore(str(data_dir))
+    try:
+        return {meta.id: store.load(meta.id)[0] for meta in store.list_notes()}
+    finally:
+        store.close()
+
+
+def test_bare_connection_does_not_create_a_note(tmp_path):
+    hub = _Hub(tmp_path)
+    try:
+        async def phone():
+            p = await connect(hub.url)
+            first = await p.recv()                  # no hello — the default room after the timeout
+            assert (first["type"], first["text"]) == ("update", "")
+            await p.ws.close()
+        asyncio.run(phone())
+    finally:
+        hub.stop()
+    assert _notes(tmp_path) == {}
+
+
+def test_edits_are_stored_and_served_after_a_restart(tmp_path):
+    hub = _Hub(tmp_path)
+    try:
+        async def phone():
+            p = await connect(hub.url)
+            await p.recv()
+            await p.send(type="update", text="bare", ts=time.time())   # a legacy client: no acks
+            await p.send(type="hello", caps=["patch"], note="named")
+            assert (await p.recv())["text"] == ""
+            await p.send(type="patch", note="named", base=0, version=1,
+                         ops=[[0, 0, "named"]], ts=time.time())
+            assert (await p.recv())["type"] == "ack"
+            await p.ws.close()
+        asyncio.run(phone())
+    finally:
+        hub.stop()
+    assert _notes(tmp_path) == {"default": "bare", "named": "named"}
+
+    hub = _Hub(tmp_path)
+    try:
+        async def phone():
+            p = await connect(hub.url)
+            await p.send(type="hello", caps=["patch"], note="named")
+            assert (await p.recv())["text"] == "named"
+            await p.ws.close()
+        asyncio.run(phone())
+    finally:
+        hub.stop()
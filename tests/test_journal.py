@@ -0,0 +1,83 @@
+"""Journal: group commit, replay after a crash, and a writer that survives errors."""
+
+import os
+import sqlite3
+import time
+
+from conftest import wait_for
+from journal import Journal
+from store import NoteStore
+
+
+def _journal(tmp_path, **kwargs):
+    store = NoteStore(str(tmp_path))
+    journal = Journal(str(tmp_path), store, **kwargs)
+    journal.recover()
+    return store, journal
+
+
+def test_flush_folds_edits_into_store(tmp_path):
+    store, journal = _journal(tmp_path)
+    note_id = store.create()
+    journal.record_text(note_id, "hello", 1.0)
+    journal.record(note_id, [[5, 0, " world"]], 2.0)
+    journal.flush()
+    assert store.load(note_id)[:2] == ("hello world", 2.0)
+    journal.close()
+    store.close()
+
+
+def test_replay_after_crash(tmp_path):
+    store, journal = _journal(tmp_path)
+    note_id = store.create()
+    journal.record_text(note_id, "abc", 1.0)
+    journal.record(note_id, [[3, 0, "def"], [0, 1, ""]], 2.0)
+    log = os.path.join(str(tmp_path), "notes.journal")
+    wait_for(lambda: os.path.getsize(log) > 0 and journal._queue.empty())
+    time.sleep(0.2)                                 # the group is fsynced, nothing compacted
+    assert store.load(note_id)[0] == ""
+    # "Crash": a second process starts over from the files on disk, with a torn tail
+    with open(log, "ab") as f:
+        f.write(b'{"seq": 999, "note": "')
+    store2, journal2 = _journal(tmp_path)
+    assert store2.load(note_id)[:2] == ("bcdef", 2.0)
+    assert os.path.getsize(log) == 0                # folded into the store and cut
+    journal2.close()
+    store2.close()
+
+
+class _BrokenStore:
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+    def save_many(self, notes):
+        raise sqlite3.OperationalError("disk I/O error")
+
+
+class _BrokenIndex:
+    def stale(self, store):
+        return False
+
+    def apply(self, edits, seq):
+        raise RuntimeError("index is broken")
+
+
+def test_writer_survives_store_and_index_errors(tmp_path):
+    store = NoteStore(str(tmp_path))
+    note_id = store.create()
+    journal = Journal(str(tmp_path), _BrokenStore(store), index=_BrokenIndex())
+    journal.recover()
+    journal.record_text(note_id, "kept in the journal", 1.0)
+    journal.flush()                                 # returns although compaction failed
+    journal.record_text(note_id, "and again", 2.0)
+    journal.flush()
+    assert journal._thread.is_alive()
+    journal.close()                                 # returns instead of hanging
+    # The journal still has the edits: the next start recovers them
+    store2, journal2 = _journal(tmp_path)
+    assert store2.load(note_id)[0] == "and again"
+    journal2.close()
+    store2.close()
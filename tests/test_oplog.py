@@ -0,0 +1,40 @@
+"""Op log: what a reconnecting client can be sent instead of the whole note."""
+
+from delta import apply_ops
+from oplog import OpLog, ops_size
+
+
+def test_since_concatenates_the_missed_versions():
+    log = OpLog(version=3)
+    texts = {3: "abc"}
+    for version, ops in ((4, [[3, 0, "d"]]), (5, [[0, 1, ""]]), (6, [[1, 1, "XY"]])):
+        log.append(version, ops)
+        texts[version] = apply_ops(texts[version - 1], ops)
+    for version in range(3, 7):
+        assert apply_ops(texts[version], log.since(version)) == texts[6]
+    assert log.since(6) == []
+    assert log.since(2) is None                     # older than the log
+    assert log.since(7) is None                     # newer than anything sent
+
+
+def test_a_gap_starts_the_log_over():
+    log = OpLog()
+    log.append(1, [[0, 0, "a"]])
+    log.append(5, [[1, 0, "b"]])                    # e.g. the note was replaced
+    assert (log.floor, log.last) == (4, 5)
+    assert log.since(1) is None
+    assert log.since(4) == [[1, 0, "b"]]
+
+
+def test_trimmed_from_the_oldest_end():
+    log = OpLog(max_entries=3)
+    for version in range(1, 6):
+        log.append(version, [[0, 0, str(version)]])
+    assert (log.floor, log.last) == (2, 5)
+    assert log.since(1) is None and len(log.since(2)) == 3
+
+    big = [[0, 0, "x" * 100]]
+    log = OpLog(max_chars=2 * ops_size(big))
+    for version in range(1, 4):
+        log.append(version, big)
+    assert log.floor == 1 and log.since(1) == big * 2
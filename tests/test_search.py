@@ -0,0 +1,75 @@
+"""Search index: incremental edits stay consistent with the notes, and
+hits point at the match in the original text."""
+
+import random
+
+import pytest
+
+import search
+from delta import apply_ops
+from search import SearchIndex
+from store import NoteStore
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_BLOCK_CHARS", 64)   # many blocks from little text
+    idx = SearchIndex(str(tmp_path))
+    yield idx
+    idx.close()
+
+def _blocks(idx, note_id):
+    layout = idx._layouts[note_id]
+    rows = dict(idx._writer.execute("SELECT rowid, text FROM blocks WHERE note = ?",
+                                    (note_id,)).fetchall())
+    assert sorted(rows) == sorted(layout.rowids)
+    return [rows[r] for r in layout.rowids], layout.lengths
+
+
+def test_random_incremental_edits_match_the_notes(index):
+    rng = random.Random(1)
+    words = ["alpha", "beta", "gamma", "delta\n", "eps", "\n", "zeta ", "ÄÖü", "İ"]
+    texts = {"a": "", "b": ""}
+    for seq in range(1, 401):
+        edits = []
+        for _ in range(rng.randint(1, 3)):
+            note_id = rng.choice("ab")
+            text, ops = texts[note_id], []
+            for _ in range(rng.randint(1, 3)):
+                pos = rng.randint(0, len(text))
+                n_del = rng.randint(0, min(len(text) - pos, rng.choice([0, 2, 10, 100])))
+                ins = "".join(rng.choice(words) for _ in range(rng.choice([0, 1, 3, 20])))
+                ops.append([pos, n_del, ins])
+                text = apply_ops(text, [ops[-1]])
+            texts[note_id] = text
+            edits.append((note_id, ops, text))
+        index.apply(edits, seq)
+    for note_id, text in texts.items():
+        blocks, lengths = _blocks(index, note_id)
+        assert "".join(blocks) == text
+        assert [len(b) for b in blocks] == lengths
+        assert all(b.endswith("\n") or len(b) == 64 for b in blocks[:-1])
+    for query in ("alpha", "lta", "äöü", "ta", "zeta alpha"):
+        for hit in index.search(query, limit=10000):
+            found = texts[hit.note][hit.offset:hit.offset + hit.length]
+            assert found.lower() == query.lower()
+
+
+def test_hit_offset_survives_length_changing_case(index):
+    text = "İİİİ then the needle\n"
+    index.apply([("n", [[0, 0, text]], text)], 1)
+    hit, = index.search("needle")
+    assert text[hit.offset:hit.offset + hit.length] == "needle"
+    hit, = index.search("NEEDLE")
+    assert text[hit.offset:hit.offset + hit.length] == "needle"
+
+
+def test_stale_notes_are_caught_up(tmp_path, index):
+    store = NoteStore(str(tmp_path))
+    note_id = store.create("hello world\nsecond line", 0.0)
+    assert index.stale(store)
+    while index.catch_up(lambda n: store.load(n)[0]):
+        pass
+    hit, = index.search("second")
+    assert (hit.note, hit.offset, hit.length) == (note_id, 12, 6)
+    store.close()
@@ -0,0 +1,48 @@
+"""Sprite cache: reads stay in memory, the index is written lazily, LRU eviction."""
+
+import os
+
+from sprites import SpriteCache
+
+
+def _count_writes(cache, monkeypatch):
+    writes = []
+    real = cache._write_index
+    monkeypatch.setattr(cache, "_write_index", lambda: writes.append(1) or real())
+    return writes
+
+
+def test_reads_do_not_write_the_index(tmp_path, monkeypatch):
+    cache = SpriteCache(str(tmp_path))
+    cache.put(1, "Bulbasaur", b"one")
+    writes = _count_writes(cache, monkeypatch)
+    for _ in range(10):
+        assert cache.pick() == (1, "Bulbasaur", b"one")
+        assert cache.get(1) == ("Bulbasaur", b"one")
+    assert writes == []
+    used = cache.entry(1)["used"]
+    cache.flush()
+    cache.flush()                                   # nothing new to write
+    assert writes == [1]
+    assert SpriteCache(str(tmp_path)).entry(1)["used"] == used
+
+
+def test_missing_object_is_forgotten(tmp_path):
+    cache = SpriteCache(str(tmp_path))
+    cache.put(1, "Bulbasaur", b"one")
+    for name in os.listdir(os.path.join(str(tmp_path), "objects")):
+        os.remove(os.path.join(str(tmp_path), "objects", name))
+    assert cache.get(1) is None
+    cache.flush()
+    assert SpriteCache(str(tmp_path)).entry(1) is None
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = SpriteCache(str(tmp_path), max_bytes=250)
+    for poke_id in (1, 2):
+        cache.put(poke_id, f"#{poke_id}", bytes([poke_id]) * 100)
+    cache.get(1)                                    # 2 is now the least recently used
+    cache.put(3, "#3", b"\x03" * 100)
+    assert cache.entry(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    assert len(os.listdir(os.path.join(str(tmp_path), "objects"))) == 2
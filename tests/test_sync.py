@@ -0,0 +1,192 @@
+"""The sync server end to end, over real websockets on loopback."""
+
+import asyncio
+import time
+
+from conftest import connect, wait_for
+
+
+def _url(sync):
+    return f"ws://127.0.0.1:{sync.WS_PORT}"
+
+def _open(sync, note_id, text):
+    patches = []
+    sync.open_note(note_id, text, 0.0, lambda *patch: patches.append(patch))
+    return patches
+
+
+def test_hello_gets_note_and_patch_reaches_desktop(sync_server):
+    sync = sync_server
+    patches = _open(sync, "e2e1", "hello")
+
+    async def phone():
+        p = await connect(_url(sync))
+        await p.send(type="hello", caps=["patch"], note="e2e1")
+        first = await p.recv()
+        assert (first["type"], first["text"]) == ("update", "hello")
+        await p.send(type="patch", note="e2e1", base=first["version"],
+                     version=first["version"] + 1, ops=[[5, 0, " world"]], ts=time.time())
+        ack = await p.recv()
+        assert ack["type"] == "ack"
+        await p.ws.close()
+    asyncio.run(phone())
+    try:
+        assert sync.snapshot("e2e1").text == "hello world"
+        assert patches and patches[-1][0] == [[5, 0, " world"]]
+    finally:
+        sync.close_note("e2e1")
+
+
+def test_desktop_patch_fans_out(sync_server):
+    sync = sync_server
+    _open(sync, "e2e2", "abc")
+
+    async def phones():
+        a, b = await connect(_url(sync)), await connect(_url(sync))
+        for p in (a, b):
+            await p.send(type="hello", caps=["patch"], note="e2e2")
+            await p.recv()
+        version = sync.snapshot("e2e2").version
+        await asyncio.get_running_loop().run_in_executor(
+            None, sync.broadcast_patch, "e2e2", version, [[3, 0, "d"]], time.time())
+        for p in (a, b):
+            msg = await p.recv()
+            assert msg["type"] == "patch" and msg["ops"] == [[3, 0, "d"]]
+            await p.ws.close()
+    try:
+        asyncio.run(phones())
+    finally:
+        sync.close_note("e2e2")
+
+
+def test_resume_sends_only_missed_ops(sync_server):
+    sync = sync_server
+    _open(sync, "e2e3", "x")
+
+    async def phone():
+        p = await connect(_url(sync))
+        await p.send(type="hello", caps=["patch"], note="e2e3")
+        first = await p.recv()
+        await p.ws.close()
+        for _ in range(3):
+            version = sync.snapshot("e2e3").version
+            sync.broadcast_patch("e2e3", version, [[0, 0, "y"]], time.time())
+        p = await connect(_url(sync))
+        await p.send(type="hello", caps=["patch"], note="e2e3",
+                     session=first["session"], version=first["version"])
+        msg = await p.recv()
+        assert msg["type"] == "patch" and msg["base"] == first["version"]
+        assert msg["version"] == first["version"] + 3
+        await p.ws.close()
+    try:
+        asyncio.run(phone())
+    finally:
+        sync.close_note("e2e3")
+
+
+def test_bad_note_ids_are_ignored(sync_server):
+    sync = sync_server
+    _open(sync, "e2e4", "still here")
+
+    async def phone():
+        p = await connect(_url(sync))
+        for bad in (["x"], {"a": 1}, 7, "../etc", "x" * 65):
+            await p.send(type="hello", caps=["patch"], note=bad)
+        await p.send(type="hello", caps=["patch"], note="e2e4")
+        msg = await p.recv()
+        assert msg["text"] == "still here"          # the connection survived
+        await p.send(type="ping")
+        assert (await p.recv())["type"] == "pong"
+        await p.ws.close()
+    try:
+        asyncio.run(phone())
+    finally:
+        sync.close_note("e2e4")
+
+
+def test_remote_patches_reach_ui_thread_through_bridge(sync_server):
+    """What both frontends do: the sync thread posts, the UI thread drains once."""
+    from bridge import Bridge
+    sync = sync_server
+    wakes, applied = [], []
+    bridge = Bridge(wakes.append)
+    sync.open_note("e2e5", "", 0.0,
+                   lambda ops, base, version, ts: bridge.post(applied.append, (base, version, ops)))
+
+    async def phone():
+        p = await connect(_url(sync))
+        await p.send(type="hello", caps=["patch"], note="e2e5")
+        version = (await p.recv())["version"]
+        for i, ch in enumerate("abc"):
+            await p.send(type="patch", note="e2e5", base=version, version=version + 1,
+                         ops=[[i, 0, ch]], ts=time.time())
+            version = (await p.recv())["version"]
+        await p.ws.close()
+    try:
+        asyncio.run(phone())
+        assert len(wakes) == 1                      # three patches, one wake-up
+        wakes[0]()
+        assert [ops for _, _, ops in applied] == [[[0, 0, "a"]], [[1, 0, "b"]], [[2, 0, "c"]]]
+        assert sync.snapshot("e2e5").text == "abc"
+    finally:
+        sync.close_note("e2e5")
+
+
+def test_deflate_is_negotiated_and_small_frames_go_plain(sync_server):
+    sync = sync_server
+    big = "lorem ipsum " * 2000
+    _open(sync, "e2e6", big)
+
+    async def phone():
+        p = await connect(_url(sync))
+        assert [e.name for e in p.ws.protocol.extensions] == ["permessage-deflate"]
+        port = p.ws.local_address[1]
+        wait_for(lambda: any(ws.remote_address[1] == port for ws in list(sync._connected_clients)))
+        server_ws = next(ws for ws in list(sync._connected_clients) if ws.remote_address[1] == port)
+        assert isinstance(server_ws.protocol.extensions[0], sync._LargeDeflate)
+        await p.send(type="hello", caps=["patch"], note="e2e6")
+        first = await p.recv()
+        assert first["text"] == big                 # compressed on the way, intact on arrival
+        await p.ws.close()
+    asyncio.run(phone())
+    sync.close_note("e2e6")
+
+
+def test_legacy_update_before_its_snapshot_is_merged(sync_server):
+    sync = sync_server
+    _open(sync, "e2e7", "hello")
+
+    async def phone():
+        p = await connect(_url(sync))
+        # No hello: a full-text update as the very first frame
+        await p.send(type="update", text="hello phone", ts=time.time())
+        wait_for(lambda: sync.snapshot("e2e7").text == "hello phone")
+        await p.ws.close()
+    try:
+        asyncio.run(phone())
+    finally:
+        sync.close_note("e2e7")
+
+
+def test_merged_reply_is_newer_than_the_clients_edit(sync_server):
+    sync = sync_server
+    _open(sync, "e2e8", "hello")
+
+    async def phone():
+        p = await connect(_url(sync))
+        first = await p.recv()                      # legacy: the snapshot after the hello timeout
+        sync.broadcast("e2e8", "hello desk", time.time())
+        assert (await p.recv())["text"] == "hello desk"
+        # The phone ignored that (say its own edit was newer) and edited v{first}
+        ts = time.time() + 60
+        await p.send(type="update", text="phone hello", ts=ts)
+        merged = await p.recv()
+        assert merged["type"] == "update" and merged["version"] > first["version"] + 1
+        assert merged["text"] == sync.snapshot("e2e8").text
+        assert "desk" in merged["text"] and "phone" in merged["text"]
+        assert merged["ts"] > ts
+        await p.ws.close()
+    try:
+        asyncio.run(phone())
+    finally:
+        sync.close_note("e2e8")
@@ -0,0 +1,108 @@
+"""
+animation.py — tkinter animation driver for Sticky Notes (Windows)
+====================================================================
+Plays a precomputed, looping cycle of frames on a Tk window:
+
+  Animator(root, frames, draw, fps=20)
+    frames — one full cycle sampled at `fps`, computed once (any
+             comparable values)
+    draw(frame, previous) — paint a frame; `previous` is what is on
+                            screen now (None the first time)
+
+Frames are picked by wall-clock time, so a late tick skips ahead instead
+of slowing the animation down. Runs of identical frames are measured up
+front and the driver sleeps straight through them — it only wakes when the
+picture actually changes. The rate also adapts to what drawing costs: ticks
+are spaced so painting takes at most `budget` of the time (a smoothed
+average), so a slow machine gets fewer frames rather than a busy UI
+thread. Nothing is scheduled while the window is
+withdrawn or minimised, or (with pause_unfocused) while another window has
+the focus.
+"""
+
+import time
+
+
+class Animator:
+    def __init__(self, root, frames, draw, fps: float = 20,
+                 pause_unfocused: bool = True, budget: float = 0.25):
+        self.root    = root
+        self.frames  = list(frames)
+        self.draw    = draw
+        self.fps     = fps
+        self.budget  = budget
+        self._cost   = 0.0         # smoothed seconds per draw
+        self._shown  = None        # index of the frame on screen
+        self._after  = None
+        self._t0     = time.monotonic()
+        self._mapped = True
+        self._focused = not pause_unfocused
+        self._pause_unfocused = pause_unfocused
+        # _hold[i] — how many frames from i on look exactly like frame i
+        n = len(self.frames)
+        self._hold = [1] * n
+        for i in range(2 * n - 2, -1, -1):
+            j = i % n
+            if self.frames[j] == self.frames[(j + 1) % n] and self._hold[(j + 1) % n] < n:
+                self._hold[j] = self._hold[(j + 1) % n] + 1
+        root.bind("<Map>",      self._on_map,   add="+")
+        root.bind("<Unmap>",    self._on_unmap, add="+")
+        root.bind("<FocusIn>",  self._on_focus, add="+")
+        root.bind("<FocusOut>", self._on_focus, add="+")
+
+    def start(self):
+        self._resume()
+
+    def stop(self):
+        if self._after is not None:
+            self.root.after_cancel(self._after)
+            self._after = None
+
+    # ── Pausing ───────────────────────────────────────────────────────────
+    def _on_map(self, event):
+        if event.widget is self.root:
+            self._mapped = True
+            self._resume()
+
+    def _on_unmap(self, event):
+        if event.widget is self.root:
+            self._mapped = False
+            self.stop()
+
+    def _on_focus(self, _event):
+        if self._pause_unfocused:
+            # Focus moving between our own widgets sends Out then In — look
+            # at where it ended up once things settle.
+            self.root.after_idle(self._check_focus)
+
+    def _check_focus(self):
+        try:
+            self._focused = self.root.focus_displayof() is not None
+        except KeyError:            # focus is in a widget that is being destroyed
+            self._focused = False
+        if self._focused:
+            self._resume()
+        else:
+            self.stop()
+
+    def _resume(self):
+        if self._after is None and self._mapped and self._focused and self.frames:
+            self._after = self.root.after_idle(self._tick)
+
+    # ── Playing ───────────────────────────────────────────────────────────
+    def _tick(self):
+        self._after = None
+        n = len(self.frames)
+        pos = (time.monotonic() - self._t0) * self.fps
+        i = int(pos) % n
+        if self._shown is None or self.frames[i] != self.frames[self._shown]:
+            previous = None if self._shown is None else self.frames[self._shown]
+            started = time.monotonic()
+            self.draw(self.frames[i], previous)
+            self._cost += (time.monotonic() - started - self._cost) / 8
+        self._shown = i
+        # Sleep until the first frame that looks different, and long enough
+        # that drawing stays within budget
+        wait = (self._hold[i] - (pos - int(pos))) / self.fps
+        wait = max(wait, self._cost / self.budget - self._cost)
+        self._after = self.root.after(max(1, round(wait * 1000)), self._tick)
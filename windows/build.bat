@@ -37,9 +37,11 @@ pyinstaller ^
     --onefile ^
     --name "sticky_notes" ^
     --noconsole ^
+    --paths ..\common ^
     --hidden-import PIL ^
     --hidden-import PIL.Image ^
     --hidden-import PIL.ImageTk ^
+    --hidden-import sync ^
     main.py
 
 echo.
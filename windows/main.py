@@ -10,11 +10,12 @@ Features:
   ✅ Draggable (click and drag anywhere)
   ✅ Resizable
   ✅ Animated Pokémon buddy (bob + breathe)
-  ✅ Persistent notes (saves on close, loads on open)
+  ✅ Persistent notes (saves as you type and on close, loads on open)
   ✅ Pokémon fetched from PokéAPI
+  ✅ Real-time sync with the Android app (the same server as on Linux)
 
 Install deps:
-  pip install python-dotenv pillow requests
+  pip install python-dotenv pillow requests websockets
 
 Run:
   python main_windows.py
@@ -22,11 +23,9 @@ Run:
 
 import os
 import sys
-import json
 import math
-import random
-import threading
-import urllib.request
+import time
+from collections import deque
 from io import BytesIO
 
 # ── Load .env ─────────────────────────────────────────────────────────────────
@@ -49,47 +48,61 @@ except ImportError:
 
 # ── Persistence ───────────────────────────────────────────────────────────────
 DATA_DIR  = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "sticky-notes")
-NOTE_FILE = os.path.join(DATA_DIR, "note.txt")
 os.makedirs(DATA_DIR, exist_ok=True)
-print(f"[INFO] Notes saved to: {NOTE_FILE}")
 
-def load_note():
-    if os.path.exists(NOTE_FILE):
-        with open(NOTE_FILE, "r", encoding="utf-8") as f:
-            return f.read()
-    return ""
+# Shared, toolkit-agnostic modules (note store, …) live in ..\common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from store import NoteStore
+from debounce import Debouncer
+from sprites import SpriteCache
+from fetcher import Fetcher
+from pokeapi import PokeClient
+from animation import Animator
+from loader import ChunkedLoader
+from bridge import Bridge
+from delta import apply_ops, diff, shift_offset, utf16_offset
+
+_store = NoteStore(DATA_DIR)
+print(f"[INFO] Notes saved to: {_store.path}")
+
+def _import_legacy_note():
+    """First run after upgrading from the single note.txt layout."""
+    text = ""
+    note_file = os.path.join(DATA_DIR, "note.txt")
+    if os.path.exists(note_file):
+        with open(note_file, "r", encoding="utf-8") as f:
+            text = f.read()
+    return _store.create(text)
+
+# Open the most recently modified note — only the index is read for this
+_recent = _store.list_notes()
+NOTE_ID = _recent[0].id if _recent else _import_legacy_note()
 
 def save_note(text):
-    with open(NOTE_FILE, "w", encoding="utf-8") as f:
-        f.write(text)
+    _store.save(NOTE_ID, text, time.time())
 
 # ── Pokémon fetch ─────────────────────────────────────────────────────────────
 TOTAL_POKEMON = 151  # Gen 1 — raise to 1025 for all generations
 
+POKEAPI_BASE_URL = os.getenv("POKEAPI_BASE_URL", "https://pokeapi.co/api/v2/pokemon")
+
+# Sprites downloaded on earlier runs (sprites.py) — a buddy is shown from
+# there at once. Downloads go through one pool of keep-alive connections
+# (fetcher.py) that also prefetches a few more Pokémon (pokeapi.py).
+SPRITE_CACHE_MAX_BYTES = int(os.getenv("SPRITE_CACHE_MAX_BYTES", str(4 << 20)))
+SPRITE_PREFETCH        = int(os.getenv("SPRITE_PREFETCH",        "3"))
+_sprites = SpriteCache(os.path.join(DATA_DIR, "sprites"), SPRITE_CACHE_MAX_BYTES)
+_pokeapi = PokeClient(
+    _sprites,
+    Fetcher(user_agent=os.getenv("USER_AGENT", "sticky-notes-app/1.0")),
+    POKEAPI_BASE_URL, TOTAL_POKEMON, SPRITE_PREFETCH,
+)
+
 def fetch_pokemon(callback):
-    """Fetch a random Pokémon sprite + name in a background thread."""
-    def _fetch():
-        try:
-            poke_id    = random.randint(1, TOTAL_POKEMON)
-            api_url    = f"https://pokeapi.co/api/v2/pokemon/{poke_id}"
-            headers    = {"User-Agent": os.getenv("USER_AGENT", "sticky-notes-app/1.0")}
-
-            req = urllib.request.Request(api_url, headers=headers)
-            with urllib.request.urlopen(req, timeout=5) as r:
-                data = json.loads(r.read())
-
-            name       = data["name"].capitalize()
-            sprite_url = data["sprites"]["front_default"]
-
-            req2 = urllib.request.Request(sprite_url, headers=headers)
-            with urllib.request.urlopen(req2, timeout=5) as r:
-                img_bytes = r.read()
-
-            # Schedule UI update on main thread
-            root.after(0, lambda: callback(name, img_bytes))
-        except Exception as e:
-            print(f"[Pokémon] Could not fetch: {e}")
-    threading.Thread(target=_fetch, daemon=True).start()
+    """Pick a Pokémon buddy; callback(name, img_bytes) runs on the Tk thread."""
+    # Handed to the Tk thread through the bridge
+    _pokeapi.buddy(lambda name, img_bytes: _bridge.post(callback, name, img_bytes),
+                   lambda: None)
 
 # ── Main window ───────────────────────────────────────────────────────────────
 root = tk.Tk()
@@ -98,6 +111,11 @@ root.geometry("320x240")
 root.resizable(True, True)
 root.configure(bg="#ffd740")
 
+# Worker threads (sprite fetcher, sync server) hand their results to the Tk
+# thread through one bridge, drained at most once per frame (bridge.py)
+BRIDGE_FRAME_MS = int(os.getenv("BRIDGE_FRAME_MS", "16"))
+_bridge = Bridge(lambda drain: root.after(BRIDGE_FRAME_MS, drain))
+
 # Always on top
 root.wm_attributes("-topmost", True)
 
@@ -147,8 +165,28 @@ text_area.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
 scrollbar = tk.Scrollbar(root, command=text_area.yview, bg="#ffd740")
 scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
 
-# Load saved note
-text_area.insert(tk.END, load_note())
+# Load saved note — the top of it before the window shows, the rest a slice
+# at a time from the event loop (loader.py). Read-only until it is all in.
+def _insert_loaded(text):
+    text_area.config(state=tk.NORMAL)
+    text_area.insert(tk.END, text)
+    text_area.config(state=tk.DISABLED)
+
+def _on_load_progress(fraction):
+    title_lbl.config(text=f"📝 {root.title()}  •  {fraction:.0%}")
+
+def _on_loaded():
+    text_area.config(state=tk.NORMAL)
+    text_area.mark_set(tk.INSERT, "1.0")
+    text_area.edit_modified(False)          # loading the note is not an edit
+    title_lbl.config(text=f"📝 {root.title()}")
+    root.after_idle(_attach_sync)           # once the window is up
+
+_meta   = _store.meta(NOTE_ID)
+_loader = ChunkedLoader(_store.read_chunks(NOTE_ID), _meta.size if _meta else 0,
+                        _insert_loaded, lambda fn: root.after(1, fn), root.after_cancel,
+                        _on_load_progress, _on_loaded)
+text_area.config(state=tk.DISABLED)
 
 # ── Pokémon overlay canvas ────────────────────────────────────────────────────
 poke_canvas = tk.Canvas(root, width=128, height=148, bg="#ffd740",
@@ -160,7 +198,32 @@ poke_canvas.bind("<Button-1>", lambda e: text_area.focus_set())
 
 _poke_img_ref = None   # keep reference so GC doesn't collect it
 _poke_img_id  = None
-_anim_step    = [0]
+
+ANIM_FPS             = float(os.getenv("ANIM_FPS", "20"))
+ANIM_PAUSE_UNFOCUSED = os.getenv("ANIM_PAUSE_UNFOCUSED", "1") != "0"
+
+def _buddy_frames(fps: float):
+    """One full cycle of (y, canvas colour): the bob takes π s and the
+    breathing π/0.7 s, so both line up again after 10π s — t runs 0 → 20π,
+    ten bobs and seven breaths, spread over a whole number of frames so the
+    loop has no seam."""
+    n = round(10 * math.pi * fps)
+    frames = []
+    for step in range(n):
+        t = 20 * math.pi * step / n                                 # ≈ 2 per second
+        y = 64 + int(6 * math.sin(t))                               # centre y 58–70
+        # Tkinter has no per-widget alpha — breathe the canvas bg instead
+        opacity = 0.65 + 0.35 * ((math.sin(t * 0.7) + 1) / 2)       # 0.65 → 1.0
+        color = f"#{int(0xff * opacity):02x}{int(0xee * opacity):02x}{int(0x60 * opacity):02x}"
+        frames.append((y, color))
+    return frames
+
+def _draw_buddy(frame, previous):
+    y, color = frame
+    if previous is None or y != previous[0]:
+        poke_canvas.coords(_poke_img_id, 64, y)
+    if previous is None or color != previous[1]:
+        poke_canvas.config(bg=color)
 
 def on_pokemon_loaded(name, img_bytes):
     global _poke_img_ref, _poke_img_id
@@ -173,48 +236,166 @@ def on_pokemon_loaded(name, img_bytes):
         _poke_img_id  = poke_canvas.create_image(64, 64, image=_poke_img_ref, anchor="center")
         root.title(f"Sticky Note  •  {name}")
         title_lbl.config(text=f"📝 Sticky Note  •  {name}")
-        start_animation()
+        Animator(root, _buddy_frames(ANIM_FPS), _draw_buddy, fps=ANIM_FPS,
+                 pause_unfocused=ANIM_PAUSE_UNFOCUSED).start()
     except Exception as e:
         print(f"[Pokémon] Render error: {e}")
 
-def start_animation():
-    """Bob up/down + breathe opacity at ~20 fps."""
-    def animate():
-        if _poke_img_id is None:
-            return
-        t = _anim_step[0] * 0.1
-
-        # Bob: move image up and down on canvas
-        bob = 64 + int(6 * math.sin(t))          # centre y oscillates 58–70
-        poke_canvas.coords(_poke_img_id, 64, bob)
-
-        # Breathe: change canvas background alpha isn't natively supported,
-        # so we simulate it by adjusting canvas stipple / transparency via a
-        # semi-transparent rectangle overlay on the canvas
-        opacity = 0.65 + 0.35 * ((math.sin(t * 0.7) + 1) / 2)   # 0.65 → 1.0
-        # Tkinter doesn't support per-widget alpha, so we lighten the bg instead
-        intensity = int(255 * opacity)
-        bg_color  = f"#{intensity:02x}{min(intensity+20,255):02x}{max(intensity-60,0):02x}"
-        # Just animate the canvas bg subtly as a breathing glow
-        r = int(0xff * opacity)
-        g = int(0xee * opacity)
-        b = int(0x60 * opacity)
-        poke_canvas.config(bg=f"#{r:02x}{g:02x}{b:02x}")
-
-        _anim_step[0] += 1
-        root.after(50, animate)   # 50 ms → 20 fps
-
-    animate()
-
 fetch_pokemon(on_pokemon_loaded)
 
+# ── Autosave ──────────────────────────────────────────────────────────────────
+# Saved once typing pauses, and at least every AUTOSAVE_MAX_LATENCY_MS while it doesn't
+AUTOSAVE_DEBOUNCE_MS    = int(os.getenv("AUTOSAVE_DEBOUNCE_MS",    "1000"))
+AUTOSAVE_MAX_LATENCY_MS = int(os.getenv("AUTOSAVE_MAX_LATENCY_MS", "10000"))
+
+def _save_now():
+    save_note(text_area.get("1.0", tk.END).rstrip("\n"))
+
+_autosave = Debouncer(_save_now,
+                      AUTOSAVE_DEBOUNCE_MS / 1000, AUTOSAVE_MAX_LATENCY_MS / 1000,
+                      lambda seconds, fn: root.after(max(1, round(seconds * 1000)), fn),
+                      root.after_cancel)
+
+def on_modified(_event):
+    if text_area.edit_modified() and _loader.done:
+        text_area.edit_modified(False)      # re-arm <<Modified>> for the next edit
+        _autosave.poke()
+        if _synced:
+            _publish_later.poke()
+
+text_area.bind("<<Modified>>", on_modified)
+
+# ── Sync ──────────────────────────────────────────────────────────────────────
+# The same sync server as on Linux (common/sync.py): the phone connects to
+# this PC. Typing is diffed against the text last synced and published once
+# it pauses; patches from the phone come in through the bridge and a burst
+# of them is applied in one go.
+SYNC_DEBOUNCE_MS    = int(os.getenv("SYNC_DEBOUNCE_MS",    "800"))
+SYNC_MAX_LATENCY_MS = int(os.getenv("SYNC_MAX_LATENCY_MS", "3000"))
+
+_sync           = None      # the sync module, once the server is up
+_synced         = False     # the note is being served
+_synced_text    = ""        # the text as of _synced_version
+_synced_version = 0
+_remote         = deque()   # (ops, base, version, ts) from the sync thread
+
+def _current_text():
+    return text_area.get("1.0", "end-1c")
+
+def _attach_sync():
+    global _sync, _synced, _synced_text, _synced_version
+    try:
+        import sync as _sync                # websockets is only needed from here on
+    except ImportError as e:
+        print(f"[WARN] Sync unavailable ({e}) — run: pip install websockets")
+        return
+    _sync.start()
+    _synced_text = _current_text()
+    _sync.open_note(NOTE_ID, _synced_text, _meta.ts if _meta else 0.0, _on_remote_patch)
+    _synced_version = _sync.snapshot(NOTE_ID).version
+    _synced = True
+
+# Ops carry str offsets; Tk before 8.7 counts a character outside the BMP
+# (most emoji) as two in its indices
+_TK_UTF16 = tk.TkVersion < 8.7
+
+def _tk_index(text, pos):
+    """Tk index of str offset `pos` in `text`, the text area's current content."""
+    return f"1.0+{utf16_offset(text, pos) if _TK_UTF16 else pos}c"
+
+def _apply_to_text(ops):
+    """Apply `ops` to the text area, keeping the cursor where the user left it."""
+    if not ops:
+        return
+    text = _current_text()
+    cursor = len(text_area.get("1.0", tk.INSERT))    # a str offset, whatever Tk counts in
+    for pos, n_del, ins in ops:
+        if n_del:
+            text_area.delete(_tk_index(text, pos), _tk_index(text, pos + n_del))
+        if ins:
+            text_area.insert(_tk_index(text, pos), ins)
+        text = text[:pos] + ins + text[pos + n_del:]
+    text_area.mark_set(tk.INSERT, _tk_index(text, shift_offset(cursor, ops)))
+
+def _catch_up():
+    """Bring the text area up to the server copy, touching only the part that differs."""
+    global _synced_text, _synced_version
+    text, version, _ts = _sync.snapshot(NOTE_ID)
+    _apply_to_text(diff(_current_text(), text))
+    _synced_text, _synced_version = text, version
+    _sync.ack(NOTE_ID, version)
+
+def _publish():
+    """Send what was typed since the last sync; the server merges it with
+    concurrent edits from the phone, which are then pulled in."""
+    global _synced_text, _synced_version
+    _publish_later.cancel()
+    if not _synced:
+        return
+    text = _current_text()
+    ops = diff(_synced_text, text)
+    if not ops:
+        return
+    ts, base = time.time(), _synced_version
+    version = _sync.broadcast_patch(NOTE_ID, base, ops, ts)
+    if version is None:
+        # Too far behind to merge — publish the text as-is
+        _synced_text, _synced_version = text, _sync.broadcast(NOTE_ID, text, ts)
+    elif version != base + 1:
+        _catch_up()
+    else:
+        _synced_text, _synced_version = text, version
+
+_publish_later = Debouncer(_publish,
+                           SYNC_DEBOUNCE_MS / 1000, SYNC_MAX_LATENCY_MS / 1000,
+                           lambda seconds, fn: root.after(max(1, round(seconds * 1000)), fn),
+                           root.after_cancel)
+
+def _on_remote_patch(ops, base, version, ts):
+    """Called from the sync thread when the phone changes the note."""
+    _remote.append((ops, base, version, ts))
+    _bridge.post_latest("remote", _apply_remote)
+
+def _apply_remote():
+    global _synced_text, _synced_version
+    batch = []
+    while _remote:
+        batch.append(_remote.popleft())
+    if not _synced or not batch or batch[-1][2] <= _synced_version:
+        return                              # gone, or already caught up past it
+    if _current_text() != _synced_text:
+        _publish()                          # merge our edits first
+        return
+    ops, version = [], _synced_version
+    for patch_ops, base, patch_version, _ts in batch:
+        if patch_version <= version:
+            continue
+        if base != version:
+            _catch_up()                     # missed a version in between
+            return
+        ops.extend(patch_ops)
+        version = patch_version
+    _apply_to_text(ops)
+    _synced_text, _synced_version = apply_ops(_synced_text, ops), version
+    _sync.ack(NOTE_ID, version)
+
 # ── Save on close ─────────────────────────────────────────────────────────────
 def on_close():
-    save_note(text_area.get("1.0", tk.END).rstrip("\n"))
+    global _synced
+    _autosave.cancel()
+    if _loader.done:
+        _publish()
+        _save_now()
+    else:
+        _loader.cancel()                    # don't save half a note over the whole one
+    if _synced:
+        _synced = False
+        _sync.close_note(NOTE_ID)
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_close)
 close_btn.config(command=on_close)
 
 # ── Run ───────────────────────────────────────────────────────────────────────
+_loader.start()
 root.mainloop()